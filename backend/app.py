@@ -1,16 +1,38 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
-from typing import Dict, Optional
-from src.agent import Agent
+from typing import Awaitable, Dict, List, Optional
+from src.agent import Agent, get_tool_cache, get_tool_runner
+from src.batch import run_batch
 from src.providers.factory import ProviderFactory 
-from src.memory.local_memory import InMemoryStore
+from src.providers.routing import start_route_log, use_backend_slots
+from src.providers.warmup import ModelWarmup
+from src.memory.factory import MemoryFactory
+from src.sessions import SessionManager, SessionQueue, SessionTurn
+from src.scheduler import Overloaded, Scheduler, Ticket
+from src.config.config import Config
+from src.metrics import REGISTRY, REQUEST_LATENCY, SCHEDULER_REJECTED, Trace, span, start_trace
+from src.serialization import dumps, dumps_str
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cold model loads are paid here, in the background, instead of by the first user request
+    model_warmup.start()
+    yield
+    await model_warmup.stop()
+    await ProviderFactory.close_all()
 
 app = FastAPI(
     title="Low-Level LLM Chat API",
     description="API for low-level chatbot with provider switching",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -21,23 +43,97 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-memory_store = InMemoryStore()
-sessions: Dict[str, Agent] = {}
+memory_store = MemoryFactory.get_store()
+sessions = SessionManager(max_agents=Config.SESSION_MAX_AGENTS, ttl=Config.SESSION_TTL)
+session_queue = SessionQueue(max_pending=Config.SCHEDULER_SESSION_QUEUE, merge_window=Config.SESSION_MERGE_WINDOW)
+model_warmup = ModelWarmup(
+    ['ollama'] if Config.OLLAMA_WARMUP else [],
+    build=ProviderFactory.create_async_provider,
+    refresh_interval=Config.OLLAMA_WARMUP_INTERVAL
+)
+scheduler = Scheduler(
+    Config.PROVIDER_CONCURRENCY,
+    default_limit=Config.PROVIDER_MAX_CONCURRENCY,
+    session_limit=Config.SESSION_MAX_CONCURRENCY,
+    max_queue=Config.SCHEDULER_MAX_QUEUE,
+    session_queue=Config.SCHEDULER_SESSION_QUEUE,
+    queue_timeout=Config.SCHEDULER_QUEUE_TIMEOUT
+)
+
+REGISTRY.gauge('sessions_active', 'Agents held in the in-process session cache', callback=lambda: len(sessions))
+REGISTRY.gauge('tool_queue_depth', 'Tool calls waiting for a worker thread', callback=lambda: get_tool_runner().queue_depth())
+REGISTRY.gauge('tool_in_flight', 'Tool calls submitted and not yet finished', callback=lambda: get_tool_runner().in_flight())
+REGISTRY.gauge('scheduler_active', 'Requests holding a provider slot', ('provider',),
+               callback=lambda: {name: stats['active'] for name, stats in scheduler.stats().items()})
+REGISTRY.gauge('scheduler_waiting', 'Requests queued for a provider slot', ('provider',),
+               callback=lambda: {name: stats['waiting'] for name, stats in scheduler.stats().items()})
+# memory_store.stats(), read once per scrape by metrics() (off the event loop for stores doing I/O)
+store_stats = {}
+REGISTRY.gauge('memory_store_sessions', 'Sessions in the history store', callback=lambda: store_stats.get('sessions'))
+REGISTRY.gauge('memory_store_messages', 'Messages in the history store', callback=lambda: store_stats.get('messages'))
+
+PROVIDERS = ["openai", "hf", "ollama", "auto"]
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded by src.serialization (orjson when installed). Routes return it directly, which also
+    skips FastAPI's jsonable_encoder pass, so the content must be plain JSON types (as agent histories are).
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
 
-class ChatRequest(BaseModel):
+class GenerationParams(BaseModel):
+    temperature: float = Field(0.7, ge=0.0, le=2.0, description="Inference temperature")
+    timeout: Optional[float] = Field(None, gt=0, description="Seconds for the whole request (default AGENT_TIMEOUT)")
+    max_rounds: Optional[int] = Field(None, ge=0, description="Tool rounds before the model must answer (default AGENT_MAX_ROUNDS)")
+    max_total_tokens: Optional[int] = Field(None, gt=0, description="Token budget across the request's model calls")
+
+    def params(self) -> dict:
+        """Agent params: the temperature plus the limits the request sets (see src/budget.py)"""
+        params = {"temperature": self.temperature}
+        for key in ("timeout", "max_rounds", "max_total_tokens"):
+            if getattr(self, key) is not None:
+                params[key] = getattr(self, key)
+        return params
+
+class ChatRequest(GenerationParams):
     session_id: str = Field(default_factory=lambda: "sess_" + __import__("uuid").uuid4().hex[:8])
     message: str = Field(..., min_length=1, description="User message (required)")
-    provider: str = Field(..., description="Provider: 'openai', 'hf' o 'ollama' (required)")
-    temperature: float = Field(0.7, ge=0.0, le=2.0, description="Inference temperature")
+    provider: str = Field(..., description="Provider: 'openai', 'hf', 'ollama' or 'auto' (routed by latency and health) (required)")
+    trace: bool = Field(False, description="Return per-request span timings (context, llm, tool) in internal_flow")
+
+class BatchItem(GenerationParams):
+    id: Optional[str] = Field(None, description="Echoed back in the item's result (default: its position)")
+    message: str = Field(..., min_length=1)
+    provider: str = Field(..., description="Provider: 'openai', 'hf', 'ollama' or 'auto'")
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, max_length=Config.BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1, description="Items run at once (default BATCH_CONCURRENCY, capped at BATCH_MAX_CONCURRENCY)")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "sessions_active": len(sessions)}
+    return {
+        "status": "ok",
+        "ready": model_warmup.ready(),
+        "models": model_warmup.stats(),
+        "sessions_active": len(sessions),
+        "scheduler": scheduler.stats(),
+        "routing": ProviderFactory.routing_stats(),
+        "tool_cache": get_tool_cache().stats()
+    }
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition format"""
+    stats = await memory_store.run_async(memory_store.stats)
+    store_stats.clear()
+    store_stats.update(stats)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
-    if request.provider not in ["openai", "hf", "ollama"]:
+async def get_agent(request: ChatRequest) -> Agent:
+    if request.provider not in PROVIDERS:
         raise HTTPException(
             status_code=422,
             detail="Invalid supplier"
@@ -45,66 +141,232 @@ async def chat(request: ChatRequest):
 
     session_id = request.session_id
 
-    if session_id not in sessions:
-        try:
-            provider_instance = ProviderFactory.get_provider(request.provider)
-            sessions[session_id] = Agent(
-                provider_instance,
-                memory=memory_store,
-                session_id=session_id)
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error initializing the provider {request.provider}: {str(e)}"
-            )
+    try:
+        # Shared, pooled instance: cheap to fetch on every request
+        provider_instance = ProviderFactory.get_async_provider(request.provider)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error initializing the provider {request.provider}: {str(e)}"
+        )
 
-    agent = sessions[session_id]
+    # Also rehydrates evicted sessions: the history is read back from memory_store
+    # (in a worker thread when the store does I/O, as creating an Agent reads and may write it)
+    agent = await memory_store.run_async(sessions.get_or_create, session_id, lambda: Agent(
+        provider_instance,
+        memory=memory_store,
+        session_id=session_id))
     
-    provider_map = {
-        "openai": "OpenAIProvider",
-        "ollama": "OllamaProvider",
-        "hf": "HuggingFaceProvider"
-    }
-    
-    current_class_name = agent.provider.__class__.__name__
-    requested_class_name = provider_map.get(request.provider)
+    if agent.provider is not provider_instance:
+        print(f"🔄 Switching provider for session {session_id}: {agent.provider.__class__.__name__} -> {provider_instance.__class__.__name__}")
+        agent.provider = provider_instance
+
+    return agent
+
+def overloaded(request: ChatRequest, e: Overloaded) -> HTTPException:
+    SCHEDULER_REJECTED.inc(provider=request.provider, status=e.status_code)
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+async def session_turn(request: ChatRequest) -> SessionTurn:
+    """Waits for the earlier requests of the session to finish, or fails fast with 429 when too many are pending."""
+    try:
+        with span('session'):
+            return await session_queue.acquire(request.session_id)
+    except Overloaded as e:
+        raise overloaded(request, e)
+
+async def admit(request: ChatRequest) -> Ticket:
+    """Waits for a provider slot, or fails fast with 429/503 and Retry-After when the queue is full."""
+    try:
+        with span('queue'):
+            return await scheduler.acquire(request.provider, request.session_id)
+    except Overloaded as e:
+        raise overloaded(request, e)
+
+def build_chat_response(request: ChatRequest, new_messages: list, cursor: int, response: str, tool_logs: list,
+                        trace: Trace = None, routes: list = None) -> dict:
+    # Only the messages added by this request (agent.history_since(cursor));
+    # the full history is served by /sessions/{id}/messages
     
-    if current_class_name != requested_class_name:
-        try:
-            print(f"🔄 Switching provider for session {session_id}: {current_class_name} -> {requested_class_name}")
-            agent.provider = ProviderFactory.get_provider(request.provider)
-        except Exception as e:
-             raise HTTPException(
-                status_code=500,
-                detail=f"Error switching to provider {request.provider}: {str(e)}"
-            )
+    internal_flow = {
+        "messages": new_messages, 
+        "messages_start": cursor,
+        "cursor": cursor + len(new_messages),
+        "params": request.params(), 
+        "tool_logs": tool_logs 
+    }
+    if routes:
+        # provider='auto': the backend that answered each model call, and the ones tried before it
+        internal_flow["backends"] = routes
+    if trace is not None:
+        internal_flow["spans"] = trace.spans
+        internal_flow["total_ms"] = round((time.perf_counter() - trace.started) * 1000, 2)
+
+    return {
+        "role": "assistant",
+        "content": response,
+        "provider_used": request.provider,
+        "session_id": request.session_id,     
+        "logs": tool_logs,            
+        "internal_flow": internal_flow 
+    }
 
+async def wait_for_disconnect(http_request: Request):
+    # The body has been read already, so the next ASGI message is the disconnect
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+async def until_disconnected(http_request: Request, work: Awaitable, endpoint: str, started: float):
+    """
+    Runs `work`, cancelling it if the client goes away first: the pending model call and the tools that
+    have not started are abandoned, the session's turn and provider slot are freed at once, and the agent
+    records the partial turn.
+    """
+    work = asyncio.ensure_future(work)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({work, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not work.done():
+            work.cancel()
+            # Let the request unwind (record the partial turn, free its slots) before answering
+            await asyncio.wait({work})
+    if work.cancelled():
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint, status="cancelled")
+        raise HTTPException(status_code=499, detail="Client closed the request")
+    return work.result()
+
+@app.post("/chat", response_class=FastJSONResponse)
+async def chat(request: ChatRequest, http_request: Request):
+    started = time.perf_counter()
+    trace = start_trace() if request.trace else None
+    routes = start_route_log()
+    use_backend_slots(lambda backend: scheduler.slot(backend, request.session_id))
+    # Identical submissions for a session (double clicks, client retries) may share one run
+    key = request.model_dump_json(exclude={'session_id'})
+    work = session_queue.merge(request.session_id, key, lambda: run_chat(request, started, trace, routes))
+    return FastJSONResponse(await until_disconnected(http_request, work, "/chat", started))
+
+async def run_chat(request: ChatRequest, started: float, trace: Optional[Trace], routes: list) -> dict:
+    # Requests of a session run one at a time, so the provider switch and the history cursor cannot race
+    turn = await session_turn(request)
     try:
-        response, tool_logs = await run_in_threadpool(
-            agent.process_input,
+        agent = await get_agent(request)
+        ticket = await admit(request)
+    except BaseException:
+        turn.release()
+        raise
+
+    try:
+        cursor = await agent.get_version_async()
+        response, tool_logs = await agent.process_input_async(
             user_input=request.message,
-            params={"temperature": request.temperature}
+            params=request.params()
         )
         
-        current_history = memory_store.get_messages(session_id)
-        
-        internal_flow = {
-            "messages": current_history, 
-            "params": {"temperature": request.temperature}, 
-            "tool_logs": tool_logs 
-        }
-
-        return {
-            "role": "assistant",
-            "content": response,
-            "provider_used": request.provider,
-            "session_id": session_id,     
-            "logs": tool_logs,            
-            "internal_flow": internal_flow 
-        }
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint="/chat", status="ok")
+        new_messages = await agent.history_since_async(cursor)
+        return build_chat_response(request, new_messages, cursor, response, tool_logs, trace, routes)
 
     except Exception as e:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint="/chat", status="error")
         raise HTTPException(
             status_code=500,
             detail=f"Error during generation: {str(e)}"
-        )
\ No newline at end of file
+        )
+    finally:
+        ticket.release()
+        turn.release()
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Same as /chat, but as Server-Sent Events: 'token', 'tool_call' and 'tool' events, then a final 'done' event with the /chat payload."""
+    started = time.perf_counter()
+    trace = start_trace() if request.trace else None
+    routes = start_route_log()
+    use_backend_slots(lambda backend: scheduler.slot(backend, request.session_id))
+    # Admitted before the response starts, so an overloaded server answers with a plain 429/503.
+    # Streams are never merged, but they hold the session's turn like /chat does.
+    turn = await session_turn(request)
+    try:
+        agent = await get_agent(request)
+        ticket = await admit(request)
+    except BaseException:
+        turn.release()
+        raise
+
+    def release():
+        ticket.release()
+        turn.release()
+
+    async def event_stream():
+        try:
+            cursor = await agent.get_version_async()
+            async for event in agent.process_input_stream_async(
+                user_input=request.message,
+                params=request.params()
+            ):
+                event_type = event.pop('type')
+                if event_type == 'done':
+                    REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint="/chat/stream", status="ok")
+                    new_messages = await agent.history_since_async(cursor)
+                    event = build_chat_response(request, new_messages, cursor, event['content'], event['tool_logs'], trace, routes)
+                yield {"event": event_type, "data": dumps_str(event)}
+        except Exception as e:
+            REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint="/chat/stream", status="error")
+            yield {"event": "error", "data": dumps_str({"detail": f"Error during generation: {str(e)}"})}
+        finally:
+            release()
+
+    # The background task covers a client that disconnects before the stream starts
+    return EventSourceResponse(event_stream(), background=BackgroundTask(release))
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchRequest):
+    """
+    Runs independent prompts (e.g. an evaluation set) with bounded concurrency on throwaway sessions.
+    Streams NDJSON: one result line per item as soon as it finishes (see src/batch.py for the fields),
+    then a final {"summary": ...} line. Items take provider slots from the same scheduler as /chat.
+    """
+    invalid = sorted({item.provider for item in request.items if item.provider not in PROVIDERS})
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Invalid supplier: {', '.join(invalid)}")
+
+    items = [
+        {"message": item.message, "provider": item.provider, "params": item.params(),
+         **({"id": item.id} if item.id is not None else {})}
+        for item in request.items
+    ]
+    concurrency = min(request.concurrency or Config.BATCH_CONCURRENCY, Config.BATCH_MAX_CONCURRENCY)
+
+    async def lines():
+        started = time.perf_counter()
+        succeeded = 0
+        async for result in run_batch(items, concurrency, slot=scheduler.slot):
+            succeeded += result["ok"]
+            yield dumps(result) + b"\n"
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint="/chat/batch", status="ok")
+        yield dumps({"summary": {
+            "items": len(items), "ok": succeeded, "failed": len(items) - succeeded, "concurrency": concurrency,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/sessions/{session_id}/messages", response_class=FastJSONResponse)
+async def get_session_messages(
+    session_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    messages = await memory_store.get_messages_page_async(session_id, offset, limit)
+    total = await memory_store.get_version_async(session_id)
+    next_offset = offset + len(messages)
+    return FastJSONResponse({
+        "session_id": session_id,
+        "offset": offset,
+        "total": total,
+        "next_offset": next_offset if next_offset < total else None,
+        "messages": messages
+    })
@@ -0,0 +1,48 @@
+"""
+Compares the threadpool path (sync Agent.process_input in run_in_threadpool, as /chat used to do)
+with the native async path (Agent.process_input_async) against a local Ollama stub.
+
+Usage (from backend/): python -m benchmarks.async_load --concurrency 100 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+from fastapi.concurrency import run_in_threadpool
+from src.agent import Agent
+from src.memory.local_memory import InMemoryStore
+from src.providers.ollama import OllamaProvider, AsyncOllamaProvider
+from .stub_server import StubServer, ollama_app
+
+async def run_sync(base_url: str, concurrency: int) -> float:
+    provider = OllamaProvider(base_url=base_url, model='stub')
+    memory = InMemoryStore()
+    agents = [Agent(provider, memory=memory, session_id=f"sync_{i}", tools=[]) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_in_threadpool(agent.process_input, user_input='hello') for agent in agents))
+    return time.perf_counter() - start
+
+async def run_async(base_url: str, concurrency: int) -> float:
+    provider = AsyncOllamaProvider(base_url=base_url, model='stub')
+    memory = InMemoryStore()
+    agents = [Agent(provider, memory=memory, session_id=f"async_{i}", tools=[]) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(agent.process_input_async(user_input='hello') for agent in agents))
+    elapsed = time.perf_counter() - start
+    await provider.client.aclose()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds the stub waits before answering")
+    args = parser.parse_args()
+
+    with StubServer(ollama_app(args.latency)) as server:
+        base_url = f"{server.base_url}/api"
+        for name, runner in (("threadpool", run_sync), ("async", run_async)):
+            elapsed = asyncio.run(runner(base_url, args.concurrency))
+            print(f"{name:>10}: {args.concurrency} conversations in {elapsed:.2f}s "
+                  f"({args.concurrency / elapsed:.1f} req/s, ideal {args.latency:.2f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold-start check: imports a module in a fresh interpreter with `python -X importtime` and reports its
+cumulative import time and its slowest direct imports (best of --runs).
+Exits with 1 if the import takes longer than --budget-ms, pulls in one of the provider SDKs (they must load
+on first use), reads the configuration (yaml/dotenv loaded; only allowed with --allow-config, for modules such
+as app that build objects from it at import) or creates files in the working directory.
+
+Usage (from backend/): python -m benchmarks.importtime --module src.agent --budget-ms 300
+                       python -m benchmarks.importtime --module app --budget-ms 1500 --allow-config
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORBIDDEN = ('openai', 'huggingface_hub', 'serpapi', 'requests', 'httpx')
+# Loaded only when the settings are resolved (see config.Settings)
+CONFIG_MODULES = ('yaml', 'dotenv')
+
+def parse(stderr: str) -> list:
+    """[(depth, self_us, cumulative_us, name)] in the order -X importtime prints them (children first)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+def measure(module: str) -> tuple:
+    """Imports `module` in a subprocess from an empty directory; returns (rows, imported modules, created files)."""
+    env = {**os.environ, 'PYTHONPATH': BACKEND_DIR, 'MEMORY_BACKEND': 'memory'}
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+        created = os.listdir(cwd)
+    return parse(result.stderr), set(result.stdout.split()), created
+
+def report(module: str, rows: list, top: int):
+    total = next(cumulative for depth, _, cumulative, name in rows if depth == 0 and name == module)
+    # The module's direct imports are the depth-1 rows printed after the previous top-level import
+    start = max((i for i, row in enumerate(rows) if row[0] == 0 and row[3] != module), default=-1) + 1
+    children = [row for row in rows[start:] if row[0] == 1]
+    print(f"import {module}: {total / 1000:.1f} ms")
+    for _, self_us, cumulative_us, name in sorted(children, key=lambda row: -row[2])[:top]:
+        print(f"  {name:<40} {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:.1f} ms)")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='src.agent')
+    parser.add_argument('--budget-ms', type=float, default=300)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--allow-config', action='store_true', help='the module may read the configuration at import')
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        rows, modules, created = measure(args.module)
+        total = next(cumulative for depth, _, cumulative, name in rows if depth == 0 and name == args.module)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    report(args.module, best[1], args.top)
+
+    failed = False
+    if best[0] / 1000 > args.budget_ms:
+        print(f"OVER BUDGET: {best[0] / 1000:.1f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    forbidden = FORBIDDEN if args.allow_config else FORBIDDEN + CONFIG_MODULES
+    eager = [name for name in forbidden if name in modules]
+    if eager:
+        print(f"EAGER IMPORTS: {', '.join(eager)} (should load on first use)")
+        failed = True
+    if created:
+        print(f"SIDE EFFECTS: import created {', '.join(created)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
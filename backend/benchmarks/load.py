@@ -0,0 +1,163 @@
+"""
+Load generator for POST /chat. Runs fully offline: a fake model server (OpenAI-compatible or Ollama) answers
+with the configured latency/token rate and a scripted tool loop, and the app is served in-process by uvicorn.
+With --url it drives an already running server instead (start the fake model with `python -m benchmarks.stub_server`).
+
+Scenarios:
+  simple        one message per session, no tools
+  tools         one message per session, three tool rounds (the last one with two parallel calls)
+  long-history  --turns messages per session, one tool round each; compares early and late turn latency
+
+Reports p50/p95/p99 latency, throughput and (in-process only) resident memory growth per session.
+
+Usage (from backend/): python -m benchmarks.load --scenario tools --concurrency 20 --requests 200
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+import uuid
+import httpx
+from .stub_server import StubServer, ollama_app, openai_app
+
+PROVIDER_ERROR = "Sorry, there was an error generating the response"
+
+SCENARIOS = {
+    'simple': [],
+    'tools': [
+        {'name': 'list_files_in_dir', 'arguments': {'directory': '.'}},
+        {'name': 'search_files', 'arguments': {'query': 'benchmark'}},
+        [
+            {'name': 'list_files_in_dir', 'arguments': {'directory': '.', 'recursive': True}},
+            {'name': 'search_files', 'arguments': {'query': 'stub'}}
+        ]
+    ],
+    'long-history': [{'name': 'list_files_in_dir', 'arguments': {'directory': '.'}}]
+}
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+def rss_bytes() -> int:
+    """Resident set size of this process (Linux), 0 where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return 0
+
+def configure_app(model_url: str, provider: str, memory_backend: str, workdir: str):
+    """Points the app at the fake model server; must run before `app` is imported (Config is read at import)."""
+    os.environ['OLLAMA_BASE_URL'] = f"{model_url}/api"
+    os.environ['OPENAI_BASE_URL'] = f"{model_url}/v1"
+    os.environ.setdefault('OPENROUTER_API_KEY', 'stub')
+    os.environ['MEMORY_BACKEND'] = memory_backend
+    os.environ['MEMORY_DB_PATH'] = os.path.join(workdir, 'bench_memory.db')
+    os.environ['LLM_CACHE'] = 'off'
+    os.environ['SESSION_MAX_AGENTS'] = str(10 ** 6)
+
+async def send(client: httpx.AsyncClient, base_url: str, provider: str, session_id: str, message: str) -> float:
+    started = time.perf_counter()
+    response = await client.post(f"{base_url}/chat", json={
+        'session_id': session_id, 'message': message, 'provider': provider, 'temperature': 0.0
+    })
+    response.raise_for_status()
+    if response.json()['content'] == PROVIDER_ERROR:
+        raise RuntimeError("the agent could not reach the model")
+    return time.perf_counter() - started
+
+async def drive(base_url: str, args) -> dict:
+    latencies, turn_latencies, errors = [], {}, []
+    turns = args.turns if args.scenario == 'long-history' else 1
+    sessions = args.requests // turns
+    queue = asyncio.Queue()
+    for _ in range(sessions):
+        queue.put_nowait(f"bench_{uuid.uuid4().hex[:12]}")
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            session_id = queue.get_nowait()
+            for turn in range(turns):
+                try:
+                    elapsed = await send(client, base_url, args.provider, session_id, f"turn {turn}: find the benchmark files")
+                except Exception as e:
+                    errors.append(str(e))
+                    break
+                latencies.append(elapsed)
+                turn_latencies.setdefault(turn, []).append(elapsed)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        # Warm-up: imports, first connections and the first store writes are not part of the measurement
+        await send(client, base_url, args.provider, f"warmup_{uuid.uuid4().hex[:8]}", "warm up")
+        gc.collect()
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        rss_after = rss_bytes()
+
+    return {
+        'latencies': latencies, 'turn_latencies': turn_latencies, 'errors': errors, 'elapsed': elapsed,
+        'sessions': sessions, 'rss_growth': rss_after - rss_before if rss_before else None
+    }
+
+def report(args, result: dict, in_process: bool):
+    latencies = result['latencies']
+    print(f"scenario={args.scenario} provider={args.provider} memory={args.memory_backend} "
+          f"concurrency={args.concurrency} model latency={args.latency}s token rate={args.token_rate or 'inf'}/s")
+    print(f"  requests: {len(latencies)} ok, {len(result['errors'])} failed in {result['elapsed']:.2f}s "
+          f"({len(latencies) / result['elapsed']:.1f} req/s)")
+    print(f"  latency:  p50 {percentile(latencies, 50) * 1000:.0f}ms  p95 {percentile(latencies, 95) * 1000:.0f}ms  "
+          f"p99 {percentile(latencies, 99) * 1000:.0f}ms")
+    if args.scenario == 'long-history' and len(result['turn_latencies']) > 1:
+        turns = sorted(result['turn_latencies'])
+        window = max(1, len(turns) // 5)
+        early = [v for t in turns[:window] for v in result['turn_latencies'][t]]
+        late = [v for t in turns[-window:] for v in result['turn_latencies'][t]]
+        print(f"  history:  p50 first {window} turns {percentile(early, 50) * 1000:.0f}ms, "
+              f"last {window} turns {percentile(late, 50) * 1000:.0f}ms")
+    if in_process and result['rss_growth'] is not None:
+        print(f"  memory:   {result['rss_growth'] / 1024:.0f} KiB RSS growth, "
+              f"{result['rss_growth'] / max(1, result['sessions']) / 1024:.1f} KiB per session")
+    if result['errors']:
+        print(f"  first error: {result['errors'][0]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='simple')
+    parser.add_argument('--provider', choices=('ollama', 'openai'), default='ollama')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200, help="Total /chat calls")
+    parser.add_argument('--turns', type=int, default=20, help="Messages per session (long-history)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake model latency in seconds")
+    parser.add_argument('--token-rate', type=float, default=None, help="Fake model tokens per second")
+    parser.add_argument('--memory-backend', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--url', default=None, help="Drive an already running server instead of an in-process one")
+    args = parser.parse_args()
+
+    if args.url:
+        # The server under test must already point at a model (e.g. `python -m benchmarks.stub_server`)
+        result = asyncio.run(drive(args.url.rstrip('/'), args))
+        report(args, result, in_process=False)
+        sys.exit(1 if result['errors'] else 0)
+
+    app_factory = openai_app if args.provider == 'openai' else ollama_app
+    with StubServer(app_factory(args.latency, script=SCENARIOS[args.scenario], token_rate=args.token_rate)) as model_server:
+        with tempfile.TemporaryDirectory() as workdir:
+            configure_app(model_server.base_url, args.provider, args.memory_backend, workdir)
+            from app import app
+            with StubServer(app) as app_server:
+                result = asyncio.run(drive(app_server.base_url, args))
+            report(args, result, in_process=True)
+    sys.exit(1 if result['errors'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Regression check for the Ollama prompt size: runs a conversation of N turns (each with one tool round)
+against a local Ollama stub and records the system prompt and payload size of every request.
+The system prompt must stay the same size on every call; the script exits with 1 if it grows.
+
+Usage (from backend/): python -m benchmarks.ollama_prompt_size --turns 50
+"""
+import argparse
+import json
+import sys
+from src.agent import Agent
+from src.memory.local_memory import InMemoryStore
+from src.providers.ollama import OllamaProvider
+from src.tools.file_ops import list_files_schema
+from .stub_server import StubServer, ollama_app
+
+def run(base_url: str, tool_mode: str, turns: int, requests_log: list) -> list:
+    provider = OllamaProvider(base_url=base_url, model='stub', tool_mode=tool_mode)
+    # The agent keeps the history dicts between turns, so any in-place change by the provider would persist
+    agent = Agent(provider, memory=InMemoryStore(), session_id=f"prompt_{tool_mode}", tools=[list_files_schema])
+    del requests_log[:]
+    for turn in range(turns):
+        agent.process_input(user_input=f"turn {turn}: list the files")
+    provider.close()
+    return [(len(payload['messages'][0]['content']), len(json.dumps(payload))) for payload in requests_log]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=50)
+    args = parser.parse_args()
+
+    requests_log = []
+    tool_call = {'name': 'list_files_in_dir', 'arguments': {'directory': '.'}}
+    failed = False
+    with StubServer(ollama_app(0, script=[tool_call], requests_log=requests_log)) as server:
+        for tool_mode in ('native', 'emulated'):
+            sizes = run(f"{server.base_url}/api", tool_mode, args.turns, requests_log)
+            system_sizes = {system for system, _ in sizes}
+            status = "constant" if len(system_sizes) == 1 else "GROWING"
+            failed = failed or len(system_sizes) != 1
+            print(f"{tool_mode:>9}: {len(sizes)} requests, system prompt {min(system_sizes)}-{max(system_sizes)} chars ({status}), "
+                  f"payload {sizes[0][1]} -> {sizes[-1][1]} bytes")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
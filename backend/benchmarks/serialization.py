@@ -0,0 +1,70 @@
+"""
+Encode/decode cost of long histories: the stdlib json path the app used before against src.serialization
+(orjson when installed, otherwise its compact stdlib fallback).
+  rows      every message encoded and decoded on its own, as the SQLite and Redis stores do
+  response  a /sessions/{id}/messages page holding the whole history: FastAPI's default
+            jsonable_encoder + JSONResponse against FastJSONResponse
+
+Usage (from backend/): python -m benchmarks.serialization --turns 50 200
+"""
+import argparse
+import json
+import os
+import random
+import timeit
+
+os.environ.setdefault('MEMORY_BACKEND', 'memory')
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app import FastJSONResponse
+from src import serialization
+from .session_memory import conversation
+
+def best(fn, repeat: int) -> float:
+    """Best time of one call, in seconds."""
+    number = max(1, int(0.05 / max(timeit.timeit(fn, number=1), 1e-6)))
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+def rows(history: list, repeat: int) -> dict:
+    old = [json.dumps(message) for message in history]
+    new = [serialization.dumps_str(message) for message in history]
+    assert [json.loads(row) for row in new] == history
+    return {
+        'json': (best(lambda: [json.dumps(m) for m in history], repeat),
+                 best(lambda: [json.loads(row) for row in old], repeat), sum(len(row.encode()) for row in old)),
+        'fast': (best(lambda: [serialization.dumps_str(m) for m in history], repeat),
+                 best(lambda: [serialization.loads(row) for row in new], repeat), sum(len(row.encode()) for row in new))
+    }
+
+def response(history: list, repeat: int) -> dict:
+    body = {'session_id': 's0', 'offset': 0, 'total': len(history), 'next_offset': None, 'messages': history}
+    old = JSONResponse(jsonable_encoder(body)).body
+    new = FastJSONResponse(body).body
+    assert json.loads(new) == json.loads(old)
+    return {
+        'json': (best(lambda: JSONResponse(jsonable_encoder(body)), repeat), best(lambda: json.loads(old), repeat), len(old)),
+        'fast': (best(lambda: FastJSONResponse(body), repeat), best(lambda: serialization.loads(new), repeat), len(new))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    backend = 'orjson' if serialization.orjson is not None else 'stdlib json (compact)'
+    print(f"src.serialization backend: {backend}")
+    for turns in args.turns:
+        history = conversation(random.Random(0), 0, turns)
+        print(f"{turns} turns, {len(history)} messages")
+        for name, run in (('rows', rows), ('response', response)):
+            results = run(history, args.repeat)
+            for label, (encode, decode, size) in results.items():
+                print(f"  {name:>8} {label:>4}: encode {encode * 1000:7.2f} ms  decode {decode * 1000:7.2f} ms  {size / 1024:8.1f} KiB")
+            (old_encode, old_decode, old_size), (new_encode, new_decode, new_size) = results['json'], results['fast']
+            print(f"  {name:>8}      encode x{old_encode / new_encode:.1f}, decode x{old_decode / new_decode:.1f}, "
+                  f"size {new_size / old_size:.0%}")
+
+if __name__ == '__main__':
+    main()
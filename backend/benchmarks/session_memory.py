@@ -0,0 +1,159 @@
+"""
+Bytes per session of the in-process history: fills --sessions sessions of --turns turns each
+(user message, a tool call with its output, final answer) and measures the Python heap with tracemalloc.
+Compares the compact InMemoryStore with a plain store of message dicts (what InMemoryStore used to keep),
+then adds what a hot Agent per session holds on top of the store once it has built a prompt: the window
+kept by the context manager, or the whole history (what Agent used to cache).
+
+Messages are decoded from JSON, as if they came from a client, a provider or a tool, so every session holds
+its own strings. Tool outputs are slices of this repo's source files (a read_file result, a few KB each).
+
+Usage (from backend/): python -m benchmarks.session_memory --sessions 2000 --turns 8
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import random
+import time
+import tracemalloc
+from src.agent import Agent
+from .stub_providers import StubProvider
+from src.memory.base import MemoryStore
+from src.memory.local_memory import InMemoryStore
+
+SYSTEM = Agent.__init__.__defaults__[0]
+CORPUS = '\n'.join(
+    open(path, encoding='utf-8').read()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src', '**', '*.py'), recursive=True))
+)
+
+
+class DictStore(MemoryStore):
+    """The previous InMemoryStore: one list of message dicts per session."""
+
+    def __init__(self):
+        self._storage = {}
+
+    def get_messages(self, session_id: str):
+        return self._storage.get(session_id, [])
+
+    def add_message(self, session_id: str, message: dict):
+        self._storage.setdefault(session_id, []).append(message)
+
+    def delete_session(self, session_id: str):
+        self._storage.pop(session_id, None)
+
+
+def conversation(rng: random.Random, session: int, turns: int) -> list:
+    messages = [{'role': 'system', 'content': SYSTEM}]
+    for turn in range(turns):
+        call_id = f"call_{session}_{turn}"
+        start = rng.randrange(len(CORPUS) - 10000)
+        page = CORPUS[start:start + rng.randint(2000, 8000)]
+        messages += [
+            {'role': 'user', 'content': f"Session {session}, question {turn}: what does the code around line {start} do?"},
+            {'role': 'assistant', 'content': None, 'tool_calls': [{
+                'id': call_id, 'type': 'function',
+                'function': {'name': 'read_file', 'arguments': json.dumps({'path': 'src/agent.py', 'offset': start})}
+            }]},
+            {'role': 'tool', 'tool_call_id': call_id, 'name': 'read_file',
+             'content': json.dumps({'path': 'src/agent.py', 'content': page, 'offset': start})},
+            {'role': 'assistant', 'content': f"Turn {turn}: " + page[:rng.randint(200, 600)]}
+        ]
+    # Round-trip through JSON so no string is shared between sessions
+    return json.loads(json.dumps(messages))
+
+def heap() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+def fill(store: MemoryStore, sessions: int, turns: int) -> tuple:
+    """Returns (heap bytes held by the store when tracing, seconds spent adding)."""
+    rng = random.Random(0)
+    before = heap()
+    # Built while tracing: whatever the store keeps of these messages is counted, the rest is freed below
+    histories = [conversation(rng, session, turns) for session in range(sessions)]
+    started = time.perf_counter()
+    for session, messages in enumerate(histories):
+        for message in messages:
+            store.add_message(f"s{session}", message)
+    elapsed = time.perf_counter() - started
+    del histories, messages
+    return heap() - before, elapsed
+
+def hold_agents(store: MemoryStore, sessions: int, retain: bool) -> tuple:
+    """(heap bytes held by one Agent per session after it built a prompt when tracing, seconds building, agents)"""
+    provider = StubProvider()
+    before = heap()
+    started = time.perf_counter()
+    agents = []
+    for session in range(sessions):
+        agent = Agent(provider, memory=store, session_id=f"s{session}")
+        if not retain:
+            agent._window.retain = lambda context, session_id: None
+        agent._history()
+        agents.append(agent)
+    elapsed = time.perf_counter() - started
+    return heap() - before, elapsed, agents
+
+def read_time(store: MemoryStore, sessions: int, tail: int = None) -> float:
+    """Seconds reading every session: the whole history (rehydration, paging) or its last `tail` messages
+    (what an agent fetches each round)."""
+    started = time.perf_counter()
+    for session in range(sessions):
+        if tail is None:
+            store.get_messages(f"s{session}")
+        else:
+            store.get_messages_since(f"s{session}", store.get_version(f"s{session}") - tail)
+    return time.perf_counter() - started
+
+def measure(build_store, sessions: int, turns: int, retain: bool) -> dict:
+    """Heap bytes from a run under tracemalloc; times from a second, untraced run (tracing slows allocations)."""
+    tracemalloc.start()
+    store = build_store()
+    stored, _ = fill(store, sessions, turns)
+    held, _, agents = hold_agents(store, sessions, retain)
+    tracemalloc.stop()
+    del store, agents
+
+    store = build_store()
+    _, add = fill(store, sessions, turns)
+    _, prompt, agents = hold_agents(store, sessions, retain)
+    return {'store': stored, 'agents': held, 'add': add, 'read': read_time(store, sessions),
+            'tail': read_time(store, sessions, tail=4), 'prompt': prompt}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--turns', type=int, default=8)
+    parser.add_argument('--compress-after-turns', type=int, default=4)
+    parser.add_argument('--compress-min-chars', type=int, default=InMemoryStore.__init__.__defaults__[1])
+    args = parser.parse_args()
+
+    def compact(after_turns=args.compress_after_turns, min_chars=args.compress_min_chars):
+        return lambda: InMemoryStore(compress_after_turns=after_turns, compress_min_chars=min_chars)
+
+    results = {}
+    for label, build_store, retain in (
+        ('dicts', DictStore, False),
+        ('compact, full agents', compact(), False),
+        ('compact', compact(), True),
+        ('compact, zlib > 512', compact(min_chars=512), True),
+        ('compact, no zlib', compact(after_turns=None), True)
+    ):
+        result = results[label] = measure(build_store, args.sessions, args.turns, retain)
+        per_session = {key: value / args.sessions for key, value in result.items()}
+        print(f"{label:>20}: store {per_session['store'] / 1024:5.1f} KiB + agents {per_session['agents'] / 1024:5.1f} KiB"
+              f" = {(per_session['store'] + per_session['agents']) / 1024:5.1f} KiB per session  "
+              f"add {per_session['add'] * 1e6:4.0f} us  read {per_session['read'] * 1e6:4.0f} us  "
+              f"last turn {per_session['tail'] * 1e6:3.0f} us  prompt {per_session['prompt'] * 1e6:4.0f} us")
+    total = {label: result['store'] + result['agents'] for label, result in results.items()}
+    print(f"compact store uses {results['compact']['store'] / results['dicts']['store']:.0%} of the dict store; "
+          f"with a hot agent per session (full agents: each caches the whole history, others only the context window) "
+          f"{total['compact'] / total['dicts']:.0%} ({args.sessions} sessions x {args.turns} turns, "
+          f"compression after {args.compress_after_turns} turns)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Scripted fake model shared by the stub providers and the fake HTTP servers: a configurable latency and
+token rate, and scripted tool rounds. Imports nothing from `src`, so the servers can start before the app is configured.
+
+A script is a list with one entry per tool round: {'name': ..., 'arguments': {...}} for a single call,
+or a list of those for parallel calls. After the last round the model answers with plain text.
+"""
+import json
+
+def scripted_calls(messages: list, script: list) -> list:
+    """Tool calls for the next round of the current turn, or [] when the script is exhausted."""
+    # Every assistant message after the last user message is a finished tool round (a text answer ends the turn)
+    rounds = 0
+    for message in reversed(messages):
+        if message['role'] == 'user':
+            break
+        if message['role'] == 'assistant':
+            rounds += 1
+    if not script or rounds >= len(script):
+        return []
+    entry = script[rounds]
+    return entry if isinstance(entry, list) else [entry]
+
+def approx_tokens(messages: list) -> int:
+    return len(json.dumps(messages)) // 4 + 1
+
+
+class StubModel:
+    """The scripted behaviour shared by the stub providers and the fake HTTP servers."""
+
+    def __init__(self, latency: float = 0.0, token_rate: float = None, script: list = None,
+                 answer: str = 'This is a stub answer from the benchmark model.'):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.script = script or []
+        self.answer = answer
+
+    def answer_tokens(self) -> list:
+        words = self.answer.split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    def token_delay(self) -> float:
+        return 1 / self.token_rate if self.token_rate else 0.0
+
+    def total_delay(self, calls: list) -> float:
+        return self.latency + (0 if calls else len(self.answer_tokens()) * self.token_delay())
+
+    def response(self, messages: list) -> dict:
+        calls = scripted_calls(messages, self.script)
+        tool_calls = [
+            {'id': f"call_{index}", 'function': {'name': call['name'], 'arguments': json.dumps(call.get('arguments') or {})}}
+            for index, call in enumerate(calls)
+        ]
+        completion = sum(len(call['function']['arguments']) // 4 + 1 for call in tool_calls) or len(self.answer_tokens())
+        return {
+            'content': None if tool_calls else self.answer,
+            'tool_calls': tool_calls,
+            'usage': {'prompt_tokens': approx_tokens(messages), 'completion_tokens': completion}
+        }
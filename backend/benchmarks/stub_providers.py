@@ -0,0 +1,60 @@
+"""Offline providers for benchmarks: the scripted StubModel behind the LLMProvider interfaces, no network involved."""
+import asyncio
+import time
+from src.providers.base import LLMProvider, AsyncLLMProvider
+from .stub_model import StubModel
+
+def _tool_call_events(response: dict) -> list:
+    return [
+        {'type': 'tool_call', 'index': index, 'id': call['id'], 'name': call['function']['name'], 'arguments': call['function']['arguments']}
+        for index, call in enumerate(response['tool_calls'])
+    ]
+
+
+class StubProvider(LLMProvider):
+    name = 'stub'
+
+    def __init__(self, latency: float = 0.0, token_rate: float = None, script: list = None, model: str = 'stub', **kwargs):
+        self.stub = StubModel(latency, token_rate, script, **kwargs)
+        self.model = model
+
+    def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        response = self.stub.response(messages)
+        time.sleep(self.stub.total_delay(response['tool_calls']))
+        return response
+
+    def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        response = self.stub.response(messages)
+        time.sleep(self.stub.latency)
+        if response['tool_calls']:
+            yield from _tool_call_events(response)
+        else:
+            for token in self.stub.answer_tokens():
+                time.sleep(self.stub.token_delay())
+                yield {'type': 'content', 'delta': token}
+        yield {'type': 'response', **response}
+
+
+class AsyncStubProvider(AsyncLLMProvider):
+    name = 'stub'
+
+    def __init__(self, latency: float = 0.0, token_rate: float = None, script: list = None, model: str = 'stub', **kwargs):
+        self.stub = StubModel(latency, token_rate, script, **kwargs)
+        self.model = model
+
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        response = self.stub.response(messages)
+        await asyncio.sleep(self.stub.total_delay(response['tool_calls']))
+        return response
+
+    async def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        response = self.stub.response(messages)
+        await asyncio.sleep(self.stub.latency)
+        if response['tool_calls']:
+            for event in _tool_call_events(response):
+                yield event
+        else:
+            for token in self.stub.answer_tokens():
+                await asyncio.sleep(self.stub.token_delay())
+                yield {'type': 'content', 'delta': token}
+        yield {'type': 'response', **response}
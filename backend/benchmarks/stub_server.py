@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import json
+import math
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from .stub_model import StubModel
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _keep_alive_seconds(value) -> float:
+    if isinstance(value, (int, float)):
+        return math.inf if value < 0 else value
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    return float(value[:-1]) * units[value[-1]] if value and value[-1] in units else float(value)
+
+def ollama_app(latency: float, script: list = None, token_rate: float = None, requests_log: list = None,
+               load_latency: float = 0.0) -> Starlette:
+    """
+    Minimal Ollama /api/chat stand-in that answers every request after `latency` seconds.
+    Tool rounds follow `script` (see stub_model): native `tool_calls` when the request carries `tools`,
+    emulated JSON content otherwise. Streams NDJSON at `token_rate` tokens/s when asked to.
+    Every chat payload received is appended to `requests_log`.
+    Like Ollama, a model that is not loaded (or whose keep_alive ran out, 5m by default) is loaded first,
+    taking `load_latency` seconds; a request without messages only loads it, and /api/ps lists the loaded models.
+    """
+    model = StubModel(latency, token_rate, script)
+    loaded = {}  # model name -> time.time() when it is unloaded
+
+    async def load(payload: dict):
+        name = payload.get('model')
+        if loaded.get(name, 0) <= time.time():
+            await asyncio.sleep(load_latency)
+        loaded[name] = time.time() + _keep_alive_seconds(payload.get('keep_alive', '5m'))
+
+    async def ps(request: Request):
+        now = time.time()
+        return JSONResponse({'models': [
+            {'name': name, 'model': name, 'size_vram': 0,
+             'expires_at': datetime.fromtimestamp(min(until, now + 10 ** 9), timezone.utc).isoformat()}
+            for name, until in loaded.items() if until > now
+        ]})
+
+    async def chat(request: Request):
+        payload = await request.json()
+        await load(payload)
+        if not payload['messages']:
+            return JSONResponse({'model': payload.get('model'), 'message': {'role': 'assistant', 'content': ''},
+                                 'done_reason': 'load', 'done': True})
+        if requests_log is not None:
+            requests_log.append(payload)
+        response = model.response(payload['messages'])
+        calls = [
+            {'function': {'name': c['function']['name'], 'arguments': json.loads(c['function']['arguments'])}}
+            for c in response['tool_calls']
+        ]
+        if calls and payload.get('tools'):
+            message = {'role': 'assistant', 'content': '', 'tool_calls': calls}
+        elif calls:
+            message = {'role': 'assistant', 'content': json.dumps({'tool_calls': calls})}
+        else:
+            message = {'role': 'assistant', 'content': response['content']}
+        final = {
+            'model': payload.get('model'), 'done': True,
+            'prompt_eval_count': response['usage']['prompt_tokens'], 'eval_count': response['usage']['completion_tokens']
+        }
+
+        if not payload.get('stream'):
+            await asyncio.sleep(model.total_delay(calls))
+            return JSONResponse({**final, 'message': message})
+
+        async def lines():
+            await asyncio.sleep(model.latency)
+            if calls:
+                yield json.dumps({'model': payload.get('model'), 'message': message, 'done': False}) + '\n'
+            else:
+                for token in model.answer_tokens():
+                    await asyncio.sleep(model.token_delay())
+                    yield json.dumps({'model': payload.get('model'), 'message': {'role': 'assistant', 'content': token}, 'done': False}) + '\n'
+            yield json.dumps({**final, 'message': {'role': 'assistant', 'content': ''}}) + '\n'
+
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+    return Starlette(routes=[Route('/api/chat', chat, methods=['POST']), Route('/api/ps', ps)])
+
+def openai_app(latency: float, script: list = None, token_rate: float = None, requests_log: list = None) -> Starlette:
+    """OpenAI-compatible /v1/chat/completions stand-in (plain and SSE streaming), with the same knobs as ollama_app."""
+    model = StubModel(latency, token_rate, script)
+
+    async def completions(request: Request):
+        payload = await request.json()
+        if requests_log is not None:
+            requests_log.append(payload)
+        response = model.response(payload['messages'])
+        tool_calls = [{'type': 'function', **call} for call in response['tool_calls']]
+        base = {'id': f"chatcmpl-{uuid.uuid4().hex[:12]}", 'created': int(time.time()), 'model': payload.get('model')}
+        usage = {**response['usage'], 'total_tokens': sum(response['usage'].values())}
+        finish_reason = 'tool_calls' if tool_calls else 'stop'
+
+        if not payload.get('stream'):
+            await asyncio.sleep(model.total_delay(tool_calls))
+            message = {'role': 'assistant', 'content': response['content'], 'tool_calls': tool_calls or None}
+            return JSONResponse({
+                **base, 'object': 'chat.completion', 'usage': usage,
+                'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}]
+            })
+
+        def chunk(delta: dict, finish: str = None) -> str:
+            data = {**base, 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]}
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            await asyncio.sleep(model.latency)
+            yield chunk({'role': 'assistant', 'content': ''})
+            if tool_calls:
+                yield chunk({'tool_calls': [{'index': i, **call} for i, call in enumerate(tool_calls)]})
+            else:
+                for token in model.answer_tokens():
+                    await asyncio.sleep(model.token_delay())
+                    yield chunk({'content': token})
+            yield chunk({}, finish_reason)
+            if (payload.get('stream_options') or {}).get('include_usage'):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type='text/event-stream')
+
+    return Starlette(routes=[Route('/v1/chat/completions', completions, methods=['POST'])])
+
+class StubServer:
+    """Runs a Starlette app with uvicorn in a background thread for the duration of a `with` block."""
+
+    def __init__(self, app: Starlette, port: int = None):
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=self.port, log_level='warning', backlog=4096))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI-compatible or Ollama model until interrupted.")
+    parser.add_argument('--kind', choices=('ollama', 'openai'), default='ollama')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--token-rate', type=float, default=None)
+    parser.add_argument('--tool-rounds', type=int, default=0, help="Scripted list_files_in_dir rounds per turn")
+    parser.add_argument('--load-latency', type=float, default=0.0, help="Ollama only: seconds to load a model that is not loaded")
+    args = parser.parse_args()
+
+    script = [{'name': 'list_files_in_dir', 'arguments': {'directory': '.'}}] * args.tool_rounds
+    if args.kind == 'openai':
+        app = openai_app(args.latency, script=script, token_rate=args.token_rate)
+    else:
+        app = ollama_app(args.latency, script=script, token_rate=args.token_rate, load_latency=args.load_latency)
+    prefix = '/v1' if args.kind == 'openai' else '/api'
+    print(f"Fake {args.kind} model on http://127.0.0.1:{args.port}{prefix}")
+    uvicorn.run(app, host='127.0.0.1', port=args.port, log_level='warning')
+
+if __name__ == '__main__':
+    main()
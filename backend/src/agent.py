@@ -1,30 +1,104 @@
 import json
+import asyncio
+from typing import AsyncIterator, Iterator
 from .memory.local_memory import MemoryStore
-from .providers.base import LLMProvider
+from .providers.base import LLMProvider, AsyncLLMProvider
 from .tools.file_ops import (
-    list_files_schema, read_file_schema, edit_file_schema, get_weather_schema, search_web_schema,
-    list_files_in_dir, read_file, edit_file, get_weather, search_web
+    list_files_schema, read_file_schema, edit_file_schema, search_files_schema, get_weather_schema, search_web_schema,
+    list_files_in_dir, read_file, edit_file, search_files, get_weather, search_web
 )
+from .tools.runner import ToolRunner
+from .tools.cache import ToolCache, build_backend
+from .memory.context import ContextManager, HistoryWindow, extractive_summary, summary_request
+from .config.config import Config, configured
+from .metrics import AGENT_STOPS, LLM_RETRIES, TOOL_ROUNDS, observe_llm, span
+from .retry import RetryPolicy
+from .budget import STOP_MESSAGES, Budget, BudgetExceeded
+from .serialization import loads
 
 ALL_TOOLS_SCHEMAS = [
     list_files_schema,
     read_file_schema,
     edit_file_schema,
+    search_files_schema,
     get_weather_schema,
     search_web_schema
 ]
 
-ALL_TOOLS_FUNCTIONS = {
-    'list_files_in_dir': list_files_in_dir,
-    'read_file': read_file,
-    'edit_file': edit_file,
-    'get_weather': get_weather,
-    'search_web': search_web
+# Per-tool timeout (seconds), result cache TTL (seconds) and, for tools that must not overlap,
+# the argument that identifies the shared resource
+TOOL_POLICIES = {
+    'list_files_in_dir': {'timeout': 10},
+    'read_file': {'timeout': 10, 'serial_key': 'path'},
+    'edit_file': {'timeout': 10, 'serial_key': 'path'},
+    'search_files': {'timeout': 10},
+    'get_weather': {'timeout': 15, 'cache_ttl': 600},
+    'search_web': {'timeout': 20, 'cache_ttl': 3600}
 }
 
+# The objects below are built from Config on first use (see configured), not when this module is imported
+
+@configured
+def get_tool_cache() -> ToolCache:
+    return ToolCache(
+        build_backend('tools'),
+        ttls={name: policy['cache_ttl'] for name, policy in TOOL_POLICIES.items() if 'cache_ttl' in policy}
+    )
+
+@configured
+def get_tool_functions() -> dict:
+    return {
+        'list_files_in_dir': list_files_in_dir,
+        'read_file': read_file,
+        'edit_file': edit_file,
+        'search_files': search_files,
+        'get_weather': get_tool_cache().cached('get_weather', get_weather),
+        'search_web': get_tool_cache().cached('search_web', search_web)
+    }
+
+@configured
+def get_tool_runner() -> ToolRunner:
+    return ToolRunner(TOOL_POLICIES, max_workers=Config.TOOL_MAX_WORKERS, default_timeout=Config.TOOL_TIMEOUT)
+
+@configured
+def get_context_manager() -> ContextManager:
+    return ContextManager(
+        Config.MODEL_SETTINGS,
+        default_budget=Config.CONTEXT_DEFAULT_BUDGET,
+        keep_turns=Config.CONTEXT_KEEP_TURNS,
+        tool_output_chars=Config.CONTEXT_TOOL_OUTPUT_CHARS
+    )
+
+SUMMARY_PARAMS = {'temperature': 0.0, 'max_tokens': 300}
+
+@configured
+def get_budget_defaults() -> dict:
+    """Request limits used when params do not set them (see Budget)"""
+    return {
+        'timeout': Config.AGENT_TIMEOUT,
+        'max_rounds': Config.AGENT_MAX_ROUNDS,
+        'max_total_tokens': Config.AGENT_MAX_TOTAL_TOKENS
+    }
+
+PROVIDER_ERROR = "Sorry, there was an error generating the response"
+CANCELLED_TOOL_RESULT = "Error executing tool: the request was stopped before the tool finished"
+
+def _log_retry(error: Exception, delay: float):
+    LLM_RETRIES.inc()
+    print(f"Rate limited, retrying in {delay:.2f}s: {error}")
+
+@configured
+def get_retry_policy() -> RetryPolicy:
+    return RetryPolicy(
+        max_retries=Config.PROVIDER_MAX_RETRIES,
+        base_delay=Config.PROVIDER_RETRY_BASE_DELAY,
+        max_delay=Config.PROVIDER_RETRY_MAX_DELAY,
+        on_retry=_log_retry
+    )
+
 class Agent:
     def __init__(self, 
-                provider: LLMProvider, 
+                provider: LLMProvider | AsyncLLMProvider, 
                 memory: MemoryStore,
                 session_id: str,
                 system: str = '''You are a helpful and accurate assistant.
@@ -33,82 +107,452 @@ class Agent:
                 - Be concise, clear, and direct.
                 - Maintain the context of the conversation''', 
                 tools: list = None,
+                context: ContextManager = None,
                 ):
         self.provider = provider
         self.memory = memory
         self.session_id = session_id
-        self.messages = [{"role": "system", "content": system}]
         self.tools = tools or ALL_TOOLS_SCHEMAS
-        self.tool_functions = ALL_TOOLS_FUNCTIONS
+        self.tool_functions = get_tool_functions()
+        self.context = context or get_context_manager()
         
-        current_history = self.memory.get_messages(self.session_id)
-        if not current_history:
+        # Local copy of the stored history, cut down to what prompts still need after each round;
+        # each round only fetches what was appended since
+        self._window = HistoryWindow()
+
+        if self.memory.get_version(self.session_id) == 0:
             self.memory.add_message(self.session_id, {"role": "system", "content": system})
 
-    def process_input(self, user_input: str, params: dict = None) -> tuple[str, list[str]]:
-        tool_logs = []
-        self.memory.add_message(self.session_id, {"role": "user", "content": user_input})
-        
-        while True:
-            history = self.memory.get_messages(self.session_id)
+    def _summarize(self, previous_summary: str, messages: list) -> str:
+        try:
+            response = self._call_provider(summary_request(previous_summary, messages), None, SUMMARY_PARAMS)
+            return response['content'] or extractive_summary(previous_summary, messages)
+        except ValueError as e:
+            print(f"Summary error: {e}")
+            return extractive_summary(previous_summary, messages)
+
+    async def _summarize_async(self, previous_summary: str, messages: list) -> str:
+        try:
+            response = await self._call_provider_async(summary_request(previous_summary, messages), None, SUMMARY_PARAMS)
+            return response['content'] or extractive_summary(previous_summary, messages)
+        except ValueError as e:
+            print(f"Summary error: {e}")
+            return extractive_summary(previous_summary, messages)
+
+    def _stale_window(self) -> bool:
+        # The window starts after turns that only the cached summary covered, and that summary was evicted
+        return self._window.first_turn > self.context.folded_turns(self.session_id)
+
+    def get_version(self) -> int:
+        """Number of stored messages, after fetching the new ones; a cursor for history_since()"""
+        if self._stale_window():
+            self._window.reset()
+        self._window.extend(self.memory.get_messages_since(self.session_id, self._window.version))
+        return self._window.version
+
+    async def get_version_async(self) -> int:
+        if self._stale_window():
+            self._window.reset()
+        self._window.extend(await self.memory.get_messages_since_async(self.session_id, self._window.version))
+        return self._window.version
+
+    def history_since(self, cursor: int) -> list:
+        self.get_version()
+        messages = self._window.since(cursor)
+        return messages if messages is not None else self.memory.get_messages_since(self.session_id, cursor)
+
+    async def history_since_async(self, cursor: int) -> list:
+        await self.get_version_async()
+        messages = self._window.since(cursor)
+        return messages if messages is not None else await self.memory.get_messages_since_async(self.session_id, cursor)
+
+    def _context_model(self):
+        # A router (provider 'auto') answers with any of its backends' models
+        return getattr(self.provider, 'models', None) or getattr(self.provider, 'model', None)
+
+    def _history(self) -> list:
+        with span('context'):
+            self.get_version()
+            history = self.context.build(
+                self.session_id,
+                self._window.messages(),
+                model=self._context_model(),
+                summarize=self._summarize,
+                first_turn=self._window.first_turn
+            )
+            self._window.retain(self.context, self.session_id)
+            return history
+
+    async def _history_async(self) -> list:
+        with span('context'):
+            await self.get_version_async()
+            history = await self.context.build_async(
+                self.session_id,
+                self._window.messages(),
+                model=self._context_model(),
+                summarize=self._summarize_async,
+                first_turn=self._window.first_turn
+            )
+            self._window.retain(self.context, self.session_id)
+            return history
+
+    @staticmethod
+    def _tool_calls_message(tool_calls: list) -> dict:
+        formatted_tool_calls = [
+            {
+                "id": call["id"],
+                "type": "function",
+                "function": {
+                    "name": call["function"]["name"],
+                    "arguments": call["function"]["arguments"]
+                }
+            }
+            for call in tool_calls
+        ]
+
+        return {
+            "role": "assistant",
+            "content": None,  
+            "tool_calls": formatted_tool_calls
+        }
+
+    def _parse_tool_calls(self, tool_calls: list) -> tuple[list, list, list]:
+        names, args_list, logs = [], [], []
+        for call in tool_calls:
+            fn_name = call['function']['name']
             try:
-                response = self.provider.generate_response(history, self.tools, params)
-            except ValueError as e:
-                print(f"Provider error: {e}")
-                return "Sorry, there was an error generating the response", tool_logs
-
-            if response['tool_calls']:
-                formatted_tool_calls = [
-                    {
-                        "id": call["id"],
-                        "type": "function",
-                        "function": {
-                            "name": call["function"]["name"],
-                            "arguments": call["function"]["arguments"]
-                        }
-                    }
-                    for call in response['tool_calls']
-                ]
-                
-                self.memory.add_message(self.session_id, {
-                    "role": "assistant",
-                    "content": None,  
-                    "tool_calls": formatted_tool_calls
-                })
-
-                for call in response['tool_calls']:
-                    fn_name = call['function']['name']
-                    try:
-                        args = json.loads(call['function']['arguments'])
-                    except json.JSONDecodeError:
-                        print("Error parsing arguments from the tool call")
-                        args = {}
-
-                    log_msg = f"Calling tool: {fn_name} with arguments: {args}"
-                    tool_logs.append(log_msg)
-                    print(log_msg)
-
-                    if fn_name in self.tool_functions:
-                        try:
-                            result = self.tool_functions[fn_name](**args)
-                        except Exception as e:
-                            result = f"Error executing tool: {str(e)}"
-                            print(result)
-
-                        self.memory.add_message(self.session_id, {
-                            "role": "tool",
-                            "tool_call_id": call['id'],
-                            "name": fn_name,
-                            "content": str(result)
-                        })
-                    else:
-                        self.memory.add_message(self.session_id, {
-                            "role": "tool",
-                            "tool_call_id": call['id'],
-                            "name": fn_name,
-                            "content": "Tool not found"
-                        })
+                args = loads(call['function']['arguments'])
+            except json.JSONDecodeError:
+                print("Error parsing arguments from the tool call")
+                args = {}
+
+            log_msg = f"Calling tool: {fn_name} with arguments: {args}"
+            print(log_msg)
+            names.append(fn_name)
+            args_list.append(args)
+            logs.append(log_msg)
+        return names, args_list, logs
+
+    def _execute_tool(self, fn_name: str, args: dict) -> str:
+        if fn_name not in self.tool_functions:
+            return "Tool not found"
+        try:
+            result = self.tool_functions[fn_name](**args)
+        except Exception as e:
+            result = f"Error executing tool: {str(e)}"
+            print(result)
+        return str(result)
+
+    @staticmethod
+    def _tool_result_messages(tool_calls: list, names: list, results: list) -> list:
+        # Appended in the original tool_call order, whatever order the tools finished in
+        return [
+            {
+                "role": "tool",
+                "tool_call_id": call['id'],
+                "name": fn_name,
+                "content": result
+            }
+            for call, fn_name, result in zip(tool_calls, names, results)
+        ]
+
+    def _record(self, *messages: dict):
+        for message in messages:
+            self.memory.add_message(self.session_id, message)
+
+    async def _record_async(self, *messages: dict):
+        """_record() for the async paths: a store doing I/O is called from a worker thread (see MemoryStore.blocking)"""
+        for message in messages:
+            await self.memory.add_message_async(self.session_id, message)
+
+    def _run_tool_calls(self, tool_calls: list, budget: Budget) -> list[str]:
+        budget.rounds += 1
+        self._record(self._tool_calls_message(tool_calls))
+        names, args_list, logs = self._parse_tool_calls(tool_calls)
+        results = get_tool_runner().run(names, args_list, self._execute_tool, deadline=budget.deadline)
+        self._record(*self._tool_result_messages(tool_calls, names, results))
+        return logs
+
+    async def _run_tool_calls_async(self, tool_calls: list, budget: Budget) -> list[str]:
+        budget.rounds += 1
+        await self._record_async(self._tool_calls_message(tool_calls))
+        names, args_list, logs = self._parse_tool_calls(tool_calls)
+        try:
+            results = await get_tool_runner().run_async(names, args_list, self._execute_tool, deadline=budget.deadline)
+        except asyncio.CancelledError:
+            # Every recorded tool_call needs its result, or providers reject the session's next request
+            await self._record_async(*self._tool_result_messages(tool_calls, names, [CANCELLED_TOOL_RESULT] * len(names)))
+            raise
+        await self._record_async(*self._tool_result_messages(tool_calls, names, results))
+        return logs
+
+    def _budget(self, params: dict) -> tuple[Budget, dict]:
+        return Budget.from_params(params, get_budget_defaults())
+
+    @staticmethod
+    def _stop_content(reason: str, partial: str = '') -> str:
+        """Closes the turn when a limit was hit (or the client left), keeping whatever was streamed so far."""
+        AGENT_STOPS.inc(reason=reason)
+        content = STOP_MESSAGES[reason]
+        if partial:
+            content = f"{partial}\n\n{content}"
+        return content
+
+    def _stop(self, reason: str, partial: str = '') -> str:
+        content = self._stop_content(reason, partial)
+        self._record({"role": "assistant", "content": content})
+        return content
+
+    async def _stop_async(self, reason: str, partial: str = '') -> str:
+        content = self._stop_content(reason, partial)
+        await self._record_async({"role": "assistant", "content": content})
+        return content
+
+    def _tools_for(self, budget: Budget):
+        return self.tools if budget.tools_allowed() else None
+
+    @staticmethod
+    def _final_content(response: dict) -> str:
+        """The final answer of a response without tool calls (or asking for tools after the last round)."""
+        if response['tool_calls']:
+            raise BudgetExceeded('max_rounds')
+        return response['content']
+
+    def _answer(self, response: dict) -> str:
+        final_content = self._final_content(response)
+        self._record({"role": "assistant", "content": final_content})
+        return final_content
+
+    async def _answer_async(self, response: dict) -> str:
+        final_content = self._final_content(response)
+        await self._record_async({"role": "assistant", "content": final_content})
+        return final_content
+
+    def _call_provider_once(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        with observe_llm(self.provider) as call:
+            response = self.provider.generate_response(messages, tools, params)
+            call.response(response)
+            return response
+
+    def _call_provider(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        return get_retry_policy().call(lambda: self._call_provider_once(messages, tools, params))
+
+    def _stream_once(self, history: list, tools: list = None, params: dict = None) -> Iterator[dict]:
+        with observe_llm(self.provider) as call:
+            for event in self.provider.generate_response_stream(history, tools, params):
+                call.first_event()
+                if event['type'] == 'response':
+                    call.response(event)
+                yield event
+
+    def _generate_stream(self, history: list, tools: list = None, params: dict = None) -> Iterator[dict]:
+        return get_retry_policy().stream(lambda: self._stream_once(history, tools, params))
+
+    def process_input(self, user_input: str, params: dict = None, budget: Budget = None) -> tuple[str, list[str]]:
+        """
+        Runs the model/tool loop until the model answers or a limit in params (see Budget) is reached;
+        pass `budget` to keep a handle for cancel().
+        """
+        request_budget, params = self._budget(params)
+        budget = budget or request_budget
+        tool_logs = []
+        self._record({"role": "user", "content": user_input})
+
+        try:
+            while True:
+                budget.check()
+                history = self._history()
+                try:
+                    response = self._call_provider(history, self._tools_for(budget), params)
+                except ValueError as e:
+                    print(f"Provider error: {e}")
+                    return PROVIDER_ERROR, tool_logs
+                budget.add_usage(response)
+
+                if response['tool_calls'] and budget.tools_allowed():
+                    tool_logs.extend(self._run_tool_calls(response['tool_calls'], budget))
+                else:
+                    return self._answer(response), tool_logs
+        except BudgetExceeded as e:
+            return self._stop(e.reason), tool_logs
+        finally:
+            TOOL_ROUNDS.observe(budget.rounds)
+
+    def process_input_stream(self, user_input: str, params: dict = None, budget: Budget = None) -> Iterator[dict]:
+        """
+        Same loop as process_input, but forwards tokens as the provider produces them.
+        Yields: {'type': 'token', 'content': str}, {'type': 'tool_call', ...} fragments,
+                {'type': 'tool', 'log': str} after each executed tool
+                and finally {'type': 'done', 'content': str, 'tool_logs': list}.
+        """
+        request_budget, params = self._budget(params)
+        budget = budget or request_budget
+        tool_logs = []
+        partial = ''
+        finished = False
+        self._record({"role": "user", "content": user_input})
+
+        try:
+            while True:
+                budget.check()
+                history = self._history()
+                response = None
+                partial = ''
+                try:
+                    for event in self._generate_stream(history, self._tools_for(budget), params):
+                        if event['type'] == 'response':
+                            response = event
+                            continue
+                        # A sync provider call cannot be interrupted, but the stream can stop between events
+                        budget.check_time()
+                        if event['type'] == 'content':
+                            partial += event['delta']
+                            yield {'type': 'token', 'content': event['delta']}
+                        elif event['type'] == 'tool_call':
+                            yield event
+                except ValueError as e:
+                    print(f"Provider error: {e}")
+                    finished = True
+                    yield {'type': 'done', 'content': PROVIDER_ERROR, 'tool_logs': tool_logs}
+                    return
+                budget.add_usage(response)
+
+                if response['tool_calls'] and budget.tools_allowed():
+                    for log_msg in self._run_tool_calls(response['tool_calls'], budget):
+                        tool_logs.append(log_msg)
+                        yield {'type': 'tool', 'log': log_msg}
+                else:
+                    content = self._answer(response)
+                    finished = True
+                    yield {'type': 'done', 'content': content, 'tool_logs': tool_logs}
+                    return
+        except BudgetExceeded as e:
+            finished = True
+            yield {'type': 'done', 'content': self._stop(e.reason, partial), 'tool_logs': tool_logs}
+        except GeneratorExit:
+            # The consumer stopped reading before the answer was complete
+            if not finished:
+                self._stop('cancelled', partial)
+            raise
+        finally:
+            TOOL_ROUNDS.observe(budget.rounds)
+
+    async def _call_provider_once_async(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        with observe_llm(self.provider) as call:
+            if isinstance(self.provider, AsyncLLMProvider):
+                response = await self.provider.generate_response(messages, tools, params)
             else:
-                final_content = response['content']
-                self.memory.add_message(self.session_id, {"role": "assistant", "content": final_content})
-                return final_content, tool_logs
\ No newline at end of file
+                response = await asyncio.to_thread(self.provider.generate_response, messages, tools, params)
+            call.response(response)
+            return response
+
+    async def _call_provider_async(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        return await get_retry_policy().call_async(lambda: self._call_provider_once_async(messages, tools, params))
+
+    async def _cancelled(self, partial: str = ''):
+        """The request's task was cancelled (client disconnect): close the turn in memory before unwinding."""
+        await self._stop_async('cancelled', partial)
+
+    async def _provider_stream_async(self, history: list, tools: list = None, params: dict = None) -> AsyncIterator[dict]:
+        if isinstance(self.provider, AsyncLLMProvider):
+            async for event in self.provider.generate_response_stream(history, tools, params):
+                yield event
+            return
+        events = iter(self.provider.generate_response_stream(history, tools, params))
+        while (event := await asyncio.to_thread(next, events, None)) is not None:
+            yield event
+
+    async def _stream_once_async(self, history: list, tools: list = None, params: dict = None) -> AsyncIterator[dict]:
+        with observe_llm(self.provider) as call:
+            async for event in self._provider_stream_async(history, tools, params):
+                call.first_event()
+                if event['type'] == 'response':
+                    call.response(event)
+                yield event
+
+    def _generate_stream_async(self, history: list, tools: list = None, params: dict = None) -> AsyncIterator[dict]:
+        return get_retry_policy().stream_async(lambda: self._stream_once_async(history, tools, params))
+
+    async def process_input_async(self, user_input: str, params: dict = None) -> tuple[str, list[str]]:
+        """
+        Same loop as process_input, awaiting the provider instead of blocking a thread on it.
+        Sync providers and tools are run in worker threads. The deadline cancels the pending model call,
+        and cancelling the task (client disconnect) stops it at once, with the partial turn recorded.
+        """
+        budget, params = self._budget(params)
+        tool_logs = []
+        await self._record_async({"role": "user", "content": user_input})
+
+        try:
+            while True:
+                budget.check()
+                history = await budget.bounded(self._history_async())
+                try:
+                    response = await budget.bounded(self._call_provider_async(history, self._tools_for(budget), params))
+                except ValueError as e:
+                    print(f"Provider error: {e}")
+                    return PROVIDER_ERROR, tool_logs
+                budget.add_usage(response)
+
+                if response['tool_calls'] and budget.tools_allowed():
+                    tool_logs.extend(await self._run_tool_calls_async(response['tool_calls'], budget))
+                else:
+                    return await self._answer_async(response), tool_logs
+        except BudgetExceeded as e:
+            return await self._stop_async(e.reason), tool_logs
+        except asyncio.CancelledError:
+            await self._cancelled()
+            raise
+        finally:
+            TOOL_ROUNDS.observe(budget.rounds)
+
+    async def process_input_stream_async(self, user_input: str, params: dict = None) -> AsyncIterator[dict]:
+        """Async version of process_input_stream, same events."""
+        budget, params = self._budget(params)
+        tool_logs = []
+        partial = ''
+        finished = False
+        await self._record_async({"role": "user", "content": user_input})
+
+        try:
+            while True:
+                budget.check()
+                history = await budget.bounded(self._history_async())
+                response = None
+                partial = ''
+                try:
+                    events = self._generate_stream_async(history, self._tools_for(budget), params)
+                    async for event in budget.bounded_stream(events):
+                        if event['type'] == 'content':
+                            partial += event['delta']
+                            yield {'type': 'token', 'content': event['delta']}
+                        elif event['type'] == 'tool_call':
+                            yield event
+                        elif event['type'] == 'response':
+                            response = event
+                except ValueError as e:
+                    print(f"Provider error: {e}")
+                    finished = True
+                    yield {'type': 'done', 'content': PROVIDER_ERROR, 'tool_logs': tool_logs}
+                    return
+                budget.add_usage(response)
+
+                if response['tool_calls'] and budget.tools_allowed():
+                    for log_msg in await self._run_tool_calls_async(response['tool_calls'], budget):
+                        tool_logs.append(log_msg)
+                        yield {'type': 'tool', 'log': log_msg}
+                else:
+                    content = await self._answer_async(response)
+                    finished = True
+                    yield {'type': 'done', 'content': content, 'tool_logs': tool_logs}
+                    return
+        except BudgetExceeded as e:
+            finished = True
+            yield {'type': 'done', 'content': await self._stop_async(e.reason, partial), 'tool_logs': tool_logs}
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client disconnect: the task was cancelled or the consumer stopped reading
+            if not finished:
+                await self._cancelled(partial)
+            raise
+        finally:
+            TOOL_ROUNDS.observe(budget.rounds)
@@ -0,0 +1,119 @@
+"""
+Batch runs for offline evaluation: many independent prompts through throwaway agents, with bounded fan-out.
+
+Each item is a dict: {'message': str, 'provider': str, 'id': optional str, 'params': optional dict}
+(params as for Agent.process_input: temperature, max_tokens and the request limits of src/budget.py).
+Results come back as each item finishes, not in submission order:
+    {'index', 'id', 'provider', 'ok', 'content' or 'error', 'tool_logs', 'latency_ms'[, 'backends']}
+An item that hit a provider error or one of its limits is not ok; 'error' holds the agent's answer.
+Every item gets its own session in a private InMemoryStore that is dropped when the item is done,
+so a batch leaves no sessions behind; providers are the shared, pooled ProviderFactory instances.
+"""
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import AsyncIterator, Callable, Iterator
+from .agent import Agent, PROVIDER_ERROR
+from .budget import STOP_MESSAGES
+from .memory.local_memory import InMemoryStore
+from .providers.factory import ProviderFactory
+from .providers.routing import start_route_log, use_backend_slots
+from .scheduler import Overloaded
+
+def _session_id() -> str:
+    return f"batch_{uuid.uuid4().hex[:12]}"
+
+def _result(index: int, item: dict, started: float, routes: list, content: str = None, tool_logs: list = None,
+            error: str = None) -> dict:
+    # The agent answers provider errors and hit limits with a message; for an eval they are failures
+    if error is None and (content == PROVIDER_ERROR or (content or '').endswith(tuple(STOP_MESSAGES.values()))):
+        error = content
+    result = {
+        'index': index,
+        'id': item.get('id', str(index)),
+        'provider': item['provider'],
+        'ok': error is None,
+        'tool_logs': tool_logs or [],
+        'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+    result.update({'content': content} if error is None else {'error': error})
+    if routes:
+        result['backends'] = routes
+    return result
+
+def _run_item(index: int, item: dict, get_provider: Callable) -> dict:
+    started = time.perf_counter()
+    routes = start_route_log()
+    session_id = _session_id()
+    agent = None
+    try:
+        agent = Agent(get_provider(item['provider']), memory=InMemoryStore(), session_id=session_id)
+        content, tool_logs = agent.process_input(item['message'], item.get('params'))
+        return _result(index, item, started, routes, content, tool_logs)
+    except Exception as e:
+        return _result(index, item, started, routes, error=str(e))
+    finally:
+        if agent is not None:
+            agent.context.forget(session_id)
+
+async def _run_item_async(index: int, item: dict, get_provider: Callable, slot: Callable = None) -> dict:
+    started = time.perf_counter()
+    routes = start_route_log()
+    session_id = _session_id()
+    agent = None
+    try:
+        agent = Agent(get_provider(item['provider']), memory=InMemoryStore(), session_id=session_id)
+        if slot is not None:
+            use_backend_slots(lambda backend: slot(backend, session_id))
+        async with (slot(item['provider'], session_id) if slot is not None else nullcontext()):
+            content, tool_logs = await agent.process_input_async(item['message'], item.get('params'))
+        return _result(index, item, started, routes, content, tool_logs)
+    except Overloaded as e:
+        return _result(index, item, started, routes, error=e.detail)
+    except Exception as e:
+        return _result(index, item, started, routes, error=str(e))
+    finally:
+        if agent is not None:
+            agent.context.forget(session_id)
+
+def iter_batch(items: list, concurrency: int = 4, get_provider: Callable = ProviderFactory.get_provider) -> Iterator[dict]:
+    """
+    Runs the items on `concurrency` threads with the sync providers, yielding results as they finish.
+    Closing the iterator early drops the items that have not started.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as executor:
+        futures = [executor.submit(_run_item, index, item, get_provider) for index, item in enumerate(items)]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+async def run_batch(items: list, concurrency: int = 4, get_provider: Callable = ProviderFactory.get_async_provider,
+                    slot: Callable = None) -> AsyncIterator[dict]:
+    """
+    Async version of iter_batch: `concurrency` workers on the event loop. `slot(provider, session_id)`, e.g.
+    Scheduler.slot, is held around each item so batches share the provider limits with interactive traffic.
+    Closing the iterator early cancels the items still running.
+    """
+    pending = asyncio.Queue()
+    for index, item in enumerate(items):
+        pending.put_nowait((index, item))
+    results = asyncio.Queue()
+
+    async def worker():
+        while not pending.empty():
+            index, item = pending.get_nowait()
+            await results.put(await _run_item_async(index, item, get_provider, slot))
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable
+
+STOP_MESSAGES = {
+    'timeout': "Stopped: the request ran out of time before finishing.",
+    'max_rounds': "Stopped: the request used all its tool rounds before finishing.",
+    'max_total_tokens': "Stopped: the request used its whole token budget before finishing.",
+    'cancelled': "Stopped: the request was cancelled."
+}
+
+class BudgetExceeded(Exception):
+    """Raised inside the agent loop when a limit is reached; the loop answers with the stop message instead."""
+
+    def __init__(self, reason: str):
+        super().__init__(STOP_MESSAGES[reason])
+        self.reason = reason
+
+
+class Budget:
+    """
+    Limits of one agent request, passed in `params` next to the temperature (and removed before the
+    provider sees them); Config supplies the defaults. Each one is optional:
+      timeout           seconds for the whole request: context building, model calls and tools
+      max_rounds        tool rounds; after the last one the model is asked to answer without tools
+      max_total_tokens  prompt + completion tokens across the request's calls, as reported by the provider
+    Async callers are cut off at the deadline (the pending HTTP call is cancelled); sync loops check the
+    limits and `cancel()` between model calls and stream events.
+    """
+    KEYS = ('timeout', 'max_rounds', 'max_total_tokens')
+
+    def __init__(self, timeout: float = None, max_rounds: int = None, max_total_tokens: int = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.max_rounds = max_rounds
+        self.max_total_tokens = max_total_tokens
+        self.rounds = 0
+        self.tokens = 0
+        self.cancelled = False
+
+    @classmethod
+    def from_params(cls, params: dict, defaults: dict = None) -> tuple['Budget', dict]:
+        """Splits `params` into the request's Budget and the params meant for the provider."""
+        provider_params = dict(params or {})
+        limits = {key: provider_params.pop(key, None) for key in cls.KEYS}
+        for key, value in (defaults or {}).items():
+            if limits.get(key) is None:
+                limits[key] = value
+        return cls(**limits), provider_params
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self):
+        """Stops a sync loop at its next check (safe to call from another thread)."""
+        self.cancelled = True
+
+    def tools_allowed(self) -> bool:
+        return self.max_rounds is None or self.rounds < self.max_rounds
+
+    def add_usage(self, response: dict):
+        usage = response.get('usage') or {}
+        self.tokens += (usage.get('prompt_tokens') or 0) + (usage.get('completion_tokens') or 0)
+
+    def check_time(self):
+        if self.cancelled:
+            raise BudgetExceeded('cancelled')
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise BudgetExceeded('timeout')
+
+    def check(self):
+        """Called before each model call."""
+        self.check_time()
+        if self.max_total_tokens is not None and self.tokens >= self.max_total_tokens:
+            raise BudgetExceeded('max_total_tokens')
+
+    async def bounded(self, awaitable: Awaitable):
+        """Awaits within the deadline; on expiry the awaitable is cancelled."""
+        remaining = self.remaining()
+        if remaining is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            raise BudgetExceeded('timeout')
+
+    async def bounded_stream(self, events: AsyncIterator[dict]) -> AsyncIterator[dict]:
+        iterator = events.__aiter__()
+        try:
+            while True:
+                try:
+                    event = await self.bounded(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield event
+        finally:
+            if hasattr(iterator, 'aclose'):
+                await iterator.aclose()
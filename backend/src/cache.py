@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str):
+        """Returns the cached value, or None when missing or expired"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: float = None):
+        """Stores a JSON-serializable value; ttl=None keeps it until evicted"""
+        pass
+
+
+class InProcessCache(CacheBackend):
+    """LRU dict with per-entry expiry, local to the worker process."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by every worker; Redis handles expiry and, with maxmemory-policy allkeys-lru, the size bound."""
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', client=None, prefix: str = 'cache:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: float = None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+
+class DiskCache(CacheBackend):
+    """
+    One JSON file per key under `directory`; survives restarts and can be committed as test fixtures.
+    At most `max_entries` files are kept (oldest written first out).
+    """
+
+    def __init__(self, directory: str, max_entries: int = None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key.replace(':', '_').replace('/', '_') + '.json')
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires_at') is not None and entry['expires_at'] <= time.time():
+            return None
+        return entry['value']
+
+    def set(self, key: str, value, ttl: float = None):
+        path = self._path(key)
+        entry = {'key': key, 'value': value, 'expires_at': time.time() + ttl if ttl else None}
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, path)
+        if self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        with self._lock:
+            files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+            if len(files) <= self.max_entries:
+                return
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - self.max_entries]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
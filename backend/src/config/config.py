@@ -1,17 +1,139 @@
 import os
-import yaml
-from dotenv import load_dotenv
-
-load_dotenv()
-
-models_path = os.path.join(os.path.dirname(__file__), 'models.yaml')
-with open(models_path, 'r') as f:
-    models_data = yaml.safe_load(f)
-
-class Config:
-    OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-    HF_API_KEY = os.getenv('HF_API_KEY')
-    OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL')
-    OPENAI_MODEL = models_data['openai']['model']
-    HF_MODEL = models_data['huggingface']['model']
-    OLLAMA_MODEL = models_data['ollama']['model']
\ No newline at end of file
+from functools import lru_cache
+
+MODELS_PATH = os.path.join(os.path.dirname(__file__), 'models.yaml')
+
+def _keep_alive(value):
+    # Ollama takes a duration string ("30m") or a number of seconds; "-1" from the environment must be sent as a number
+    if isinstance(value, str) and value.lstrip('-').isdigit():
+        return int(value)
+    return value
+
+class Settings:
+    """
+    Resolved configuration: .env, the environment and models.yaml.
+    Built once, on first use, by get_config(); nothing is read when this module is imported.
+    """
+
+    def __init__(self):
+        # Imported here so that importing the config costs nothing until a value is needed
+        import yaml
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        with open(MODELS_PATH, 'r') as f:
+            models_data = yaml.safe_load(f)
+
+        self.OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
+        self.HF_API_KEY = os.getenv('HF_API_KEY')
+        self.OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434/api')
+        self.OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://openrouter.ai/api/v1')
+        self.OPENAI_MODEL = models_data['openai']['model']
+        self.HF_MODEL = models_data['huggingface']['model']
+        self.OLLAMA_MODEL = models_data['ollama']['model']
+        self.OLLAMA_TOOL_MODE = os.getenv('OLLAMA_TOOL_MODE', models_data['ollama'].get('tool_mode', 'native'))
+        # How long Ollama keeps the model loaded after a request ("30m", seconds, -1 for ever; unset: Ollama's default)
+        self.OLLAMA_KEEP_ALIVE = _keep_alive(os.getenv('OLLAMA_KEEP_ALIVE', models_data['ollama'].get('keep_alive')))
+        # Preload the Ollama model at startup and reload it every OLLAMA_WARMUP_INTERVAL seconds if it was evicted.
+        # Off by default: deployments without Ollama would poll a server that is not there and never report ready
+        self.OLLAMA_WARMUP = os.getenv('OLLAMA_WARMUP', 'off').lower() in ('on', 'true', '1')
+        self.OLLAMA_WARMUP_INTERVAL = float(os.getenv('OLLAMA_WARMUP_INTERVAL', 60))
+        # Shared HTTP connection pools used by the providers
+        self.HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 120))
+        self.HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+        self.HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+        self.HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', 100))
+        # Admission control: concurrent requests per provider (max_concurrency in models.yaml overrides the default)
+        # and per session, plus the bounded wait queue in front of them
+        self.PROVIDER_MAX_CONCURRENCY = int(os.getenv('PROVIDER_MAX_CONCURRENCY', 32))
+        self.PROVIDER_CONCURRENCY = {
+            name: models_data[key]['max_concurrency']
+            for name, key in (('openai', 'openai'), ('hf', 'huggingface'), ('ollama', 'ollama'))
+            if 'max_concurrency' in models_data.get(key, {})
+        }
+        self.SESSION_MAX_CONCURRENCY = int(os.getenv('SESSION_MAX_CONCURRENCY', 1))
+        self.SCHEDULER_MAX_QUEUE = int(os.getenv('SCHEDULER_MAX_QUEUE', 100))
+        self.SCHEDULER_SESSION_QUEUE = int(os.getenv('SCHEDULER_SESSION_QUEUE', 5))
+        self.SCHEDULER_QUEUE_TIMEOUT = float(os.getenv('SCHEDULER_QUEUE_TIMEOUT', 30))
+        # provider='auto': route between these providers by latency and health, optionally hedging slow calls
+        self.ROUTING_BACKENDS = [name.strip() for name in os.getenv('ROUTING_BACKENDS', 'openai,ollama').split(',') if name.strip()]
+        self.ROUTING_HEDGE = os.getenv('ROUTING_HEDGE', 'off').lower() in ('on', 'true', '1')
+        self.ROUTING_HEDGE_MIN_DELAY = float(os.getenv('ROUTING_HEDGE_MIN_DELAY', 0.05))
+        self.ROUTING_FAILURE_THRESHOLD = int(os.getenv('ROUTING_FAILURE_THRESHOLD', 3))
+        self.ROUTING_RESET_TIMEOUT = float(os.getenv('ROUTING_RESET_TIMEOUT', 30))
+        self.ROUTING_WINDOW = int(os.getenv('ROUTING_WINDOW', 100))
+        # Retries of rate-limited provider calls (exponential backoff with full jitter)
+        self.PROVIDER_MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', 3))
+        self.PROVIDER_RETRY_BASE_DELAY = float(os.getenv('PROVIDER_RETRY_BASE_DELAY', 0.5))
+        self.PROVIDER_RETRY_MAX_DELAY = float(os.getenv('PROVIDER_RETRY_MAX_DELAY', 8))
+        # Default limits of one agent request; a request can override them in params (see src/budget.py)
+        self.AGENT_TIMEOUT = float(os.getenv('AGENT_TIMEOUT', 120))
+        self.AGENT_MAX_ROUNDS = int(os.getenv('AGENT_MAX_ROUNDS', 10))
+        self.AGENT_MAX_TOTAL_TOKENS = int(os.getenv('AGENT_MAX_TOTAL_TOKENS')) if os.getenv('AGENT_MAX_TOTAL_TOKENS') else None
+        # POST /chat/batch: items run at once by default and at most, and items per request
+        self.BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 4))
+        self.BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 16))
+        self.BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 1000))
+        # Tool calls of one assistant turn run concurrently on a bounded pool
+        self.TOOL_MAX_WORKERS = int(os.getenv('TOOL_MAX_WORKERS', 8))
+        self.TOOL_TIMEOUT = float(os.getenv('TOOL_TIMEOUT', 30))
+        # Conversation history backend ('sqlite', 'redis' or 'memory') and the in-process Agent cache
+        self.MEMORY_BACKEND = os.getenv('MEMORY_BACKEND', 'sqlite')
+        self.MEMORY_DB_PATH = os.getenv('MEMORY_DB_PATH', 'chat_memory.db')
+        # 'memory' backend: tool outputs of at least MEMORY_COMPRESS_MIN_CHARS are compressed once their turn is this many turns old
+        # ('off': never)
+        compress_after = os.getenv('MEMORY_COMPRESS_AFTER_TURNS', '4')
+        self.MEMORY_COMPRESS_AFTER_TURNS = None if compress_after.lower() == 'off' else int(compress_after)
+        self.MEMORY_COMPRESS_MIN_CHARS = int(os.getenv('MEMORY_COMPRESS_MIN_CHARS', 4096))
+        self.REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        self.REDIS_TTL = int(os.getenv('REDIS_TTL')) if os.getenv('REDIS_TTL') else None
+        self.SESSION_MAX_AGENTS = int(os.getenv('SESSION_MAX_AGENTS', 1000))
+        self.SESSION_TTL = int(os.getenv('SESSION_TTL', 3600))
+        # Requests of one session run one at a time; identical submissions within this window share one run (unset: off)
+        self.SESSION_MERGE_WINDOW = float(os.getenv('SESSION_MERGE_WINDOW')) if os.getenv('SESSION_MERGE_WINDOW') else None
+        # Per-model context settings from models.yaml, keyed by model name
+        self.MODEL_SETTINGS = {entry['model']: entry for entry in models_data.values()}
+        self.CONTEXT_DEFAULT_BUDGET = int(os.getenv('CONTEXT_DEFAULT_BUDGET', 8000))
+        self.CONTEXT_KEEP_TURNS = int(os.getenv('CONTEXT_KEEP_TURNS', 4))
+        self.CONTEXT_TOOL_OUTPUT_CHARS = int(os.getenv('CONTEXT_TOOL_OUTPUT_CHARS', 2000))
+        # Tool-result cache ('memory' or 'redis'); per-tool TTLs live in TOOL_POLICIES
+        self.TOOL_CACHE_BACKEND = os.getenv('TOOL_CACHE_BACKEND', 'memory')
+        self.TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', 10000))
+        # Opt-in LLM response cache: LLM_CACHE 'off', 'memory' or 'disk'; LLM_CACHE_MODE 'cache', 'record' or 'replay'
+        self.LLM_CACHE = os.getenv('LLM_CACHE', 'off')
+        self.LLM_CACHE_MODE = os.getenv('LLM_CACHE_MODE', 'cache')
+        self.LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', 'llm-cache')
+        self.LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL')) if os.getenv('LLM_CACHE_TTL') else None
+        self.LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 10000))
+
+
+@lru_cache(maxsize=None)
+def get_config() -> Settings:
+    return Settings()
+
+# cache_clear of every configured() builder, run by reset_config()
+_configured = []
+
+def configured(build):
+    """
+    For objects built from the settings (caches, worker pools, policies): build() runs on the first call and
+    its result is shared until reset_config(), so importing the module that declares them reads nothing.
+    """
+    cached = lru_cache(maxsize=None)(build)
+    _configured.append(cached.cache_clear)
+    return cached
+
+def reset_config():
+    """Drops the resolved settings and what was built from them, so the next access re-reads the environment (benchmarks, tests)."""
+    get_config.cache_clear()
+    for cache_clear in _configured:
+        cache_clear()
+
+
+class _ConfigProxy:
+    """`Config.NAME` reads get_config().NAME, so the settings are resolved on first access, once."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_config(), name)
+
+Config = _ConfigProxy()
@@ -1,7 +1,12 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Callable, List, Dict
 
 class MemoryStore(ABC):
+    # Whether the methods do I/O (disk, network): if so, the *_async variants run them in a worker thread
+    # so the event loop keeps serving other requests. In-process stores set it to False.
+    blocking = True
+
     @abstractmethod
     def get_messages(self, session_id: str) -> list:
         """Retrieve the message history from a session"""
@@ -10,4 +15,43 @@ class MemoryStore(ABC):
     @abstractmethod
     def add_message(self, session_id: str, message: dict):
         """Save a new message in the history"""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def delete_session(self, session_id: str):
+        """Remove the whole history of a session"""
+        pass
+
+    def get_version(self, session_id: str) -> int:
+        """Number of messages stored so far; the history is append-only, so it doubles as a cursor"""
+        return len(self.get_messages(session_id))
+
+    def get_messages_since(self, session_id: str, cursor: int) -> list:
+        """Messages appended after `cursor` (a previous get_version value)"""
+        return list(self.get_messages(session_id)[cursor:])
+
+    def get_messages_page(self, session_id: str, offset: int = 0, limit: int = 100) -> list:
+        """A slice of the history, for paginated reads"""
+        return list(self.get_messages(session_id)[offset:offset + limit])
+
+    def stats(self) -> dict:
+        """Store size for monitoring: {'sessions': int, 'messages': int}, or {} when it is too costly to know"""
+        return {}
+
+    async def run_async(self, fn: Callable, *args):
+        """Calls fn(*args), a blocking call on this store, without stalling the event loop"""
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def add_message_async(self, session_id: str, message: dict):
+        await self.run_async(self.add_message, session_id, message)
+
+    async def get_version_async(self, session_id: str) -> int:
+        return await self.run_async(self.get_version, session_id)
+
+    async def get_messages_since_async(self, session_id: str, cursor: int) -> list:
+        return await self.run_async(self.get_messages_since, session_id, cursor)
+
+    async def get_messages_page_async(self, session_id: str, offset: int = 0, limit: int = 100) -> list:
+        return await self.run_async(self.get_messages_page, session_id, offset, limit)
@@ -0,0 +1,72 @@
+import sys
+import zlib
+
+class MessageRecord:
+    """
+    One stored message in slots instead of a dict. Short repeated strings (roles, tool names) and system
+    prompts are interned, so sessions share them; tool calls are kept as (id, name, arguments) tuples.
+    `content` may be zlib-compressed bytes (see compress()); to_message() rebuilds the provider-facing dict.
+    Keys other than the usual ones are kept as they are in `extra`.
+    """
+    __slots__ = ('role', 'content', 'name', 'tool_call_id', 'tool_calls', 'extra')
+    KEYS = ('role', 'content', 'name', 'tool_call_id', 'tool_calls')
+
+    def __init__(self, message: dict):
+        self.role = sys.intern(message['role'])
+        content = message.get('content')
+        self.content = sys.intern(content) if self.role == 'system' and isinstance(content, str) else content
+        name = message.get('name')
+        self.name = sys.intern(name) if isinstance(name, str) else None
+        self.tool_call_id = message.get('tool_call_id')
+        self.tool_calls = _pack_tool_calls(message.get('tool_calls'))
+        # Anything not held in a slot (other keys, or a value of an unexpected shape) is kept verbatim;
+        # checked key by key only when the message has such a key, which the agent's messages never do
+        self.extra = None
+        if (len(message) > 2 + (self.name is not None) + (self.tool_call_id is not None) + (self.tool_calls is not None)
+                or 'content' not in message):
+            self.extra = {
+                key: value for key, value in message.items()
+                if key not in self.KEYS or key != 'content' and getattr(self, key) is None
+            } or None
+
+    def compress(self, min_chars: int) -> bool:
+        """Swaps a long text content for its zlib-compressed UTF-8 when that is smaller."""
+        if not isinstance(self.content, str) or len(self.content) < min_chars:
+            return False
+        # Level 1: about a third faster than the default for a few percent more bytes
+        packed = zlib.compress(self.content.encode('utf-8'), 1)
+        if len(packed) >= len(self.content):
+            return False
+        self.content = packed
+        return True
+
+    def to_message(self) -> dict:
+        message = {'role': self.role}
+        if self.tool_call_id is not None:
+            message['tool_call_id'] = self.tool_call_id
+        if self.name is not None:
+            message['name'] = self.name
+        content = self.content
+        message['content'] = zlib.decompress(content).decode('utf-8') if isinstance(content, bytes) else content
+        if self.tool_calls is not None:
+            message['tool_calls'] = [
+                {'id': call_id, 'type': 'function', 'function': {'name': name, 'arguments': arguments}}
+                for call_id, name, arguments in self.tool_calls
+            ]
+        if self.extra:
+            message.update(self.extra)
+        return message
+
+
+def _pack_tool_calls(tool_calls):
+    """(id, name, arguments) tuples for a non-empty list of calls in the agent's format, otherwise None."""
+    if not isinstance(tool_calls, list) or not tool_calls:
+        return None
+    packed = []
+    for call in tool_calls:
+        function = call.get('function') if isinstance(call, dict) else None
+        if (set(call or ()) != {'id', 'type', 'function'} or call['type'] != 'function'
+                or not isinstance(function, dict) or set(function) != {'name', 'arguments'}):
+            return None
+        packed.append((call['id'], sys.intern(function['name']), function['arguments']))
+    return tuple(packed)
@@ -0,0 +1,286 @@
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below in a few sentences for the assistant's own reference. "
+    "Keep facts, user preferences, decisions, file names and tool results that may be needed later."
+)
+
+class TokenCounter:
+    """Counts tokens with tiktoken when it is installed, otherwise approximates ~4 characters per token."""
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, encoding: str = None):
+        self._encoder = None
+        if encoding:
+            try:
+                import tiktoken
+                self._encoder = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                print(f"Tokenizer {encoding!r} unavailable, estimating tokens from characters: {e}")
+
+    def count_text(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoder is not None:
+            return len(self._encoder.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def count_message(self, message: dict) -> int:
+        tokens = self.MESSAGE_OVERHEAD + self.count_text(message.get('content'))
+        for call in message.get('tool_calls') or []:
+            tokens += self.count_text(call['function']['name']) + self.count_text(call['function']['arguments'])
+        return tokens
+
+    def count(self, messages: list) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+
+def split_turns(messages: list) -> tuple[list, list]:
+    """Returns (leading system messages, turns); every turn starts at a user message, so tool calls never get split."""
+    start = 0
+    while start < len(messages) and messages[start]['role'] == 'system':
+        start += 1
+    turns = []
+    for message in messages[start:]:
+        if message['role'] == 'user' or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return messages[:start], turns
+
+
+def transcript(messages: list, tool_output_chars: int = 500) -> str:
+    lines = []
+    for message in messages:
+        if message.get('tool_calls'):
+            calls = ', '.join(f"{c['function']['name']}({c['function']['arguments']})" for c in message['tool_calls'])
+            lines.append(f"assistant called: {calls}")
+        elif message['role'] == 'tool':
+            lines.append(f"tool {message.get('name', '')}: {(message.get('content') or '')[:tool_output_chars]}")
+        else:
+            lines.append(f"{message['role']}: {message.get('content') or ''}")
+    return '\n'.join(lines)
+
+
+def summary_request(previous_summary: str, messages: list) -> list:
+    """Messages asking a model to fold `messages` into the running summary."""
+    text = transcript(messages)
+    if previous_summary:
+        text = f"Summary so far:\n{previous_summary}\n\nNew messages:\n{text}"
+    return [{'role': 'system', 'content': SUMMARY_PROMPT}, {'role': 'user', 'content': text}]
+
+
+def extractive_summary(previous_summary: str, messages: list, chars: int = 200) -> str:
+    """Summarizer that needs no model: the opening of every user and assistant message."""
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        if message['role'] in ('user', 'assistant') and message.get('content'):
+            lines.append(f"{message['role']}: {message['content'][:chars]}")
+    return '\n'.join(lines)
+
+
+def elided(content: str) -> str:
+    return f"[tool output elided: {len(content)} chars]"
+
+def is_elided(content: str) -> bool:
+    return content.startswith('[tool output elided: ') and content.endswith(' chars]')
+
+
+class ContextManager:
+    """
+    Sits between the MemoryStore and the provider and keeps each prompt within a token budget:
+    - tool outputs older than `keep_turns` turns are elided, the rest are truncated to `tool_output_chars`
+      (the current turn is always sent whole);
+    - when the history is still over budget, the oldest turns are folded into a rolling summary
+      that is cached per session, so each turn is summarized only once.
+    build() takes the whole history or, with `first_turn`, the part retain() kept of it.
+    """
+    FOLD_TARGET = 0.75
+
+    def __init__(self, model_settings: dict = None, default_budget: int = 8000, keep_turns: int = 4,
+                 tool_output_chars: int = 2000, max_sessions: int = 10000):
+        self.model_settings = model_settings or {}
+        self.default_budget = default_budget
+        self.keep_turns = keep_turns
+        self.tool_output_chars = tool_output_chars
+        self.max_sessions = max_sessions
+        self._counters = {}
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _limiting(self, model):
+        # A tuple of models (a router picks one per call): the prompt is sized for the one with the smallest budget
+        if isinstance(model, tuple):
+            return min(model, key=self.budget_for, default=None)
+        return model
+
+    def budget_for(self, model) -> int:
+        model = self._limiting(model)
+        return self.model_settings.get(model, {}).get('context_budget', self.default_budget)
+
+    def counter_for(self, model) -> TokenCounter:
+        model = self._limiting(model)
+        counter = self._counters.get(model)
+        if counter is None:
+            counter = TokenCounter(self.model_settings.get(model, {}).get('tokenizer'))
+            self._counters[model] = counter
+        return counter
+
+    def _compact_tool_outputs(self, turns: list) -> list:
+        compacted = []
+        for age, turn in zip(range(len(turns) - 1, -1, -1), turns):
+            if age == 0:
+                compacted.append(turn)
+                continue
+            new_turn = []
+            for message in turn:
+                content = message.get('content') or ''
+                if message['role'] == 'tool' and age >= self.keep_turns:
+                    if not is_elided(content):
+                        message = {**message, 'content': elided(content)}
+                elif message['role'] == 'tool' and len(content) > self.tool_output_chars:
+                    message = {**message, 'content': content[:self.tool_output_chars] + f"... [truncated {len(content) - self.tool_output_chars} chars]"}
+                new_turn.append(message)
+            compacted.append(new_turn)
+        return compacted
+
+    def folded_turns(self, session_id: str) -> int:
+        """How many turns of the session are in its cached summary (0 when none or evicted)."""
+        with self._lock:
+            return self._summaries.get(session_id, (0, None))[0]
+
+    def _plan(self, session_id: str, messages: list, model: str, first_turn: int = 0) -> dict:
+        system, turns = split_turns(messages)
+        turns = self._compact_tool_outputs(turns)
+        with self._lock:
+            folded, summary = self._summaries.get(session_id, (0, None))
+        # Indexes into `turns`, whose first one is turn `first_turn` of the session
+        folded -= first_turn
+        if not 0 <= folded < len(turns):
+            folded, summary = 0, None
+
+        counter = self.counter_for(model)
+        turn_tokens = [counter.count(turn) for turn in turns[folded:]]
+        total = counter.count(system) + counter.count_text(summary) + sum(turn_tokens)
+        budget = self.budget_for(model)
+
+        # Fold the oldest turns until the rest fits; the current turn is never folded.
+        # Folding down to a lower target leaves headroom, so the summarizer runs every few turns, not every turn.
+        fold = 0
+        target = budget * self.FOLD_TARGET if total > budget else budget
+        while total > target and fold < len(turn_tokens) - 1:
+            total -= turn_tokens[fold]
+            fold += 1
+        return {
+            'system': system, 'turns': turns, 'folded': folded, 'summary': summary, 'fold': fold,
+            'first_turn': first_turn
+        }
+
+    def _assemble(self, session_id: str, plan: dict, summary: str) -> list:
+        folded = plan['folded'] + plan['fold']
+        if plan['fold']:
+            with self._lock:
+                self._summaries[session_id] = (plan['first_turn'] + folded, summary)
+                self._summaries.move_to_end(session_id)
+                while len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+
+        system = list(plan['system'])
+        if summary:
+            note = f"\n\nSummary of the earlier conversation:\n{summary}"
+            if system:
+                system[0] = {**system[0], 'content': (system[0].get('content') or '') + note}
+            else:
+                system = [{'role': 'system', 'content': note.lstrip()}]
+        return system + [message for turn in plan['turns'][folded:] for message in turn]
+
+    def _to_fold(self, plan: dict) -> list:
+        start = plan['folded']
+        return [message for turn in plan['turns'][start:start + plan['fold']] for message in turn]
+
+    def build(self, session_id: str, messages: list, model: str = None,
+              summarize: Callable[[str, list], str] = extractive_summary, first_turn: int = 0) -> list:
+        """Returns the messages to send; `messages` itself is never modified."""
+        plan = self._plan(session_id, messages, model, first_turn)
+        summary = plan['summary']
+        if plan['fold']:
+            summary = summarize(summary, self._to_fold(plan))
+        return self._assemble(session_id, plan, summary)
+
+    async def build_async(self, session_id: str, messages: list, model: str = None,
+                          summarize: Callable[[str, list], Awaitable[str]] = None, first_turn: int = 0) -> list:
+        plan = self._plan(session_id, messages, model, first_turn)
+        summary = plan['summary']
+        if plan['fold']:
+            to_fold = self._to_fold(plan)
+            summary = await summarize(summary, to_fold) if summarize else extractive_summary(summary, to_fold)
+        return self._assemble(session_id, plan, summary)
+
+    def retain(self, session_id: str, turns: list, first_turn: int = 0) -> tuple[int, list]:
+        """
+        What later prompts still need of a history's `turns` (split_turns() output, the first being turn
+        `first_turn` of the session): turns already folded into the summary are dropped and tool outputs old
+        enough to be elided are elided. build() with the result gives the same prompts as with the full history,
+        as long as the summary stays cached (see folded_turns()). Returns (new first_turn, turns).
+        """
+        drop = min(max(self.folded_turns(session_id) - first_turn, 0), len(turns) - 1)
+        kept = turns[drop:] if drop > 0 else turns
+        for age, turn in zip(range(len(kept) - 1, -1, -1), kept):
+            if age < self.keep_turns:
+                break
+            for index, message in enumerate(turn):
+                content = message.get('content') or ''
+                if message['role'] == 'tool' and not is_elided(content):
+                    turn[index] = {**message, 'content': elided(content)}
+        return first_turn + drop, kept
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._summaries.pop(session_id, None)
+
+
+class HistoryWindow:
+    """
+    An agent's local copy of a session's history, reduced to what prompts still need (ContextManager.retain):
+    the leading system messages, then the turns from `first_turn` on. `version` counts the stored messages
+    seen so far, so only newer ones are fetched.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.system = []
+        self.turns = []
+        self.first_turn = 0
+        self.version = 0
+
+    def extend(self, messages: list):
+        # Same split as split_turns()
+        for message in messages:
+            if not self.turns and message['role'] == 'system':
+                self.system.append(message)
+            elif message['role'] == 'user' or not self.turns:
+                self.turns.append([message])
+            else:
+                self.turns[-1].append(message)
+        self.version += len(messages)
+
+    def messages(self) -> list:
+        return self.system + [message for turn in self.turns for message in turn]
+
+    def since(self, cursor: int):
+        """The messages from store index `cursor` on, or None when they are no longer held."""
+        wanted = self.version - cursor
+        tail = []
+        for turn in reversed(self.turns):
+            if len(tail) >= wanted:
+                break
+            tail[:0] = turn
+        if len(tail) < wanted:
+            return None
+        return tail[len(tail) - wanted:]
+
+    def retain(self, context: ContextManager, session_id: str):
+        self.first_turn, self.turns = context.retain(session_id, self.turns, self.first_turn)
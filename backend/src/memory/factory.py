@@ -0,0 +1,19 @@
+from .base import MemoryStore
+from .local_memory import InMemoryStore
+from .sqlite_memory import SQLiteMemory
+from .memory import RedisMemory
+from ..config.config import Config
+
+class MemoryFactory:
+    @staticmethod
+    def get_store(name: str = None) -> MemoryStore:
+        name = (name or Config.MEMORY_BACKEND).lower()
+        if name == 'sqlite':
+            return SQLiteMemory(path=Config.MEMORY_DB_PATH)
+        elif name == 'redis':
+            return RedisMemory(url=Config.REDIS_URL, ttl=Config.REDIS_TTL)
+        elif name == 'memory':
+            return InMemoryStore(compress_after_turns=Config.MEMORY_COMPRESS_AFTER_TURNS,
+                                 compress_min_chars=Config.MEMORY_COMPRESS_MIN_CHARS)
+        else:
+            raise ValueError(f"Invalid memory backend: {name}")
@@ -1,13 +1,72 @@
 from .base import MemoryStore
+from .compact import MessageRecord
+
+class _Session:
+    __slots__ = ('records', 'turn_starts')
 
-class InMemoryStore(MemoryStore):
     def __init__(self):
+        self.records = []
+        self.turn_starts = []  # index of each user message
+
+
+class InMemoryStore(MemoryStore):
+    """
+    History kept in process as compact MessageRecords (see compact.py): system prompts and tool names
+    are shared between sessions, and tool outputs of at least `compress_min_chars` are zlib-compressed once
+    their turn is `compress_after_turns` turns old (None: never). Reads return new provider-facing dicts.
+    """
+    blocking = False
+
+    def __init__(self, compress_after_turns: int = 4, compress_min_chars: int = 4096):
         self._storage = {}
+        self._message_count = 0
+        self.compress_after_turns = compress_after_turns
+        self.compress_min_chars = compress_min_chars
+
+    def _messages(self, session_id: str, start: int = 0, stop: int = None) -> list:
+        session = self._storage.get(session_id)
+        if session is None:
+            return []
+        return [record.to_message() for record in session.records[start:stop]]
 
     def get_messages(self, session_id: str):
-        return self._storage.get(session_id, [])
+        return self._messages(session_id)
 
     def add_message(self, session_id: str, message: dict):
-        if session_id not in self._storage:
-            self._storage[session_id] = []
-        self._storage[session_id].append(message)
\ No newline at end of file
+        session = self._storage.get(session_id)
+        if session is None:
+            session = self._storage[session_id] = _Session()
+        if message['role'] == 'user':
+            session.turn_starts.append(len(session.records))
+            self._compress_old_turn(session)
+        session.records.append(MessageRecord(message))
+        self._message_count += 1
+
+    def _compress_old_turn(self, session: _Session):
+        # Called as each turn starts, so every turn is compressed exactly once, when it reaches the age limit
+        age = self.compress_after_turns
+        if age is None or len(session.turn_starts) <= age:
+            return
+        start = session.turn_starts[-age - 1]
+        stop = session.turn_starts[-age]
+        for record in session.records[start:stop]:
+            if record.role == 'tool':
+                record.compress(self.compress_min_chars)
+
+    def delete_session(self, session_id: str):
+        session = self._storage.pop(session_id, None)
+        if session is not None:
+            self._message_count -= len(session.records)
+
+    def get_version(self, session_id: str) -> int:
+        session = self._storage.get(session_id)
+        return len(session.records) if session is not None else 0
+
+    def get_messages_since(self, session_id: str, cursor: int) -> list:
+        return self._messages(session_id, cursor)
+
+    def get_messages_page(self, session_id: str, offset: int = 0, limit: int = 100) -> list:
+        return self._messages(session_id, offset, offset + limit)
+
+    def stats(self) -> dict:
+        return {'sessions': len(self._storage), 'messages': self._message_count}
@@ -1,4 +1,46 @@
 from typing import List, Dict
 from .base import MemoryStore
+from ..serialization import dumps, loads
 
-class RedisMemory(MemoryStore): pass
\ No newline at end of file
+class RedisMemory(MemoryStore):
+    """
+    History kept in one Redis list per session, shared by every worker and host.
+    Pass an existing client (e.g. fakeredis.FakeRedis()) or a url; 'redis' is only needed in the latter case.
+    ttl: seconds of inactivity after which a session expires (None keeps it forever).
+    """
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', client=None, ttl: int = None, prefix: str = 'chat:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def get_messages(self, session_id: str) -> list:
+        return [loads(item) for item in self.client.lrange(self._key(session_id), 0, -1)]
+
+    def add_message(self, session_id: str, message: dict):
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, dumps(message))
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def delete_session(self, session_id: str):
+        self.client.delete(self._key(session_id))
+
+    def get_version(self, session_id: str) -> int:
+        return self.client.llen(self._key(session_id))
+
+    def get_messages_since(self, session_id: str, cursor: int) -> list:
+        return [loads(item) for item in self.client.lrange(self._key(session_id), cursor, -1)]
+
+    def get_messages_page(self, session_id: str, offset: int = 0, limit: int = 100) -> list:
+        if limit <= 0:
+            return []
+        return [loads(item) for item in self.client.lrange(self._key(session_id), offset, offset + limit - 1)]
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+from .base import MemoryStore
+from ..serialization import dumps_str, loads
+
+class SQLiteMemory(MemoryStore):
+    """
+    Persistent history in a local SQLite file (WAL mode), so sessions survive restarts
+    and can be read by several uvicorn workers on the same host.
+    """
+
+    def __init__(self, path: str = 'chat_memory.db'):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            # One transaction, so no worker can insert between the initial count and the triggers
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                ) WITHOUT ROWID
+            ''')
+            # Totals for stats(), kept by triggers so reading them costs one row, not a table scan;
+            # a session is counted by its first message (seq 0)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS message_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    sessions INTEGER NOT NULL,
+                    messages INTEGER NOT NULL
+                )
+            ''')
+            conn.execute(
+                'INSERT OR IGNORE INTO message_stats SELECT 0, COUNT(DISTINCT session_id), COUNT(*) FROM messages'
+            )
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS message_stats_insert AFTER INSERT ON messages BEGIN
+                    UPDATE message_stats SET messages = messages + 1, sessions = sessions + (NEW.seq = 0) WHERE id = 0;
+                END
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS message_stats_delete AFTER DELETE ON messages BEGIN
+                    UPDATE message_stats SET messages = messages - 1, sessions = sessions - (OLD.seq = 0) WHERE id = 0;
+                END
+            ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, so each thread opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_messages(self, session_id: str) -> list:
+        rows = self._connection().execute(
+            'SELECT data FROM messages WHERE session_id = ? ORDER BY seq', (session_id,)
+        ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def add_message(self, session_id: str, message: dict):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO messages (session_id, seq, data) '
+                'SELECT ?, COALESCE(MAX(seq) + 1, 0), ? FROM messages WHERE session_id = ?',
+                (session_id, dumps_str(message), session_id)
+            )
+
+    def delete_session(self, session_id: str):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+
+    def get_version(self, session_id: str) -> int:
+        row = self._connection().execute(
+            'SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return row[0]
+
+    def get_messages_since(self, session_id: str, cursor: int) -> list:
+        rows = self._connection().execute(
+            'SELECT data FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq', (session_id, cursor)
+        ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def get_messages_page(self, session_id: str, offset: int = 0, limit: int = 100) -> list:
+        rows = self._connection().execute(
+            'SELECT data FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq LIMIT ?', (session_id, offset, limit)
+        ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def stats(self) -> dict:
+        sessions, messages = self._connection().execute(
+            'SELECT sessions, messages FROM message_stats WHERE id = 0'
+        ).fetchone()
+        return {'sessions': sessions, 'messages': messages}
@@ -0,0 +1,270 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+from .providers.base import RateLimitError
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 12, 20)
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def samples(self) -> list:
+        """[(suffix, label string, value)]"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [('', _format_labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """A value set by the code, or read from `callback` at scrape time (a None result is skipped)."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), callback: Callable[[], float] = None):
+        super().__init__(name, help, labels)
+        self.callback = callback
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> list:
+        if self.callback is not None:
+            # A labelled gauge's callback returns {label value (or tuple of values): value}
+            value = self.callback()
+            if value is None:
+                return []
+            if isinstance(value, dict):
+                return [
+                    ('', _format_labels(self.labels, key if isinstance(key, tuple) else (key,)), v)
+                    for key, v in sorted(value.items())
+                ]
+            return [('', '', value)]
+        with self._lock:
+            return [('', _format_labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    samples.append(('_bucket', _format_labels(self.labels, key, f'le="{_format_value(bound)}"'), count))
+                samples.append(('_sum', _format_labels(self.labels, key), series[-2]))
+                samples.append(('_count', _format_labels(self.labels, key), series[-1]))
+        return samples
+
+
+class Registry:
+    """Minimal Prometheus registry: metrics are created once by name and rendered in the text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: tuple = (), callback: Callable[[], float] = None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, help, labels)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+LLM_LATENCY = REGISTRY.histogram(
+    'llm_request_seconds', 'Duration of generate_response calls (whole stream for streaming calls); outcome ok, error or rate_limited',
+    ('provider', 'model', 'outcome')
+)
+LLM_FIRST_TOKEN = REGISTRY.histogram(
+    'llm_first_token_seconds', 'Time to the first streamed event of a streaming call', ('provider', 'model')
+)
+LLM_RETRIES = REGISTRY.counter('llm_retries_total', 'Provider calls retried after a rate-limit error')
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'Tokens reported by the provider', ('provider', 'model', 'kind')
+)
+TOOL_LATENCY = REGISTRY.histogram('tool_seconds', 'Tool execution time', ('tool', 'outcome'))
+TOOL_QUEUE_WAIT = REGISTRY.histogram('tool_queue_wait_seconds', 'Time a tool call waited for a worker thread', ('tool',))
+TOOL_TIMEOUTS = REGISTRY.counter('tool_timeouts_total', 'Tool calls abandoned after their timeout', ('tool',))
+TOOL_ROUNDS = REGISTRY.histogram(
+    'agent_tool_rounds', 'Tool rounds (model calls that asked for tools) per request', buckets=COUNT_BUCKETS
+)
+AGENT_STOPS = REGISTRY.counter(
+    'agent_stops_total', 'Requests stopped before the model answered (timeout, max_rounds, max_total_tokens, cancelled)',
+    ('reason',)
+)
+ROUTER_REQUESTS = REGISTRY.counter(
+    'router_backend_requests_total', 'Calls the routing provider sent to each backend; outcome ok, error or cancelled',
+    ('backend', 'outcome')
+)
+ROUTER_HEDGES = REGISTRY.counter('router_hedges_total', 'Hedged second requests started by the routing provider')
+MODEL_LOAD_LATENCY = REGISTRY.histogram(
+    'model_load_seconds', 'Time to load (or confirm loaded) a local model during warm-up and refresh', ('provider', 'model')
+)
+SCHEDULER_REJECTED = REGISTRY.counter(
+    'scheduler_rejected_total', 'Requests refused by admission control', ('provider', 'status')
+)
+REQUEST_LATENCY = REGISTRY.histogram('http_request_seconds', 'Chat request duration', ('endpoint', 'status'))
+
+
+# Per-request tracing: spans are only collected while a Trace is active in the current context
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, name: str, started: float, duration: float, **attrs):
+        self.spans.append({
+            'name': name,
+            'start_ms': round((started - self.started) * 1000, 2),
+            'duration_ms': round(duration * 1000, 2),
+            **attrs
+        })
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times the block into the active trace, if any. Yields the attrs dict so the block can add to it."""
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, started, time.perf_counter() - started, **attrs)
+
+
+class LLMCall:
+    """Records one provider call: latency by outcome, time to first token and token usage."""
+
+    def __init__(self, provider):
+        self.labels = {
+            'provider': getattr(provider, 'name', None) or type(provider).__name__,
+            'model': getattr(provider, 'model', None) or ''
+        }
+        self.started = time.perf_counter()
+        self._first = False
+
+    def first_event(self):
+        if not self._first:
+            self._first = True
+            LLM_FIRST_TOKEN.observe(time.perf_counter() - self.started, **self.labels)
+
+    def response(self, response: dict):
+        usage = response.get('usage') or {}
+        for kind in ('prompt', 'completion'):
+            if usage.get(f'{kind}_tokens'):
+                LLM_TOKENS.inc(usage[f'{kind}_tokens'], kind=kind, **self.labels)
+
+@contextmanager
+def observe_llm(provider):
+    call = LLMCall(provider)
+    outcome = 'error'
+    with span('llm', **call.labels) as attrs:
+        try:
+            yield call
+            outcome = 'ok'
+        except RateLimitError:
+            outcome = 'rate_limited'
+            raise
+        finally:
+            attrs['outcome'] = outcome
+            LLM_LATENCY.observe(time.perf_counter() - call.started, outcome=outcome, **call.labels)
@@ -1,3 +1,22 @@
-from .openai import OpenAIProvider
-from .huggingface import HuggingFaceProvider
-from .ollama import OllamaProvider
\ No newline at end of file
+"""
+Provider classes are imported on first use: each module pulls in its SDK (openai, huggingface_hub, httpx),
+and a deployment usually talks to a single provider. `from src.providers import OpenAIProvider` still works.
+"""
+import importlib
+
+_MODULES = {
+    'OpenAIProvider': '.openai',
+    'AsyncOpenAIProvider': '.openai',
+    'HuggingFaceProvider': '.huggingface',
+    'AsyncHuggingFaceProvider': '.huggingface',
+    'OllamaProvider': '.ollama',
+    'AsyncOllamaProvider': '.ollama'
+}
+
+def __getattr__(name: str):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
+
+__all__ = list(_MODULES)
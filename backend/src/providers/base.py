@@ -1,4 +1,33 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Iterator
+
+# Statuses a provider uses to say "slow down": throttling, or an overloaded server (Ollama's queue is full)
+RATE_LIMIT_STATUSES = (429, 503)
+
+class RateLimitError(ValueError):
+    """The provider is throttling. `retry_after` is the wait in seconds it asked for, when it sent one."""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _status_and_headers(error: Exception):
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    return status, getattr(response, 'headers', None) or {}
+
+def provider_error(provider: str, error: Exception) -> ValueError:
+    """The ValueError every provider raises, as a RateLimitError when the HTTP status says to back off."""
+    message = f"Error in {provider}: {str(error)}"
+    status, headers = _status_and_headers(error)
+    if status in RATE_LIMIT_STATUSES:
+        try:
+            retry_after = float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            retry_after = None
+        return RateLimitError(message, retry_after=retry_after)
+    return ValueError(message)
+
 
 class LLMProvider(ABC):
     @abstractmethod
@@ -7,5 +36,142 @@ class LLMProvider(ABC):
         Generates a response from the LLM.
         Returns: {‘content’: str or None, ‘tool_calls’: list of dicts}
         Each tool_call: {‘id’: str, ‘function’: {‘name’: str, ‘arguments’: str}}
+        Providers that know it add 'usage': {'prompt_tokens': int, 'completion_tokens': int}
+        """
+        pass
+
+    def generate_response_stream(self, messages: list, tools: list = None, params: dict = None) -> Iterator[dict]:
         """
-        pass
\ No newline at end of file
+        Generates a response from the LLM as a stream of events.
+        Yields: {'type': 'content', 'delta': str} for every text token,
+                {'type': 'tool_call', 'index': int, 'id': str, 'name': str, 'arguments': str} for every tool-call fragment,
+                and finally {'type': 'response', 'content': ..., 'tool_calls': [...]} with the assembled response
+                (same shape as generate_response).
+        Providers without native streaming fall back to a single chunk.
+        """
+        response = self.generate_response(messages, tools, params)
+        if response['content']:
+            yield {'type': 'content', 'delta': response['content']}
+        yield {'type': 'response', **response}
+
+    def close(self):
+        """Releases pooled connections held by the provider"""
+        pass
+
+
+class AsyncLLMProvider(ABC):
+    """Async counterpart of LLMProvider, so a request waits on a socket instead of holding a worker thread."""
+
+    @abstractmethod
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        """Same contract as LLMProvider.generate_response"""
+        pass
+
+    async def generate_response_stream(self, messages: list, tools: list = None, params: dict = None) -> AsyncIterator[dict]:
+        """Same events as LLMProvider.generate_response_stream"""
+        response = await self.generate_response(messages, tools, params)
+        if response['content']:
+            yield {'type': 'content', 'delta': response['content']}
+        yield {'type': 'response', **response}
+
+    async def aclose(self):
+        """Releases pooled connections held by the provider"""
+        pass
+
+
+class ToolCallAssembler:
+    """Rebuilds complete tool calls from the fragments sent by streaming APIs."""
+
+    def __init__(self):
+        self._calls = {}
+
+    def add(self, index: int, id: str = None, name: str = None, arguments: str = None) -> dict:
+        call = self._calls.setdefault(index, {'id': None, 'function': {'name': '', 'arguments': ''}})
+        if id:
+            call['id'] = id
+        if name:
+            call['function']['name'] += name
+        if arguments:
+            call['function']['arguments'] += arguments
+        return {'type': 'tool_call', 'index': index, 'id': id, 'name': name, 'arguments': arguments or ''}
+
+    def tool_calls(self) -> list:
+        calls = []
+        for index in sorted(self._calls):
+            call = self._calls[index]
+            calls.append({
+                'id': call['id'] or f"call_{index}",
+                'function': dict(call['function'])
+            })
+        return calls
+
+
+def parse_usage(usage) -> dict:
+    if usage is None:
+        return None
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', None) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', None) or 0
+    }
+
+
+class ChatCompletionStream:
+    """Turns OpenAI-style chat.completion.chunk objects into stream events."""
+
+    def __init__(self):
+        self.content = []
+        self.assembler = ToolCallAssembler()
+        self.usage = None
+
+    def feed(self, chunk) -> list:
+        # With include_usage the last chunk carries the token counts and no choices
+        if getattr(chunk, 'usage', None):
+            self.usage = parse_usage(chunk.usage)
+        if not chunk.choices:
+            return []
+        delta = chunk.choices[0].delta
+        events = []
+        if delta.content:
+            self.content.append(delta.content)
+            events.append({'type': 'content', 'delta': delta.content})
+        for call in (delta.tool_calls or []):
+            events.append(self.assembler.add(
+                call.index,
+                id=call.id,
+                name=call.function.name if call.function else None,
+                arguments=call.function.arguments if call.function else None
+            ))
+        return events
+
+    def response(self) -> dict:
+        tool_calls = self.assembler.tool_calls()
+        response = {
+            'type': 'response',
+            'content': ''.join(self.content) if not tool_calls else None,
+            'tool_calls': tool_calls
+        }
+        if self.usage:
+            response['usage'] = self.usage
+        return response
+
+
+def parse_completion(completion) -> dict:
+    """Normalizes an OpenAI-style chat completion into {'content', 'tool_calls'}."""
+    choice = completion.choices[0].message
+    tool_calls = [
+        {
+            'id': call.id,
+            'function': {
+                'name': call.function.name,
+                'arguments': call.function.arguments
+            }
+        } for call in (choice.tool_calls or [])
+    ]
+    response = {
+        'content': choice.content if not tool_calls else None,
+        'tool_calls': tool_calls
+    }
+    usage = parse_usage(getattr(completion, 'usage', None))
+    if usage:
+        response['usage'] = usage
+    return response
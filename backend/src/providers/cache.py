@@ -0,0 +1,129 @@
+import hashlib
+import json
+from .base import LLMProvider, AsyncLLMProvider
+from ..cache import CacheBackend
+
+MODES = ('cache', 'record', 'replay')
+
+def request_key(model: str, messages: list, tools: list, params: dict) -> str:
+    """Canonical hash of everything that determines the model's answer."""
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'tools': tools or [], 'params': params or {}},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _replay_events(response: dict):
+    if response['content']:
+        yield {'type': 'content', 'delta': response['content']}
+    for index, call in enumerate(response['tool_calls']):
+        yield {'type': 'tool_call', 'index': index, 'id': call['id'], 'name': call['function']['name'], 'arguments': call['function']['arguments']}
+    yield {'type': 'response', **response}
+
+
+class _ResponseCache:
+    """
+    Lookup/store policy shared by the sync and async wrappers.
+    - 'cache': answers repeated requests from the store; by default only deterministic ones (temperature 0).
+    - 'record': always calls the model and stores every answer.
+    - 'replay': answers only from the store and never touches the network; a miss is an error.
+    """
+
+    def __init__(self, store: CacheBackend, mode: str = 'cache', ttl: float = None, deterministic_only: bool = True):
+        if mode not in MODES:
+            raise ValueError(f"Invalid cache mode: {mode}")
+        self.store = store
+        self.mode = mode
+        self.ttl = ttl
+        self.deterministic_only = deterministic_only
+        self.hits = 0
+        self.misses = 0
+
+    def _cacheable(self, params: dict) -> bool:
+        if self.mode != 'cache' or not self.deterministic_only:
+            return True
+        return (params or {}).get('temperature', 0.7) == 0
+
+    def lookup(self, key: str, params: dict):
+        if self.mode == 'record' or not self._cacheable(params):
+            return None
+        response = self.store.get(key)
+        if response is not None:
+            self.hits += 1
+            return response
+        self.misses += 1
+        if self.mode == 'replay':
+            raise ValueError(f"No recorded response for request {key[:12]}")
+        return None
+
+    def save(self, key: str, params: dict, response: dict):
+        if self._cacheable(params):
+            normalized = {'content': response['content'], 'tool_calls': response['tool_calls']}
+            self.store.set(key, normalized, None if self.mode == 'record' else self.ttl)
+
+
+class CachedProvider(LLMProvider):
+    """Opt-in response cache around any LLMProvider."""
+
+    def __init__(self, provider: LLMProvider, store: CacheBackend, mode: str = 'cache', ttl: float = None,
+                 deterministic_only: bool = True):
+        self.provider = provider
+        self.name = getattr(provider, 'name', None)
+        self.model = getattr(provider, 'model', None)
+        self.cache = _ResponseCache(store, mode, ttl, deterministic_only)
+
+    def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        key = request_key(self.model, messages, tools, params)
+        response = self.cache.lookup(key, params)
+        if response is None:
+            response = self.provider.generate_response(messages, tools, params)
+            self.cache.save(key, params, response)
+        return response
+
+    def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        key = request_key(self.model, messages, tools, params)
+        response = self.cache.lookup(key, params)
+        if response is not None:
+            yield from _replay_events(response)
+            return
+        for event in self.provider.generate_response_stream(messages, tools, params):
+            if event['type'] == 'response':
+                self.cache.save(key, params, event)
+            yield event
+
+    def close(self):
+        self.provider.close()
+
+
+class AsyncCachedProvider(AsyncLLMProvider):
+    """Async counterpart of CachedProvider."""
+
+    def __init__(self, provider: AsyncLLMProvider, store: CacheBackend, mode: str = 'cache', ttl: float = None,
+                 deterministic_only: bool = True):
+        self.provider = provider
+        self.name = getattr(provider, 'name', None)
+        self.model = getattr(provider, 'model', None)
+        self.cache = _ResponseCache(store, mode, ttl, deterministic_only)
+
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        key = request_key(self.model, messages, tools, params)
+        response = self.cache.lookup(key, params)
+        if response is None:
+            response = await self.provider.generate_response(messages, tools, params)
+            self.cache.save(key, params, response)
+        return response
+
+    async def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        key = request_key(self.model, messages, tools, params)
+        response = self.cache.lookup(key, params)
+        if response is not None:
+            for event in _replay_events(response):
+                yield event
+            return
+        async for event in self.provider.generate_response_stream(messages, tools, params):
+            if event['type'] == 'response':
+                self.cache.save(key, params, event)
+            yield event
+
+    async def aclose(self):
+        await self.provider.aclose()
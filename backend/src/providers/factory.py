@@ -1,18 +1,139 @@
-from .openai import OpenAIProvider
-from .huggingface import HuggingFaceProvider
-from .ollama import OllamaProvider
-from .base import LLMProvider
-from typing import Type
+import threading
+from typing import Callable
+from .base import LLMProvider, AsyncLLMProvider
+from .cache import CachedProvider, AsyncCachedProvider
+from ..cache import InProcessCache, DiskCache
 from ..config.config import Config
 
+# Builders import their provider module (and its SDK) only when the provider is first requested
+
+def _build_openai(is_async: bool):
+    from .openai import OpenAIProvider, AsyncOpenAIProvider
+    from .http import build_http_client, build_async_http_client
+    if is_async:
+        return AsyncOpenAIProvider(api_key=Config.OPENROUTER_API_KEY, base_url=Config.OPENAI_BASE_URL, model=Config.OPENAI_MODEL, http_client=build_async_http_client())
+    return OpenAIProvider(api_key=Config.OPENROUTER_API_KEY, base_url=Config.OPENAI_BASE_URL, model=Config.OPENAI_MODEL, http_client=build_http_client())
+
+def _build_hf(is_async: bool):
+    from .huggingface import HuggingFaceProvider, AsyncHuggingFaceProvider
+    cls = AsyncHuggingFaceProvider if is_async else HuggingFaceProvider
+    # huggingface_hub owns its HTTP sessions: only HTTP_TIMEOUT applies (as a single per-request timeout),
+    # HTTP_CONNECT_TIMEOUT and the pool limits do not
+    return cls(model=Config.HF_MODEL, api_key=Config.HF_API_KEY, timeout=Config.HTTP_TIMEOUT)
+
+def _build_ollama(is_async: bool):
+    from .ollama import OllamaProvider, AsyncOllamaProvider
+    from .http import build_session, build_async_http_client
+    if is_async:
+        return AsyncOllamaProvider(base_url=Config.OLLAMA_BASE_URL, model=Config.OLLAMA_MODEL, client=build_async_http_client(),
+                                   tool_mode=Config.OLLAMA_TOOL_MODE, keep_alive=Config.OLLAMA_KEEP_ALIVE)
+    return OllamaProvider(base_url=Config.OLLAMA_BASE_URL, model=Config.OLLAMA_MODEL, session=build_session(),
+                          tool_mode=Config.OLLAMA_TOOL_MODE, keep_alive=Config.OLLAMA_KEEP_ALIVE)
+
+def _build_router(is_async: bool):
+    from .routing import RoutingProvider, AsyncRoutingProvider
+    options = dict(
+        hedge=Config.ROUTING_HEDGE,
+        hedge_min_delay=Config.ROUTING_HEDGE_MIN_DELAY,
+        failure_threshold=Config.ROUTING_FAILURE_THRESHOLD,
+        reset_timeout=Config.ROUTING_RESET_TIMEOUT,
+        window=Config.ROUTING_WINDOW
+    )
+    if is_async:
+        backends = {name: ProviderFactory.get_async_provider(name) for name in Config.ROUTING_BACKENDS}
+        return AsyncRoutingProvider(backends, **options)
+    backends = {name: ProviderFactory.get_provider(name) for name in Config.ROUTING_BACKENDS}
+    return RoutingProvider(backends, **options)
+
 class ProviderFactory:
+    """
+    Hands out one shared provider per name (and per sync/async flavour).
+    Providers hold no per-conversation state, so every session uses the same instance and,
+    through it, the same pooled keep-alive connections.
+    'auto' is a router over the ROUTING_BACKENDS providers (the same shared, cached instances).
+    """
+    _instances = {}
+    # Reentrant: building the router fetches its backends
+    _lock = threading.RLock()
+
+    _builders = {
+        'openai': _build_openai,
+        'hf': _build_hf,
+        'ollama': _build_ollama,
+        'auto': _build_router
+    }
+
+    @classmethod
+    def register(cls, name: str, builder: Callable[[bool], object]):
+        """Adds a provider: builder(is_async) returns a new LLMProvider (False) or AsyncLLMProvider (True)."""
+        cls._builders[name.lower()] = builder
+
+    @classmethod
+    def _create(cls, name: str, is_async: bool):
+        builder = cls._builders.get(name.lower())
+        if builder is None:
+            raise ValueError(f"Invalid provider: {name}")
+        return builder(is_async)
+
+    @classmethod
+    def create_provider(cls, name: str) -> LLMProvider:
+        return cls._create(name, is_async=False)
+
+    @classmethod
+    def create_async_provider(cls, name: str) -> AsyncLLMProvider:
+        return cls._create(name, is_async=True)
+
     @staticmethod
-    def get_provider(name: str):
-        if name.lower() == 'openai':
-            return OpenAIProvider(api_key=Config.OPENROUTER_API_KEY, model=Config.OPENAI_MODEL)
-        elif name.lower() == 'hf':
-            return HuggingFaceProvider(model=Config.HF_MODEL, api_key=Config.HF_API_KEY)
-        elif name.lower() == 'ollama':
-            return OllamaProvider(base_url=Config.OLLAMA_BASE_URL, model=Config.OLLAMA_MODEL)
+    def _with_cache(provider, name: str):
+        """Wraps the provider in the response cache when LLM_CACHE is enabled."""
+        if Config.LLM_CACHE == 'off' or name == 'auto':  # the router's backends are cached already
+            return provider
+        if Config.LLM_CACHE == 'disk':
+            store = DiskCache(f"{Config.LLM_CACHE_DIR}/{name}", max_entries=Config.LLM_CACHE_MAX_ENTRIES)
+        elif Config.LLM_CACHE == 'memory':
+            store = InProcessCache(Config.LLM_CACHE_MAX_ENTRIES)
         else:
-            raise ValueError(f"Invalid provider: {name}")
\ No newline at end of file
+            raise ValueError(f"Invalid LLM cache: {Config.LLM_CACHE}")
+        wrapper = AsyncCachedProvider if isinstance(provider, AsyncLLMProvider) else CachedProvider
+        return wrapper(provider, store, mode=Config.LLM_CACHE_MODE, ttl=Config.LLM_CACHE_TTL)
+
+    @classmethod
+    def _shared(cls, name: str, is_async: bool):
+        key = (name.lower(), is_async)
+        provider = cls._instances.get(key)
+        if provider is None:
+            with cls._lock:
+                provider = cls._instances.get(key)
+                if provider is None:
+                    provider = cls.create_async_provider(name) if is_async else cls.create_provider(name)
+                    provider = cls._with_cache(provider, name.lower())
+                    cls._instances[key] = provider
+        return provider
+
+    @classmethod
+    def get_provider(cls, name: str) -> LLMProvider:
+        return cls._shared(name, is_async=False)
+
+    @classmethod
+    def get_async_provider(cls, name: str) -> AsyncLLMProvider:
+        """Async clients are bound to the event loop that first uses them, so call this from the app's loop."""
+        return cls._shared(name, is_async=True)
+
+    @classmethod
+    def routing_stats(cls) -> dict:
+        """Per-backend latency, error rate and circuit state of the routers created so far"""
+        return {
+            'async' if is_async else 'sync': provider.stats()
+            for (name, is_async), provider in list(cls._instances.items()) if name == 'auto'
+        }
+
+    @classmethod
+    async def close_all(cls):
+        with cls._lock:
+            instances = list(cls._instances.values())
+            cls._instances.clear()
+        for provider in instances:
+            if isinstance(provider, AsyncLLMProvider):
+                await provider.aclose()
+            else:
+                provider.close()
@@ -0,0 +1,52 @@
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from ..config.config import Config
+
+# Every provider talks to a single host, so the per-client connection cap is the per-host limit.
+# HTTP_POOL_SIZE is how many idle keep-alive connections are kept around between requests.
+
+def http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(Config.HTTP_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT)
+
+def http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=Config.HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=Config.HTTP_POOL_SIZE
+    )
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that applies `timeout` ((connect, read) seconds) to every request that does not set its own."""
+
+    def __init__(self, timeout: tuple, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+def build_session() -> requests.Session:
+    """
+    requests.Session with the same limits as the httpx clients: HTTP_CONNECT_TIMEOUT/HTTP_TIMEOUT on every call,
+    and a keep-alive pool per host that blocks instead of opening more than the per-host limit.
+    urllib3 keeps every pooled connection alive (it has no separate idle cap), so HTTP_POOL_SIZE bounds
+    the number of host pools kept instead.
+    """
+    session = requests.Session()
+    adapter = PooledAdapter(
+        (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_TIMEOUT),
+        pool_connections=Config.HTTP_POOL_SIZE,
+        pool_maxsize=Config.HTTP_MAX_CONNECTIONS_PER_HOST,
+        pool_block=True
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def build_http_client() -> httpx.Client:
+    return httpx.Client(limits=http_limits(), timeout=http_timeout())
+
+def build_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=http_limits(), timeout=http_timeout())
@@ -1,34 +1,74 @@
-from .base import LLMProvider
-from huggingface_hub import InferenceClient
+from .base import LLMProvider, AsyncLLMProvider, ChatCompletionStream, parse_completion, provider_error
+from huggingface_hub import InferenceClient, AsyncInferenceClient
+
+def _completion_kwargs(messages: list, tools: list, params: dict) -> dict:
+    kwargs = dict(
+        messages=messages,
+        temperature=params.get('temperature', 0.7),
+        top_p=params.get('top_p', 1.0),
+        max_tokens=params.get('max_tokens', 512)
+    )
+    # tool_choice is only valid alongside tools; the final no-tools round and summaries send neither
+    if tools:
+        kwargs.update(tools=tools, tool_choice="auto")
+    return kwargs
 
 class HuggingFaceProvider(LLMProvider):
-    def __init__(self, model: str, api_key: str):
-        self.client = InferenceClient(model=model, token=api_key)
+    name = 'hf'
+
+    def __init__(self, model: str, api_key: str, timeout: float = None):
+        self.client = InferenceClient(model=model, token=api_key, timeout=timeout)
+        self.model = model
 
     def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
         params = params or {}
         try:
-            completion = self.client.chat.completions.create(
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-                temperature=params.get('temperature', 0.7),
-                top_p=params.get('top_p', 1.0),
-                max_tokens=params.get('max_tokens', 512)
-            )
-            choice = completion.choices[0].message
-            tool_calls = [
-                {
-                    'id': call.id,
-                    'function': {
-                        'name': call.function.name,
-                        'arguments': call.function.arguments
-                    }
-                } for call in (choice.tool_calls or [])
-            ]
-            return {
-                'content': choice.content if not tool_calls else None,
-                'tool_calls': tool_calls
-            }
+            completion = self.client.chat.completions.create(**_completion_kwargs(messages, tools, params))
+            return parse_completion(completion)
+        except Exception as e:
+            raise provider_error('HuggingFace', e)
+
+    def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        params = params or {}
+        try:
+            stream = self.client.chat.completions.create(**_completion_kwargs(messages, tools, params), stream=True)
+            parser = ChatCompletionStream()
+            for chunk in stream:
+                yield from parser.feed(chunk)
+            yield parser.response()
+        except Exception as e:
+            raise provider_error('HuggingFace', e)
+
+    def close(self):
+        self.client.close()
+
+class AsyncHuggingFaceProvider(AsyncLLMProvider):
+    name = 'hf'
+
+    def __init__(self, model: str, api_key: str, timeout: float = None):
+        # The client opens one pooled httpx session on first use and keeps it until aclose()
+        self.client = AsyncInferenceClient(model=model, token=api_key, timeout=timeout)
+        self.model = model
+
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        params = params or {}
+        try:
+            completion = await self.client.chat.completions.create(**_completion_kwargs(messages, tools, params))
+            return parse_completion(completion)
         except Exception as e:
-            raise ValueError(f"Error in HuggingFace: {str(e)}")
\ No newline at end of file
+            raise provider_error('HuggingFace', e)
+
+    async def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        params = params or {}
+        try:
+            stream = await self.client.chat.completions.create(**_completion_kwargs(messages, tools, params), stream=True)
+            parser = ChatCompletionStream()
+            async for chunk in stream:
+                for event in parser.feed(chunk):
+                    yield event
+            yield parser.response()
+        except Exception as e:
+            raise provider_error('HuggingFace', e)
+
+    async def aclose(self):
+        await self.client.close()
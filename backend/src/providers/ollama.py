@@ -1,50 +1,460 @@
 import json
+import httpx
 import requests
-from .base import LLMProvider
+from .base import LLMProvider, AsyncLLMProvider, ToolCallAssembler, provider_error
+from .http import build_session, build_async_http_client
 
-class OllamaProvider(LLMProvider):
-    def __init__(self, base_url: str = 'http://localhost:11434/api', model: str = 'llama3.2'):
+TOOL_INSTRUCTIONS = (
+    "If you need to call a tool, respond ONLY with JSON: "
+    '{"tool_calls": [{"id": "call_1", "function": {"name": "tool_name", "arguments": {"arg": "value"}}}]}'
+    "\nAvailable tools: "
+)
+
+def _strip_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith('```'):
+        text = text[3:]
+        if text.startswith('json'):
+            text = text[4:]
+        if text.rstrip().endswith('```'):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+def _json_arguments(arguments) -> str:
+    if isinstance(arguments, str):
+        try:
+            json.loads(arguments)
+            return arguments
+        except json.JSONDecodeError:
+            return json.dumps({'input': arguments})
+    return json.dumps(arguments or {})
+
+def _object_arguments(arguments: str) -> dict:
+    try:
+        parsed = json.loads(arguments or '{}')
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+def _normalize_calls(parsed) -> list:
+    # Accepts the shapes models actually produce: {"tool_calls": [...]}, a bare {"function": {...}}
+    # or {"name": ..., "arguments"/"parameters": ...}
+    if not isinstance(parsed, dict):
+        return []
+    if isinstance(parsed.get('tool_calls'), list):
+        calls = parsed['tool_calls']
+    elif 'function' in parsed or 'name' in parsed:
+        calls = [parsed]
+    else:
+        return []
+    normalized = []
+    for call in calls:
+        if not isinstance(call, dict):
+            return []
+        function = call.get('function') if isinstance(call.get('function'), dict) else call
+        name = function.get('name')
+        if not isinstance(name, str) or not name:
+            return []
+        arguments = function.get('arguments', function.get('parameters'))
+        normalized.append({'id': call.get('id'), 'function': {'name': name, 'arguments': _json_arguments(arguments)}})
+    return normalized
+
+def _usage(data: dict) -> dict:
+    if 'eval_count' not in data and 'prompt_eval_count' not in data:
+        return None
+    return {'prompt_tokens': data.get('prompt_eval_count', 0), 'completion_tokens': data.get('eval_count', 0)}
+
+def _native_tool_calls(tool_calls: list, start: int = 0) -> list:
+    # Ollama's own tool calls carry the arguments as an object and may come without an id
+    return [
+        {
+            'id': call.get('id') or f"call_{start + index}",
+            'function': {'name': call['function']['name'], 'arguments': _json_arguments(call['function'].get('arguments'))}
+        }
+        for index, call in enumerate(tool_calls)
+    ]
+
+def parse_tool_calls(content: str, tool_names: set = None) -> list:
+    """
+    Tool calls written as JSON in the content (emulated tool calling), or [] when the content is a plain answer.
+    Tolerates code fences and several consecutive JSON objects; with `tool_names`, calls to unknown
+    tools mean the JSON was an answer, not a call.
+    """
+    text = _strip_fence(content or '')
+    if not text.startswith('{'):
+        return []
+    decoder = json.JSONDecoder()
+    calls = []
+    position = 0
+    while position < len(text):
+        try:
+            parsed, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            return []
+        found = _normalize_calls(parsed)
+        if not found:
+            return []
+        calls.extend(found)
+        while position < len(text) and text[position] in ' \t\r\n,':
+            position += 1
+    if tool_names is not None and any(call['function']['name'] not in tool_names for call in calls):
+        return []
+    for index, call in enumerate(calls):
+        call['id'] = call['id'] or f"call_{index}"
+    return calls
+
+
+class JsonScanner:
+    """Tracks brace depth over streamed text (string- and escape-aware) to tell when the first JSON object closes."""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.closed = False
+
+    def feed(self, text: str):
+        for char in text:
+            if self.closed:
+                return
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                self.closed = self.depth == 0
+
+
+class OllamaStream:
+    """
+    Turns the NDJSON lines of a streamed /api/chat call into stream events.
+    Native tool calls arrive whole in `message.tool_calls`. Emulated ones are JSON in the content, so output
+    that opens with '{' or a code fence is held back; as soon as the first object closes and is not a
+    tool call, everything held back is released as text and the rest streams through.
+    """
+
+    def __init__(self, tool_names: set = None):
+        self.tool_names = tool_names
+        self.content = []
+        self.pending = ''
+        # None: undecided, 'json': holding back a possible tool call, 'text': streaming through
+        self.state = None if tool_names else 'text'
+        self.scanner = JsonScanner()
+        self.json_start = None
+        self.scanned = 0
+        self.assembler = ToolCallAssembler()
+        self.native_calls = 0
+        self.usage = None
+        self.done = False
+
+    def _native_events(self, tool_calls: list) -> list:
+        events = []
+        for call in _native_tool_calls(tool_calls, start=self.native_calls):
+            events.append(self.assembler.add(
+                self.native_calls, id=call['id'], name=call['function']['name'], arguments=call['function']['arguments']
+            ))
+            self.native_calls += 1
+        return events
+
+    def _release(self) -> list:
+        self.state = 'text'
+        text, self.pending = self.pending, ''
+        return [{'type': 'content', 'delta': text}] if text else []
+
+    def _json_start(self):
+        """Offset of the opening brace, None while undecided, -1 when the output is plain text."""
+        head = self.pending.lstrip()
+        offset = len(self.pending) - len(head)
+        if head.startswith('{'):
+            return offset
+        if not head or (len(head) < 3 and '```'.startswith(head)):
+            return None
+        if not head.startswith('```'):
+            return -1
+        newline = head.find('\n')
+        if newline == -1:
+            return None
+        if head[3:newline].strip() not in ('', 'json'):
+            return -1
+        body = head[newline + 1:].lstrip()
+        if not body:
+            return None
+        return offset + head.index('{', newline) if body.startswith('{') else -1
+
+    def _is_tool_call(self, text: str) -> bool:
+        try:
+            parsed, _ = json.JSONDecoder().raw_decode(text)
+        except json.JSONDecodeError:
+            return False
+        calls = _normalize_calls(parsed)
+        return bool(calls) and all(call['function']['name'] in self.tool_names for call in calls)
+
+    def feed(self, line) -> list:
+        if not line:
+            return []
+        data = json.loads(line)
+        self.done = bool(data.get('done'))
+        self.usage = _usage(data) or self.usage
+        message = data.get('message', {})
+        events = self._native_events(message.get('tool_calls') or [])
+        delta = message.get('content', '')
+        if not delta:
+            return events
+        self.content.append(delta)
+        if self.state == 'text':
+            return events + [{'type': 'content', 'delta': delta}]
+        self.pending += delta
+        if self.state is None:
+            self.json_start = self._json_start()
+            if self.json_start is None:
+                return events
+            if self.json_start == -1:
+                return events + self._release()
+            self.state = 'json'
+            self.scanned = self.json_start
+        if self.state == 'json' and not self.scanner.closed:
+            self.scanner.feed(self.pending[self.scanned:])
+            self.scanned = len(self.pending)
+            if self.scanner.closed:
+                # The first object decides: a tool call keeps everything held until finish(), anything else is text
+                if not self._is_tool_call(self.pending[self.json_start:]):
+                    return events + self._release()
+        return events
+
+    def _response(self, content, tool_calls: list) -> dict:
+        response = {'type': 'response', 'content': content, 'tool_calls': tool_calls}
+        if self.usage:
+            response['usage'] = self.usage
+        return response
+
+    def finish(self) -> list:
+        if self.native_calls:
+            return [self._response(None, self.assembler.tool_calls())]
+        full_content = ''.join(self.content)
+        tool_calls = parse_tool_calls(full_content, self.tool_names) if self.state != 'text' else []
+        if tool_calls:
+            events = [
+                self.assembler.add(index, id=call['id'], name=call['function']['name'], arguments=call['function']['arguments'])
+                for index, call in enumerate(tool_calls)
+            ]
+            return events + [self._response(None, self.assembler.tool_calls())]
+        return self._release() + [self._response(full_content, [])]
+
+class OllamaBase:
+    """
+    Payload building and response parsing shared by the sync and async Ollama providers.
+    tool_mode 'native' sends the schemas in Ollama's `tools` field; 'emulated' (for models without tool support)
+    describes them in the system prompt and parses JSON answers. Either way the caller's messages are never modified.
+    keep_alive (e.g. "30m", seconds, or -1 for ever) is sent with every request: how long Ollama keeps the model
+    loaded after it; unset, Ollama's default (5 minutes) applies.
+    """
+    name = 'ollama'
+
+    def __init__(self, base_url: str = 'http://localhost:11434/api', model: str = 'llama3.2', tool_mode: str = 'native',
+                 keep_alive=None):
+        if tool_mode not in ('native', 'emulated'):
+            raise ValueError(f"Invalid Ollama tool mode: {tool_mode}")
         self.base_url = base_url
         self.model = model
+        self.tool_mode = tool_mode
+        self.keep_alive = keep_alive
+        self._tool_blocks = {}
+
+    def _tool_block(self, tools: list) -> str:
+        # The agent passes the same tools list on every call, so the instructions are serialized once per tool set
+        cached = self._tool_blocks.get(id(tools))
+        if cached is None or cached[0] is not tools:
+            if len(self._tool_blocks) >= 32:
+                self._tool_blocks.clear()
+            cached = (tools, "\n" + TOOL_INSTRUCTIONS + json.dumps([t['function'] for t in tools]))
+            self._tool_blocks[id(tools)] = cached
+        return cached[1]
+
+    def _convert_message(self, message: dict) -> dict:
+        if message.get('tool_calls'):
+            calls = [
+                {'function': {'name': call['function']['name'], 'arguments': _object_arguments(call['function']['arguments'])}}
+                for call in message['tool_calls']
+            ]
+            if self.tool_mode == 'emulated':
+                # Shown back to the model in the same JSON form it was asked to answer in
+                return {'role': 'assistant', 'content': json.dumps({'tool_calls': calls})}
+            return {'role': 'assistant', 'content': message.get('content') or '', 'tool_calls': calls}
+        if message['role'] == 'tool':
+            return {'role': 'tool', 'content': message.get('content') or '', 'tool_name': message.get('name')}
+        return message
+
+    def _prepare_messages(self, messages: list, tools: list = None) -> list:
+        prepared = [self._convert_message(message) for message in messages]
+        if tools and self.tool_mode == 'emulated':
+            block = self._tool_block(tools)
+            if prepared and prepared[0]['role'] == 'system':
+                prepared[0] = {**prepared[0], 'content': (prepared[0].get('content') or '') + block}
+            else:
+                prepared.insert(0, {'role': 'system', 'content': block.lstrip()})
+        return prepared
+
+    def _build_payload(self, messages: list, tools: list, params: dict, stream: bool) -> dict:
+        payload = {
+            'model': self.model,
+            'messages': self._prepare_messages(messages, tools),
+            'options': {
+                'temperature': params.get('temperature', 0.7),
+                'top_p': params.get('top_p', 1.0),
+                'num_predict': params.get('max_tokens', 512)
+            },
+            'stream': stream
+        }
+        if tools and self.tool_mode == 'native':
+            payload['tools'] = tools
+        if params.get('format'):
+            # Structured output: 'json' or a JSON schema the answer must follow
+            payload['format'] = params['format']
+        if self.keep_alive is not None:
+            payload['keep_alive'] = self.keep_alive
+        return payload
+
+    def _load_payload(self) -> dict:
+        # A chat request without messages only loads the model (and resets its keep_alive timer)
+        payload = {'model': self.model, 'messages': [], 'stream': False}
+        if self.keep_alive is not None:
+            payload['keep_alive'] = self.keep_alive
+        return payload
+
+    def _resident(self, data: dict) -> dict:
+        """This model's entry in an /api/ps answer, or None when it is not loaded."""
+        names = {self.model} if ':' in self.model else {self.model, f"{self.model}:latest"}
+        for entry in data.get('models') or []:
+            if entry.get('name') in names or entry.get('model') in names:
+                return {'expires_at': entry.get('expires_at'), 'size_vram': entry.get('size_vram')}
+        return None
+
+    @staticmethod
+    def _tool_names(tools: list):
+        return {t['function']['name'] for t in tools} if tools else None
+
+    def _parse_response(self, data: dict, tools: list = None) -> dict:
+        message = data['message']
+        if message.get('tool_calls'):
+            response = {'content': None, 'tool_calls': _native_tool_calls(message['tool_calls'])}
+        else:
+            content = message.get('content', '')
+            tool_calls = parse_tool_calls(content, self._tool_names(tools)) if tools else []
+            response = {'content': None if tool_calls else content, 'tool_calls': tool_calls}
+        usage = _usage(data)
+        if usage:
+            response['usage'] = usage
+        return response
+
+class OllamaProvider(OllamaBase, LLMProvider):
+    def __init__(self, base_url: str = 'http://localhost:11434/api', model: str = 'llama3.2',
+                 session: requests.Session = None, tool_mode: str = 'native', keep_alive=None):
+        super().__init__(base_url=base_url, model=model, tool_mode=tool_mode, keep_alive=keep_alive)
+        # Keep-alive pool, so consecutive calls skip the TCP (and TLS) handshake
+        self.session = session or build_session()
 
     def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
         params = params or {}
         try:
+            payload = self._build_payload(messages, tools, params, stream=False)
+            response = self.session.post(f"{self.base_url}/chat", json=payload)
+            response.raise_for_status()
+            return self._parse_response(response.json(), tools)
+        except Exception as e:
+            raise provider_error('Ollama', e)
+
+    def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        params = params or {}
+        try:
+            payload = self._build_payload(messages, tools, params, stream=True)
+            parser = OllamaStream(self._tool_names(tools))
+            with self.session.post(f"{self.base_url}/chat", json=payload, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    yield from parser.feed(line)
+                    if parser.done:
+                        break
+            yield from parser.finish()
+        except Exception as e:
+            raise provider_error('Ollama', e)
+
+    def load_model(self):
+        """Loads the model into memory, or keeps it there; returns once it is ready."""
+        try:
+            response = self.session.post(f"{self.base_url}/chat", json=self._load_payload())
+            response.raise_for_status()
+        except Exception as e:
+            raise provider_error('Ollama', e)
+
+    def resident(self) -> dict:
+        """{'expires_at', 'size_vram'} while the model is loaded, None otherwise (from /api/ps)."""
+        try:
+            response = self.session.get(f"{self.base_url}/ps")
+            response.raise_for_status()
+            return self._resident(response.json())
+        except Exception as e:
+            raise provider_error('Ollama', e)
+
+    def close(self):
+        self.session.close()
+
+class AsyncOllamaProvider(OllamaBase, AsyncLLMProvider):
+    """httpx-based Ollama client."""
+
+    def __init__(self, base_url: str = 'http://localhost:11434/api', model: str = 'llama3.2',
+                 client: httpx.AsyncClient = None, tool_mode: str = 'native', keep_alive=None):
+        super().__init__(base_url=base_url, model=model, tool_mode=tool_mode, keep_alive=keep_alive)
+        self.client = client or build_async_http_client()
+
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        params = params or {}
+        try:
+            payload = self._build_payload(messages, tools, params, stream=False)
+            response = await self.client.post(f"{self.base_url}/chat", json=payload)
+            response.raise_for_status()
+            return self._parse_response(response.json(), tools)
+        except Exception as e:
+            raise provider_error('Ollama', e)
 
-            system_content = messages[0]['content'] if messages and messages[0]['role'] == 'system' else ""
-            if tools:
-                tool_descriptions = [t['function'] for t in tools]  # Assume OpenAI format
-                system_content += "\nIf you need to call a tool, respond ONLY with JSON: {'tool_calls': [{'id': 'call_1', 'function': {'name': 'tool_name', 'arguments': 'json_str'}}]}.\nAvailable tools: " + json.dumps(tool_descriptions)
-                if messages and messages[0]['role'] == 'system':
-                    messages[0]['content'] = system_content
-                else:
-                    messages.insert(0, {'role': 'system', 'content': system_content})
-
-            payload = {
-                'model': self.model,
-                'messages': messages,
-                'options': {
-                    'temperature': params.get('temperature', 0.7),
-                    'top_p': params.get('top_p', 1.0),
-                    'num_predict': params.get('max_tokens', 512)
-                },
-                'stream': False
-            }
-            response = requests.post(f"{self.base_url}/chat", json=payload)
+    async def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        params = params or {}
+        try:
+            payload = self._build_payload(messages, tools, params, stream=True)
+            parser = OllamaStream(self._tool_names(tools))
+            async with self.client.stream("POST", f"{self.base_url}/chat", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    for event in parser.feed(line):
+                        yield event
+                    if parser.done:
+                        break
+            for event in parser.finish():
+                yield event
+        except Exception as e:
+            raise provider_error('Ollama', e)
+
+    async def load_model(self):
+        try:
+            response = await self.client.post(f"{self.base_url}/chat", json=self._load_payload())
+            response.raise_for_status()
+        except Exception as e:
+            raise provider_error('Ollama', e)
+
+    async def resident(self) -> dict:
+        try:
+            response = await self.client.get(f"{self.base_url}/ps")
             response.raise_for_status()
-            data = response.json()
-            content = data['message']['content']
-
-            # Parsear si es tool call (emulación)
-            tool_calls = []
-            try:
-                parsed = json.loads(content)
-                if 'tool_calls' in parsed:
-                    tool_calls = parsed['tool_calls']
-                    content = None
-            except json.JSONDecodeError:
-                pass  
-
-            return {'content': content, 'tool_calls': tool_calls}
-        except Exception as e:
-            raise ValueError(f"Error in Ollama: {str(e)}")
\ No newline at end of file
+            return self._resident(response.json())
+        except Exception as e:
+            raise provider_error('Ollama', e)
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -1,36 +1,86 @@
-from .base import LLMProvider
-from openai import OpenAI
+from .base import LLMProvider, AsyncLLMProvider, ChatCompletionStream, parse_completion, provider_error
+from openai import OpenAI, AsyncOpenAI
+import httpx
+
+def _completion_kwargs(model: str, messages: list, tools: list, params: dict) -> dict:
+    kwargs = dict(
+        model=model,
+        messages=messages,
+        temperature=params.get('temperature', 0.7),
+        top_p=params.get('top_p', 1.0),
+        max_tokens=params.get('max_tokens', 512)
+    )
+    # tool_choice is only valid alongside tools; the final no-tools round and summaries send neither
+    if tools:
+        kwargs.update(tools=tools, tool_choice="auto")
+    return kwargs
 
 class OpenAIProvider(LLMProvider):
-    def __init__(self, api_key: str, base_url: str = 'https://openrouter.ai/api/v1', model: str = 'openai/gpt-4o-mini'):
-        self.client = OpenAI(base_url=base_url, api_key=api_key)
+    name = 'openai'
+
+    def __init__(self, api_key: str, base_url: str = 'https://openrouter.ai/api/v1', model: str = 'openai/gpt-4o-mini',
+                 http_client: httpx.Client = None):
+        # max_retries=0: rate limits surface as RateLimitError and are retried by the agent's RetryPolicy
+        self.client = OpenAI(base_url=base_url, api_key=api_key, http_client=http_client, max_retries=0)
         self.model = model
 
     def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
         params = params or {}
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-                temperature=params.get('temperature', 0.7),
-                top_p=params.get('top_p', 1.0),
-                max_tokens=params.get('max_tokens', 512)
+            response = self.client.chat.completions.create(**_completion_kwargs(self.model, messages, tools, params))
+            return parse_completion(response)
+        except Exception as e:
+            raise provider_error('OpenAI', e)
+
+    def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        params = params or {}
+        try:
+            stream = self.client.chat.completions.create(
+                **_completion_kwargs(self.model, messages, tools, params),
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            parser = ChatCompletionStream()
+            for chunk in stream:
+                yield from parser.feed(chunk)
+            yield parser.response()
+        except Exception as e:
+            raise provider_error('OpenAI', e)
+
+    def close(self):
+        self.client.close()
+
+class AsyncOpenAIProvider(AsyncLLMProvider):
+    name = 'openai'
+
+    def __init__(self, api_key: str, base_url: str = 'https://openrouter.ai/api/v1', model: str = 'openai/gpt-4o-mini',
+                 http_client: httpx.AsyncClient = None):
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client, max_retries=0)
+        self.model = model
+
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        params = params or {}
+        try:
+            response = await self.client.chat.completions.create(**_completion_kwargs(self.model, messages, tools, params))
+            return parse_completion(response)
+        except Exception as e:
+            raise provider_error('OpenAI', e)
+
+    async def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        params = params or {}
+        try:
+            stream = await self.client.chat.completions.create(
+                **_completion_kwargs(self.model, messages, tools, params),
+                stream=True,
+                stream_options={'include_usage': True}
             )
-            choice = response.choices[0].message
-            tool_calls = [
-                {
-                    'id': call.id,
-                    'function': {
-                        'name': call.function.name,
-                        'arguments': call.function.arguments
-                    }
-                } for call in (choice.tool_calls or [])
-            ]
-            return {
-                'content': choice.content if not tool_calls else None,
-                'tool_calls': tool_calls
-            }
+            parser = ChatCompletionStream()
+            async for chunk in stream:
+                for event in parser.feed(chunk):
+                    yield event
+            yield parser.response()
         except Exception as e:
-            raise ValueError(f"Error in OpenAI: {str(e)}")
\ No newline at end of file
+            raise provider_error('OpenAI', e)
+
+    async def aclose(self):
+        await self.client.close()
@@ -0,0 +1,398 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable
+from .base import LLMProvider, AsyncLLMProvider, RateLimitError
+from ..metrics import ROUTER_HEDGES, ROUTER_REQUESTS
+from ..scheduler import Overloaded
+
+# Backends chosen while serving the current request, for internal_flow; only collected once started
+_current_routes = contextvars.ContextVar('routes', default=None)
+
+def start_route_log() -> list:
+    routes = []
+    _current_routes.set(routes)
+    return routes
+
+# Provider slot held by each routed call of the current request, for the backend it goes to
+_backend_slot = contextvars.ContextVar('backend_slot', default=None)
+
+def use_backend_slots(slot: Callable):
+    """
+    Routed calls of the current request hold `slot(backend_name)`, an async context manager such as
+    `lambda name: scheduler.slot(name, session_id)`, while they talk to that backend; so the per-provider
+    limits also cap what the async router sends to each backend.
+    """
+    _backend_slot.set(slot)
+
+def _log_route(entry: dict):
+    routes = _current_routes.get()
+    if routes is not None:
+        routes.append(entry)
+
+def _percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `failure_threshold` consecutive failures it opens and the backend is
+    skipped for `reset_timeout` seconds; then one trial call is let through (half-open), which closes it
+    again on success or re-opens it on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def available(self) -> bool:
+        state = self.state
+        return state == 'closed' or (state == 'half_open' and not self.trial)
+
+    def allow(self) -> bool:
+        """Like available(), but claims the half-open trial call."""
+        if not self.available():
+            return False
+        if self.opened_at is not None:
+            self.trial = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.trial = False
+
+
+class BackendStats:
+    """
+    Rolling window of the last `window` calls: latencies (per call kind) and outcomes. The error rate only
+    counts outcomes younger than `horizon` seconds, so a backend that stopped failing is ranked on speed again.
+    """
+
+    def __init__(self, window: int = 100, horizon: float = 30.0):
+        self.latencies = {'response': deque(maxlen=window), 'stream': deque(maxlen=window)}
+        self.outcomes = deque(maxlen=window)   # (time.monotonic(), ok)
+        self.horizon = horizon
+
+    def record(self, kind: str, latency: float = None, ok: bool = True):
+        self.outcomes.append((time.monotonic(), ok))
+        if ok:
+            self.latencies[kind].append(latency)
+
+    def latency(self, kind: str, p: float = 50):
+        samples = self.latencies[kind]
+        return _percentile(samples, p) if samples else None
+
+    def error_rate(self) -> float:
+        since = time.monotonic() - self.horizon
+        recent = [ok for at, ok in self.outcomes if at >= since]
+        return recent.count(False) / len(recent) if recent else 0.0
+
+
+class Backend:
+    def __init__(self, name: str, provider, window: int, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.provider = provider
+        self.stats = BackendStats(window, horizon=reset_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            return self.breaker.allow()
+
+    def success(self, kind: str, latency: float):
+        with self.lock:
+            self.stats.record(kind, latency)
+            self.breaker.success()
+        ROUTER_REQUESTS.inc(backend=self.name, outcome='ok')
+
+    def failure(self, kind: str):
+        with self.lock:
+            self.stats.record(kind, ok=False)
+            self.breaker.failure()
+        ROUTER_REQUESTS.inc(backend=self.name, outcome='error')
+
+    def cancelled(self):
+        """A hedged loser, or a call abandoned by the caller: no verdict on the backend, but the trial is freed."""
+        with self.lock:
+            self.breaker.trial = False
+        ROUTER_REQUESTS.inc(backend=self.name, outcome='cancelled')
+
+
+class RouterBase:
+    """
+    Routes each call to the fastest healthy backend and fails over to the next one on errors.
+    - Backends are ranked by median latency over the rolling window; those with an error rate above
+      `max_error_rate` go last, and those with an open circuit are skipped until their trial call.
+      Backends without samples yet keep their configured order and are tried first, so each one gets measured.
+    - Streams fail over only until the first event arrives.
+    - With `hedge`, the async router starts the next backend when the first has not answered after its p95
+      latency (at least `hedge_min_delay`, and only once it has `min_samples`); the loser is cancelled.
+    The response (and the final stream event) carries 'backend': the name of the backend that answered.
+    """
+    name = 'router'
+    model = None
+
+    def __init__(self, backends: dict, hedge: bool = False, hedge_min_delay: float = 0.05, min_samples: int = 10,
+                 window: int = 100, failure_threshold: int = 3, reset_timeout: float = 30.0, max_error_rate: float = 0.5):
+        self.backends = [
+            Backend(name, provider, window, failure_threshold, reset_timeout) for name, provider in backends.items()
+        ]
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+
+    @property
+    def models(self) -> tuple:
+        """The backends' models: any of them may answer, so the prompt must fit the smallest context budget"""
+        return tuple(getattr(backend.provider, 'model', None) for backend in self.backends)
+
+    def stats(self) -> dict:
+        return {
+            backend.name: {
+                'circuit': backend.breaker.state,
+                'error_rate': round(backend.stats.error_rate(), 3),
+                'p50_ms': _ms(backend.stats.latency('response')),
+                'p95_ms': _ms(backend.stats.latency('response', 95)),
+                'first_event_p50_ms': _ms(backend.stats.latency('stream'))
+            }
+            for backend in self.backends
+        }
+
+    def _candidates(self, kind: str) -> list:
+        """Backends in the order to try them, leaving out open circuits."""
+        def rank(indexed):
+            index, backend = indexed
+            unhealthy = backend.stats.error_rate() > self.max_error_rate
+            return (unhealthy, backend.stats.latency(kind) or 0.0, index)
+        ranked = sorted(enumerate(self.backends), key=rank)
+        return [backend for _, backend in ranked if backend.breaker.available()]
+
+    def _hedge_delay(self, backend: Backend, kind: str):
+        if not self.hedge or len(backend.stats.latencies[kind]) < self.min_samples:
+            return None
+        return max(self.hedge_min_delay, backend.stats.latency(kind, 95))
+
+    def _chosen(self, backend: Backend, attempts: list, hedged: bool = False):
+        _log_route({'backend': backend.name, 'attempts': attempts, 'hedged': hedged})
+
+    def _exhausted(self, errors: list) -> ValueError:
+        if not errors:
+            return ValueError(f"Error in Router: no healthy backend ({', '.join(b.name for b in self.backends)} all open)")
+        message = "Error in Router: every backend failed: " + "; ".join(str(e) for e in errors)
+        if all(isinstance(e, RateLimitError) for e in errors):
+            waits = [e.retry_after for e in errors if e.retry_after is not None]
+            return RateLimitError(message, retry_after=min(waits) if waits else None)
+        return ValueError(message)
+
+
+class RoutingProvider(RouterBase, LLMProvider):
+    """Sync router: failover only, since a blocking call cannot be cancelled to hedge it."""
+
+    def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        errors, attempts = [], []
+        for backend in self._candidates('response'):
+            if not backend.allow():
+                continue
+            attempts.append(backend.name)
+            started = time.monotonic()
+            try:
+                response = backend.provider.generate_response(messages, tools, params)
+            except ValueError as e:
+                backend.failure('response')
+                errors.append(e)
+                continue
+            backend.success('response', time.monotonic() - started)
+            self._chosen(backend, attempts)
+            return {**response, 'backend': backend.name}
+        raise self._exhausted(errors)
+
+    def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        errors, attempts = [], []
+        for backend in self._candidates('stream'):
+            if not backend.allow():
+                continue
+            attempts.append(backend.name)
+            started = time.monotonic()
+            events = iter(backend.provider.generate_response_stream(messages, tools, params))
+            try:
+                first = next(events)
+            except (ValueError, StopIteration) as e:
+                backend.failure('stream')
+                errors.append(e if isinstance(e, ValueError) else ValueError(f"Error in {backend.name}: empty stream"))
+                continue
+            backend.success('stream', time.monotonic() - started)
+            self._chosen(backend, attempts)
+            yield from _tag_stream(backend, first, events)
+            return
+        raise self._exhausted(errors)
+
+
+def _tag(backend: Backend, event: dict) -> dict:
+    return {**event, 'backend': backend.name} if event['type'] == 'response' else event
+
+def _tag_stream(backend: Backend, first: dict, events):
+    try:
+        for event in _chain(first, events):
+            yield _tag(backend, event)
+    except ValueError:
+        backend.failure('stream')
+        raise
+
+def _chain(first: dict, events):
+    yield first
+    yield from events
+
+
+class AsyncRoutingProvider(RouterBase, AsyncLLMProvider):
+    """
+    Async router: failover plus optional hedging, cancelling whichever request loses. Each call holds the
+    provider slot of its backend (see use_backend_slots); a backend whose queue refuses it is failed over.
+    """
+
+    async def _race(self, kind: str, start: Callable[[Backend], Awaitable], discard: Callable = None):
+        """
+        Starts the best backend, hedges to the next one after the p95 delay and fails over on errors.
+        Returns (backend, held, result) of the first success, where `held` is the backend's provider slot
+        (an AsyncExitStack the caller closes once done with the result); the other attempts are cancelled.
+        """
+        candidates = iter(self._candidates(kind))
+        pending, errors, attempts = {}, [], []
+        hedged = False
+
+        async def attempt(backend: Backend):
+            # The backend's provider slot, held until the caller closes it; waiting for it is not latency
+            held = AsyncExitStack()
+            slot = _backend_slot.get()
+            if slot is not None:
+                try:
+                    await held.enter_async_context(slot(backend.name))
+                except Overloaded as e:
+                    backend.cancelled()
+                    raise ValueError(f"Error in {backend.name}: {e.detail}")
+            started = time.monotonic()
+            try:
+                result = await start(backend)
+            except BaseException as e:
+                await held.aclose()
+                if isinstance(e, ValueError):
+                    backend.failure(kind)
+                raise
+            backend.success(kind, time.monotonic() - started)
+            return held, result
+
+        async def drop(outcome):
+            held, result = outcome
+            try:
+                if discard is not None:
+                    await discard(result)
+            finally:
+                await held.aclose()
+
+        def launch() -> bool:
+            for backend in candidates:
+                if backend.allow():
+                    attempts.append(backend.name)
+                    pending[asyncio.ensure_future(attempt(backend))] = backend
+                    return True
+            return False
+
+        try:
+            while True:
+                if not pending and not launch():
+                    raise self._exhausted(errors)
+                delay = self._hedge_delay(next(iter(pending.values())), kind) if len(pending) == 1 else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch():
+                        hedged = True
+                        ROUTER_HEDGES.inc()
+                    else:
+                        await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                winner = None
+                for task in done:
+                    backend = pending.pop(task)
+                    error = task.exception()
+                    if error is None and winner is None:
+                        winner = (backend, *task.result())
+                    elif error is None:
+                        await drop(task.result())  # finished at the same time as the winner
+                    elif isinstance(error, ValueError):
+                        errors.append(error)
+                    elif error is not None:
+                        raise error
+                if winner is not None:
+                    self._chosen(winner[0], attempts, hedged)
+                    return winner
+        finally:
+            for task, backend in pending.items():
+                task.cancel()
+                backend.cancelled()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                for task in pending:
+                    # Finished before the cancel landed
+                    if not task.cancelled() and task.exception() is None:
+                        await drop(task.result())
+
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        backend, held, response = await self._race(
+            'response', lambda backend: backend.provider.generate_response(messages, tools, params)
+        )
+        await held.aclose()
+        return {**response, 'backend': backend.name}
+
+    async def generate_response_stream(self, messages: list, tools: list = None, params: dict = None):
+        async def open_stream(backend: Backend):
+            events = backend.provider.generate_response_stream(messages, tools, params).__aiter__()
+            try:
+                return events, await events.__anext__()
+            except StopAsyncIteration:
+                raise ValueError(f"Error in {backend.name}: empty stream")
+            except BaseException:
+                await events.aclose()
+                raise
+
+        async def discard(opened):
+            await opened[0].aclose()
+
+        backend, held, (events, first) = await self._race('stream', open_stream, discard)
+        try:
+            yield _tag(backend, first)
+            async for event in events:
+                yield _tag(backend, event)
+        except ValueError:
+            backend.failure('stream')
+            raise
+        finally:
+            try:
+                await events.aclose()
+            finally:
+                await held.aclose()
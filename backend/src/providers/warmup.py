@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Callable
+from ..metrics import MODEL_LOAD_LATENCY
+
+class ModelWarmup:
+    """
+    Keeps local models loaded so that no user request pays the cold load.
+    start() builds the providers in `names` (with `build`, e.g. ProviderFactory.create_async_provider) and
+    preloads their models in the background; then every `refresh_interval` seconds it checks that each model
+    is still resident and reloads the ones the server evicted (keep_alive expired, memory pressure).
+    A provider must offer load_model() and resident(), as AsyncOllamaProvider does.
+    State per provider, for /health: pending, loading, ready or unavailable (with the error; retried at the next refresh).
+    """
+
+    def __init__(self, names: list, build: Callable, refresh_interval: float = 60.0):
+        self.names = list(names)
+        self.build = build
+        self.refresh_interval = refresh_interval
+        self.providers = {}
+        self._status = {name: {'state': 'pending'} for name in self.names}
+        self._task = None
+
+    def start(self):
+        for name in self.names:
+            self.providers[name] = self.build(name)
+            self._status[name]['model'] = self.providers[name].model
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for provider in self.providers.values():
+            await provider.aclose()
+        self.providers.clear()
+
+    def ready(self) -> bool:
+        return all(status['state'] == 'ready' for status in self._status.values())
+
+    def stats(self) -> dict:
+        return {name: dict(status) for name, status in self._status.items()}
+
+    async def _load(self, name: str):
+        provider, status = self.providers[name], self._status[name]
+        status['state'] = 'loading'
+        started = time.monotonic()
+        try:
+            await provider.load_model()
+        except ValueError as e:
+            status.update(state='unavailable', error=str(e))
+            return
+        elapsed = time.monotonic() - started
+        MODEL_LOAD_LATENCY.observe(elapsed, provider=name, model=provider.model)
+        status.update(state='ready', error=None, load_ms=round(elapsed * 1000, 1), loads=status.get('loads', 0) + 1)
+
+    async def _refresh(self, name: str):
+        try:
+            resident = await self.providers[name].resident()
+        except ValueError:
+            resident = None  # server down, or too old for /api/ps: the load call tells which
+        if resident is None:
+            await self._load(name)
+        else:
+            self._status[name].update(state='ready', error=None, expires_at=resident['expires_at'])
+
+    async def _run(self):
+        await asyncio.gather(*(self._load(name) for name in self.names))
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await asyncio.gather(*(self._refresh(name) for name in self.names))
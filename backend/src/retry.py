@@ -0,0 +1,85 @@
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+from .providers.base import RateLimitError
+
+class RetryPolicy:
+    """
+    Retries provider calls that fail with RateLimitError, with exponential backoff and full jitter
+    (so throttled requests do not come back in lockstep). A Retry-After from the provider is honoured
+    as a minimum; when it is longer than `max_delay` the error is raised right away.
+    Streams are only retried while nothing has been yielded yet.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 on_retry: Callable[[RateLimitError, float], None] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_retry = on_retry
+
+    def delay(self, attempt: int, error: RateLimitError):
+        """Seconds to wait before retry number `attempt` (0-based), or None to give up."""
+        if attempt >= self.max_retries:
+            return None
+        retry_after = error.retry_after or 0
+        if retry_after > self.max_delay:
+            return None
+        return max(retry_after, random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def _next_delay(self, attempt: int, error: RateLimitError) -> float:
+        delay = self.delay(attempt, error)
+        if delay is None:
+            raise error
+        if self.on_retry is not None:
+            self.on_retry(error, delay)
+        return delay
+
+    def call(self, fn: Callable[[], dict]) -> dict:
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except RateLimitError as e:
+                time.sleep(self._next_delay(attempt, e))
+                attempt += 1
+
+    async def call_async(self, fn: Callable[[], Awaitable[dict]]) -> dict:
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except RateLimitError as e:
+                await asyncio.sleep(self._next_delay(attempt, e))
+                attempt += 1
+
+    def stream(self, fn: Callable[[], Iterator[dict]]) -> Iterator[dict]:
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for event in fn():
+                    started = True
+                    yield event
+                return
+            except RateLimitError as e:
+                if started:
+                    raise
+                time.sleep(self._next_delay(attempt, e))
+                attempt += 1
+
+    async def stream_async(self, fn: Callable[[], AsyncIterator[dict]]) -> AsyncIterator[dict]:
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async for event in fn():
+                    started = True
+                    yield event
+                return
+            except RateLimitError as e:
+                if started:
+                    raise
+                await asyncio.sleep(self._next_delay(attempt, e))
+                attempt += 1
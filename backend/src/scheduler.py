@@ -0,0 +1,170 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+
+class Overloaded(Exception):
+    """
+    Raised instead of queueing a request: 429 when one session has too many requests waiting,
+    503 when the provider's queue is full or the wait timed out. `retry_after` is in whole seconds.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _ProviderQueue:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.active_by_session = {}
+        self.waiting = OrderedDict()   # session_id -> deque of futures, in round-robin order
+        self.waiting_count = 0
+        self.service_time = 1.0        # moving average of how long a request holds its slot
+
+    def session_active(self, session_id: str) -> int:
+        return self.active_by_session.get(session_id, 0)
+
+
+class Ticket:
+    """A granted slot; release() is idempotent so it can be called from every exit path."""
+
+    def __init__(self, scheduler: 'Scheduler', provider: str, session_id: str):
+        self.scheduler = scheduler
+        self.provider = provider
+        self.session_id = session_id
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self)
+
+
+class Scheduler:
+    """
+    Admission control in front of the agent, run on the event loop.
+    - At most `provider_limits[name]` (or `default_limit`) requests talk to a provider at once,
+      and at most `session_limit` per session.
+    - The rest wait in a bounded per-provider queue. Slots are handed out round-robin across sessions,
+      so one session with a burst of requests cannot starve the others.
+    - When the queue is full (`max_queue`, or `session_queue` for one session) the request is refused
+      straight away with a Retry-After estimated from the queue length and the recent service time.
+    """
+    EWMA_WEIGHT = 0.2
+
+    def __init__(self, provider_limits: dict = None, default_limit: int = 32, session_limit: int = 1,
+                 max_queue: int = 100, session_queue: int = 5, queue_timeout: float = 30):
+        self.provider_limits = provider_limits or {}
+        self.default_limit = default_limit
+        self.session_limit = session_limit
+        self.max_queue = max_queue
+        self.session_queue = session_queue
+        self.queue_timeout = queue_timeout
+        self._queues = {}
+
+    def _queue(self, provider: str) -> _ProviderQueue:
+        queue = self._queues.get(provider)
+        if queue is None:
+            queue = self._queues[provider] = _ProviderQueue(self.provider_limits.get(provider, self.default_limit))
+        return queue
+
+    def retry_after(self, provider: str) -> int:
+        queue = self._queue(provider)
+        return max(1, math.ceil(queue.service_time * (queue.waiting_count + 1) / queue.limit))
+
+    def stats(self) -> dict:
+        return {
+            name: {'active': queue.active, 'waiting': queue.waiting_count, 'limit': queue.limit}
+            for name, queue in self._queues.items()
+        }
+
+    def _grant(self, queue: _ProviderQueue, session_id: str):
+        queue.active += 1
+        queue.active_by_session[session_id] = queue.session_active(session_id) + 1
+
+    def _dispatch(self, queue: _ProviderQueue):
+        while queue.active < queue.limit and queue.waiting_count:
+            for session_id, waiters in queue.waiting.items():
+                if queue.session_active(session_id) < self.session_limit:
+                    break
+            else:
+                return  # every waiting session is at its own cap
+            future = waiters.popleft()
+            queue.waiting_count -= 1
+            if waiters:
+                queue.waiting.move_to_end(session_id)
+            else:
+                del queue.waiting[session_id]
+            self._grant(queue, session_id)
+            future.set_result(True)
+
+    async def acquire(self, provider: str, session_id: str) -> Ticket:
+        queue = self._queue(provider)
+        if (queue.active < queue.limit and queue.session_active(session_id) < self.session_limit
+                and session_id not in queue.waiting):
+            self._grant(queue, session_id)
+            return Ticket(self, provider, session_id)
+
+        if queue.waiting_count >= self.max_queue:
+            raise Overloaded(503, f"Provider {provider} is at capacity", self.retry_after(provider))
+        waiters = queue.waiting.get(session_id)
+        if waiters is not None and len(waiters) >= self.session_queue:
+            raise Overloaded(429, f"Too many pending requests for session {session_id}", self.retry_after(provider))
+
+        future = asyncio.get_running_loop().create_future()
+        queue.waiting.setdefault(session_id, deque()).append(future)
+        queue.waiting_count += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we gave up: hand it back
+                self._release(Ticket(self, provider, session_id))
+            else:
+                future.cancel()
+                waiters = queue.waiting.get(session_id)
+                if waiters is not None and future in waiters:
+                    waiters.remove(future)
+                    queue.waiting_count -= 1
+                    if not waiters:
+                        del queue.waiting[session_id]
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded(503, f"Timed out waiting for provider {provider}", self.retry_after(provider))
+            raise
+        return Ticket(self, provider, session_id)
+
+    def _release(self, ticket: Ticket):
+        queue = self._queue(ticket.provider)
+        queue.active -= 1
+        remaining = queue.session_active(ticket.session_id) - 1
+        if remaining > 0:
+            queue.active_by_session[ticket.session_id] = remaining
+        else:
+            queue.active_by_session.pop(ticket.session_id, None)
+        held = time.monotonic() - ticket.started
+        queue.service_time += self.EWMA_WEIGHT * (held - queue.service_time)
+        self._dispatch(queue)
+
+    def slot(self, provider: str, session_id: str) -> '_Slot':
+        """`async with scheduler.slot(provider, session_id):` holds a slot for the duration of the block."""
+        return _Slot(self, provider, session_id)
+
+
+class _Slot:
+    def __init__(self, scheduler: Scheduler, provider: str, session_id: str):
+        self.scheduler = scheduler
+        self.provider = provider
+        self.session_id = session_id
+        self.ticket = None
+
+    async def __aenter__(self) -> Ticket:
+        self.ticket = await self.scheduler.acquire(self.provider, self.session_id)
+        return self.ticket
+
+    async def __aexit__(self, *exc):
+        self.ticket.release()
@@ -0,0 +1,27 @@
+"""
+JSON on the hot paths: /chat responses, stream events, NDJSON batch lines and the history persisted by the
+SQLite and Redis stores. orjson is used when installed (several times faster, compact UTF-8 output); without it
+the stdlib json produces the same compact form, so stored rows read back the same either way.
+Rows written before (stdlib json with spaces and \\u escapes) are still valid JSON and decode unchanged.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def dumps_str(obj) -> str:
+    """dumps() for text columns and SSE data fields."""
+    return dumps(obj).decode('utf-8')
+
+def loads(data: str | bytes):
+    """Raises json.JSONDecodeError (orjson's error subclasses it) on invalid input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
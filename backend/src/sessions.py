@@ -0,0 +1,156 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from .agent import Agent
+from .scheduler import Overloaded
+
+class SessionManager:
+    """
+    Bounded cache of hot Agent objects (LRU + idle TTL).
+    History lives in the MemoryStore, so an evicted session is rebuilt on its next request
+    with its full context: Agent only writes the system prompt when the stored history is empty.
+    """
+
+    def __init__(self, max_agents: int = 1000, ttl: float = 3600):
+        self.max_agents = max_agents
+        self.ttl = ttl
+        self._agents = OrderedDict()
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._agents
+
+    def _evict(self, now: float, keep: int):
+        # Least recently used first; stops at the first session that is neither idle too long nor over capacity
+        while self._agents:
+            session_id = next(iter(self._agents))
+            if len(self._agents) <= keep and now - self._last_used[session_id] < self.ttl:
+                break
+            del self._agents[session_id]
+            del self._last_used[session_id]
+
+    def get_or_create(self, session_id: str, create: Callable[[], Agent]) -> Agent:
+        now = time.monotonic()
+        with self._lock:
+            agent = self._agents.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+            self._evict(now, keep=self.max_agents - 1)
+            if agent is None:
+                agent = create()
+            self._agents[session_id] = agent
+            self._last_used[session_id] = now
+            return agent
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._agents.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+
+
+class SessionTurn:
+    """The right to run one request on a session; release() is idempotent."""
+
+    def __init__(self, queue: 'SessionQueue', session_id: str, lock: asyncio.Lock):
+        self.queue = queue
+        self.session_id = session_id
+        self.lock = lock
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.queue._release(self)
+
+
+class SessionQueue:
+    """
+    Per-session actor: the requests of one session run one at a time in arrival order (asyncio.Lock is FIFO),
+    while other sessions proceed independently. At most `max_pending` requests may wait per session;
+    beyond that the request is refused with a 429.
+    With `merge_window`, identical submissions for a session (a double click, a client retry) share one run:
+    a duplicate that arrives while the first is queued or running, or up to `merge_window` seconds after it
+    succeeded, gets the same result instead of triggering another LLM call. Failed or cancelled runs are
+    forgotten at once, so a retry starts a new run.
+    """
+    EWMA_WEIGHT = 0.2
+
+    def __init__(self, max_pending: int = 5, merge_window: float = None):
+        self.max_pending = max_pending
+        self.merge_window = merge_window
+        self._sessions = {}   # session_id -> [lock, requests holding or waiting for it]
+        self._runs = {}       # (session_id, key) -> [task producing the shared result, callers waiting on it]
+        self._turn_time = 1.0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def acquire(self, session_id: str) -> SessionTurn:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = self._sessions[session_id] = [asyncio.Lock(), 0]
+        if entry[1] > self.max_pending:
+            raise Overloaded(
+                429, f"Too many pending requests for session {session_id}",
+                max(1, math.ceil(self._turn_time * entry[1]))
+            )
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._leave(session_id)
+            raise
+        return SessionTurn(self, session_id, entry[0])
+
+    def _leave(self, session_id: str):
+        entry = self._sessions[session_id]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._sessions[session_id]
+
+    def _release(self, turn: SessionTurn):
+        self._turn_time += self.EWMA_WEIGHT * (time.monotonic() - turn.started - self._turn_time)
+        turn.lock.release()
+        self._leave(turn.session_id)
+
+    async def merge(self, session_id: str, key: str, fn: Callable[[], Awaitable]):
+        """
+        Awaits `fn()`, or the result of an identical submission (same `key`) that is queued, running or just done.
+        A merged run is its own task: it is cancelled only when every caller waiting on it has gone away.
+        """
+        if self.merge_window is None:
+            return await fn()
+        run_key = (session_id, key)
+        run = self._runs.get(run_key)
+        if run is None:
+            task = asyncio.ensure_future(fn())
+            run = self._runs[run_key] = [task, 0]
+            task.add_done_callback(lambda task: self._finished(run_key, run, task))
+        run[1] += 1
+        try:
+            return await asyncio.shield(run[0])
+        except asyncio.CancelledError:
+            if run[1] == 1 and not run[0].done():
+                run[0].cancel()
+                self._forget(run_key, run)
+            raise
+        finally:
+            run[1] -= 1
+
+    def _finished(self, run_key: tuple, run: list, task: asyncio.Task):
+        # Only a successful result is worth sharing: after an error or a cancellation a resubmission runs again
+        if task.cancelled() or task.exception() is not None:
+            self._forget(run_key, run)
+        else:
+            asyncio.get_running_loop().call_later(self.merge_window, self._forget, run_key, run)
+
+    def _forget(self, run_key: tuple, run: list):
+        if self._runs.get(run_key) is run:
+            del self._runs[run_key]
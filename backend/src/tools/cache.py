@@ -0,0 +1,79 @@
+import hashlib
+import inspect
+import json
+import threading
+from functools import wraps
+from typing import Callable
+from ..cache import CacheBackend, InProcessCache, RedisCache
+from ..config.config import Config
+
+def build_backend(namespace: str, max_entries: int = None) -> CacheBackend:
+    if Config.TOOL_CACHE_BACKEND == 'redis':
+        return RedisCache(url=Config.REDIS_URL, prefix=f"cache:{namespace}:")
+    return InProcessCache(max_entries or Config.TOOL_CACHE_MAX_ENTRIES)
+
+
+def _normalize(value):
+    # Case and whitespace never change the answer of the cached tools ("Madrid " == "madrid")
+    if isinstance(value, str):
+        return ' '.join(value.split()).lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class ToolCache:
+    """
+    Caches tool results keyed on tool name + normalized arguments, with a TTL per tool.
+    Results starting with "Error" are never cached.
+    """
+
+    def __init__(self, backend: CacheBackend, ttls: dict):
+        self.backend = backend
+        self.ttls = ttls
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, args: dict) -> str:
+        payload = json.dumps(_normalize(args), sort_keys=True, default=str)
+        return f"{name}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def _count(self, name: str, outcome: str):
+        with self._lock:
+            stats = self._stats.setdefault(name, {'hits': 0, 'misses': 0})
+            stats[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._stats.items()}
+
+    def cached(self, name: str, fn: Callable) -> Callable:
+        ttl = self.ttls.get(name)
+        if not ttl:
+            return fn
+
+        signature = inspect.signature(fn)
+
+        @wraps(fn)
+        def wrapper(**kwargs):
+            try:
+                bound = signature.bind(**kwargs)
+            except TypeError:
+                return fn(**kwargs)
+            # Defaults are filled in, so get_weather(city=x) and get_weather(city=x, unit='celsius') share an entry
+            bound.apply_defaults()
+            key = self.key(name, bound.arguments)
+            result = self.backend.get(key)
+            if result is not None:
+                self._count(name, 'hits')
+                return result
+            self._count(name, 'misses')
+            result = fn(**kwargs)
+            if isinstance(result, str) and not result.startswith("Error"):
+                self.backend.set(key, result, ttl)
+            return result
+
+        return wrapper
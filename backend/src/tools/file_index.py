@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FileIndex:
+    """
+    In-process index of a directory tree: every file with its size and mtime, plus a trigram index
+    of text contents so a search only opens the files that can match.
+    Kept current by mtime checks: at most every `refresh_interval` seconds the tree is re-stat'ed
+    and only new or changed files are re-read.
+    """
+
+    def __init__(self, root: str, max_file_bytes: int = 1_000_000, refresh_interval: float = 2.0):
+        self.root = root
+        self.max_file_bytes = max_file_bytes
+        self.refresh_interval = refresh_interval
+        self._files = {}       # relative path -> {'size', 'mtime', 'trigrams'}
+        self._postings = {}    # trigram -> set of relative paths
+        self._last_refresh = None
+        self._lock = threading.Lock()
+
+    def mark_dirty(self):
+        """Forces a rescan on next use (called after the tools write a file)."""
+        self._last_refresh = None
+
+    def _scan(self):
+        found = {}
+        stack = [self.root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    found[os.path.relpath(entry.path, self.root)] = (stat.st_size, stat.st_mtime)
+        return found
+
+    def _read_trigrams(self, rel_path: str, size: int) -> set:
+        if size > self.max_file_bytes:
+            return set()
+        try:
+            with open(os.path.join(self.root, rel_path), 'r', encoding='utf-8') as f:
+                return _trigrams(f.read().lower())
+        except (OSError, UnicodeDecodeError):
+            return set()
+
+    def _remove(self, rel_path: str):
+        for gram in self._files.pop(rel_path)['trigrams']:
+            paths = self._postings.get(gram)
+            if paths is not None:
+                paths.discard(rel_path)
+                if not paths:
+                    del self._postings[gram]
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return
+            found = self._scan()
+            for rel_path in [p for p in self._files if p not in found]:
+                self._remove(rel_path)
+            for rel_path, (size, mtime) in found.items():
+                current = self._files.get(rel_path)
+                if current is not None and current['size'] == size and current['mtime'] == mtime:
+                    continue
+                if current is not None:
+                    self._remove(rel_path)
+                grams = self._read_trigrams(rel_path, size)
+                self._files[rel_path] = {'size': size, 'mtime': mtime, 'trigrams': grams}
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(rel_path)
+            self._last_refresh = now
+
+    def list(self, subdir: str = '') -> list:
+        self.refresh()
+        prefix = os.path.normpath(subdir.lstrip('/'))
+        prefix = '' if prefix == '.' else prefix
+        with self._lock:
+            return [
+                {'path': path, 'size': info['size'], 'mtime': info['mtime']}
+                for path, info in sorted(self._files.items())
+                if not prefix or path == prefix or path.startswith(prefix + os.sep)
+            ]
+
+    def _candidates(self, needle: str) -> list:
+        if len(needle) < 3:
+            return sorted(self._files)
+        paths = None
+        for gram in _trigrams(needle):
+            posting = self._postings.get(gram, set())
+            paths = set(posting) if paths is None else paths & posting
+            if not paths:
+                return []
+        return sorted(paths)
+
+    def search(self, query: str, max_results: int = 20) -> dict:
+        """Case-insensitive substring search; returns the matching lines."""
+        self.refresh()
+        needle = query.lower()
+        with self._lock:
+            candidates = self._candidates(needle)
+        matches = []
+        for rel_path in candidates:
+            try:
+                with open(os.path.join(self.root, rel_path), 'r', encoding='utf-8') as f:
+                    for number, line in enumerate(f, start=1):
+                        if needle in line.lower():
+                            if len(matches) == max_results:
+                                return {'matches': matches, 'truncated': True}
+                            matches.append({'path': rel_path, 'line': number, 'text': line.strip()[:300]})
+            except (OSError, UnicodeDecodeError):
+                continue
+        return {'matches': matches, 'truncated': False}
@@ -1,14 +1,26 @@
-import os
+import codecs
 import json
-import requests
-from serpapi import GoogleSearch
+import os
+import shutil
+import uuid
+from typing import Callable
+from .cache import build_backend
+from ..config.config import configured
+from .file_index import FileIndex
 
+# Created on the first write, so importing the tools touches nothing on disk
 SAFE_DIR = os.path.abspath("demo-files")
-os.makedirs(SAFE_DIR, exist_ok=True)
+
+FILE_INDEX = FileIndex(SAFE_DIR)
 
 # Only use in local/private environments. In public production, disable or restrict to a secure directory.
-def list_files_in_dir(directory: str = '.'):
+def list_files_in_dir(directory: str = '.', recursive: bool = False):
     try:
+        if recursive:
+            # Served from the index of the safe directory: whole subtree with sizes and mtimes
+            if not is_safe_path(SAFE_DIR, directory):
+                return json.dumps({"error": "Access denied: invalid path or out of permissions"})
+            return json.dumps({"files": FILE_INDEX.list(directory)})
         files = os.listdir(directory)
         return json.dumps({"files": files})
     except Exception as e:
@@ -18,11 +30,12 @@ list_files_schema = {
     "type": "function",
     "function": {
         "name": "list_files_in_dir",
-        "description": "List the files in a directory (the current one by default)",
+        "description": "List the files in a directory (the current one by default). With recursive=true, list every file under a directory of the workspace with its size and modification time",
         "parameters": {
             "type": "object",
             "properties": {
-                "directory": {"type": "string", "description": "Directory (optional)"}
+                "directory": {"type": "string", "description": "Directory (optional)"},
+                "recursive": {"type": "boolean", "description": "List the whole workspace subtree with sizes and mtimes (optional, default false)"}
             },
             "required": []
         }
@@ -34,13 +47,100 @@ def is_safe_path(basedir: str, path: str) -> bool:
     full_path = os.path.abspath(os.path.join(base, path.lstrip('/')))
     return full_path.startswith(base) and not os.path.islink(full_path)
 
-def read_file(path: str):
+# Bytes returned by one read_file call; larger files are read page by page
+READ_LIMIT = 10000
+COPY_CHUNK = 1 << 16
+
+def _decode(data: bytes, at_start: bool, final: bool) -> tuple[str, int, int]:
+    """
+    Decodes a page of UTF-8 without splitting characters: continuation bytes at the start of a page that
+    begins mid-character are skipped, and an incomplete character at the end is left for the next page.
+    Returns (text, bytes skipped at the start, bytes consumed after them).
+    """
+    skipped = 0
+    if not at_start:
+        while skipped < min(3, len(data)) and data[skipped] & 0xC0 == 0x80:
+            skipped += 1
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    text = decoder.decode(data[skipped:], final=final)
+    return text, skipped, len(data) - skipped - len(decoder.getstate()[0])
+
+def _read_bytes(f, size: int, offset: int, length: int) -> dict:
+    f.seek(offset)
+    data = f.read(length)
+    text, skipped, consumed = _decode(data, at_start=offset == 0, final=offset + len(data) >= size)
+    if consumed == 0 and len(data) > skipped:
+        # A page narrower than one character: extend it to the end of that character
+        data += f.read(3)
+        text, skipped, consumed = _decode(data, at_start=offset == 0, final=offset + len(data) >= size)
+    start, end = offset + skipped, offset + skipped + consumed
+    return {'content': text, 'offset': start, 'end': end, 'next_offset': end if end < size else None}
+
+def _line_start(f, line: int) -> int:
+    """Byte offset where `line` (1-based) starts, counting newlines COPY_CHUNK bytes at a time."""
+    f.seek(0)
+    position, remaining = 0, line - 1
+    while remaining:
+        chunk = f.read(COPY_CHUNK)
+        if not chunk:
+            break
+        count = chunk.count(b'\n')
+        if count >= remaining:
+            index = -1
+            for _ in range(remaining):
+                index = chunk.index(b'\n', index + 1)
+            return position + index + 1
+        remaining -= count
+        position += len(chunk)
+    return position
+
+def _read_lines(f, size: int, start_line: int, max_lines: int, length: int) -> dict:
+    start = _line_start(f, start_line)
+    f.seek(start)
+    data = f.read(length)
+    end, lines = 0, 0
+    while lines < max_lines and end < len(data):
+        newline = data.find(b'\n', end)
+        if newline == -1:
+            # The last line of the file, or one longer than the page (returned in part)
+            if lines == 0 or start + len(data) == size:
+                end = len(data)
+                lines += start + len(data) == size
+            break
+        end = newline + 1
+        lines += 1
+    page = _read_bytes(f, size, start, end)
+    if page['next_offset'] is None:
+        page.update(start_line=start_line, next_line=None)
+    elif lines == 0:
+        # Not even one whole line fitted: next_line would point back at this page
+        page.update(start_line=start_line, next_line=None, note=(
+            f"Line {start_line} is longer than the page: read the rest of it with offset={page['next_offset']}, "
+            f"or skip to the next line with start_line={start_line + 1}"
+        ))
+    else:
+        page.update(start_line=start_line, next_line=start_line + lines)
+    return page
+
+def read_file(path: str, offset: int = 0, length: int = READ_LIMIT, start_line: int = None, max_lines: int = 200):
+    """
+    Reads one page of a file: `length` bytes (at most READ_LIMIT) from byte `offset`, or with `start_line`,
+    up to `max_lines` lines from that line (1-based). Only the page is read, whatever the file size.
+    Returns JSON with the content and where to continue: next_offset (and next_line) are null at the end;
+    next_line is also null when the page ends inside a line too long for it (a note then says how to go on).
+    """
     if not is_safe_path(SAFE_DIR, path):
         return "Access denied: invalid path or out of permissions"
     full_path = os.path.join(SAFE_DIR, path)
     try:
-        with open(full_path, 'r', encoding='utf-8') as f:
-            return f.read()[:10000]  # 10KB limit
+        length = max(1, min(int(length or READ_LIMIT), READ_LIMIT))
+        with open(full_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if start_line is not None:
+                page = _read_lines(f, size, max(1, int(start_line)), max(1, int(max_lines or 1)), length)
+            else:
+                page = _read_bytes(f, size, min(max(0, int(offset or 0)), size), length)
+        return json.dumps({'path': path, 'size': size, **page, 'eof': page['next_offset'] is None})
     except Exception as e:
         return f"Error reading file {path}: {str(e)}"
     
@@ -48,11 +148,15 @@ read_file_schema = {
     "type": "function",
     "function": {
         "name": "read_file",
-        "description": "Read the contents of a file",
+        "description": "Read a file one page at a time (10KB at most). Returns JSON with the content, the file size and next_offset/next_line to pass back to read the next page (null at the end of the file; next_line is also null when a line is longer than the page, continue with next_offset)",
         "parameters": {
             "type": "object",
             "properties": {
-                "path": {"type": "string", "description": "File path"}
+                "path": {"type": "string", "description": "File path"},
+                "offset": {"type": "integer", "description": "Byte offset to start reading from (optional, default 0)"},
+                "length": {"type": "integer", "description": "Bytes to read, at most 10000 (optional, default 10000)"},
+                "start_line": {"type": "integer", "description": "Read by lines instead, starting at this line number, 1-based (optional)"},
+                "max_lines": {"type": "integer", "description": "Lines to read with start_line (optional, default 200)"}
             },
             "required": ["path"]
         }
@@ -60,7 +164,47 @@ read_file_schema = {
 }
 
 
+def _replace_stream(src, dst, old: str, new: str) -> int:
+    """Copies src to dst replacing every `old` with `new`, one chunk at a time. Returns the number of replacements."""
+    keep = len(old) - 1  # a match can start in the last `keep` characters of a chunk and end in the next
+    count, carry = 0, ''
+    while True:
+        chunk = src.read(COPY_CHUNK)
+        if not chunk:
+            dst.write(carry)
+            return count
+        pieces = (carry + chunk).split(old)
+        count += len(pieces) - 1
+        tail = pieces[-1]
+        cut = max(0, len(tail) - keep)
+        if len(pieces) > 1:
+            dst.write(new.join(pieces[:-1]) + new)
+        dst.write(tail[:cut])
+        carry = tail[cut:]
+
+def _write_atomic(full_path: str, write: Callable) -> bool:
+    """
+    Calls write(file) on a temp file next to the target and, if it returns true, renames the temp file
+    over the target: readers see the old file or the new one, never a partial write.
+    """
+    directory, name = os.path.split(full_path)
+    tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp_path, 'x', encoding='utf-8', newline='') as dst:
+            committed = bool(write(dst))
+            dst.flush()
+            os.fsync(dst.fileno())
+        if committed:
+            if os.path.exists(full_path):
+                shutil.copymode(full_path, tmp_path)
+            os.replace(tmp_path, full_path)
+        return committed
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 def edit_file(path: str, prev_text: str = '', new_text: str = ''):
+    """Replaces prev_text with new_text in a file (or writes new_text), streaming through a temp file."""
     if not is_safe_path(SAFE_DIR, path):
         return "Access denied: invalid path or out of permissions"
     full_path = os.path.join(SAFE_DIR, path)
@@ -69,17 +213,15 @@ def edit_file(path: str, prev_text: str = '', new_text: str = ''):
             return "Content too long (max 10KB)"
         
         existed = os.path.exists(full_path)
+        os.makedirs(SAFE_DIR, exist_ok=True)
         if existed and prev_text:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            if prev_text not in content:
+            with open(full_path, 'r', encoding='utf-8', newline='') as src:
+                replaced = _write_atomic(full_path, lambda dst: _replace_stream(src, dst, prev_text, new_text))
+            if not replaced:
                 return f"Text '{prev_text}' not found"
-            content = content.replace(prev_text, new_text)
         else:
-            content = new_text
-
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+            _write_atomic(full_path, lambda dst: dst.write(new_text) >= 0)
+        FILE_INDEX.mark_dirty()
         return f"File {path} {'edited' if existed else 'created'} successfully"
     except Exception as e:
         return f"Error while editing: {str(e)}"
@@ -102,17 +244,59 @@ edit_file_schema = {
 }
 
 
-def get_weather(city: str, unit: str = "celsius"):
-    try:
+@configured
+def geocode_cache():
+    """City coordinates never change, so they are cached without expiry"""
+    return build_backend('geocode')
+
+def geocode(city: str):
+    key = ' '.join(city.split()).lower()
+    coords = geocode_cache().get(key)
+    if coords is None:
         url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1&language=es&format=json"
+        import requests
         geo = requests.get(url).json()
         if not geo.get("results"):
+            return None
+        coords = [geo["results"][0]["latitude"], geo["results"][0]["longitude"]]
+        geocode_cache().set(key, coords)
+    return coords
+
+def search_files(query: str, max_results: int = 20):
+    try:
+        if not query:
+            return json.dumps({"error": "Empty query"})
+        return json.dumps(FILE_INDEX.search(query, max_results=max_results))
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+search_files_schema = {
+    "type": "function",
+    "function": {
+        "name": "search_files",
+        "description": "Search the text of every file in the workspace at once and return the matching lines with their file path and line number. Prefer this over reading files one by one to find something",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Text to search for (case-insensitive)"},
+                "max_results": {"type": "integer", "description": "Maximum number of matching lines (optional, default 20)"}
+            },
+            "required": ["query"]
+        }
+    }
+}
+
+
+def get_weather(city: str, unit: str = "celsius"):
+    try:
+        coords = geocode(city)
+        if coords is None:
             return f"I couldn't find the city '{city}'"
         
-        lat = geo["results"][0]["latitude"]
-        lon = geo["results"][0]["longitude"]
+        lat, lon = coords
 
         weather_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m&timezone=auto"
+        import requests
         data = requests.get(weather_url).json()
         temp = data["current"]["temperature_2m"]
         unit_symbol = "°C" if unit == "celsius" else "°F"
@@ -150,6 +334,7 @@ def search_web(query: str, num_results: int = 3) -> str:
             "num": num_results,
             "api_key": api_key
         }
+        from serpapi import GoogleSearch
         search = GoogleSearch(params)
         results = search.get_dict().get("organic_results", [])
         print(results)
@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import threading
+from contextlib import contextmanager
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable
+from ..metrics import TOOL_LATENCY, TOOL_QUEUE_WAIT, TOOL_TIMEOUTS, span
+
+class ToolRunner:
+    """
+    Runs the tool calls of one assistant turn concurrently on a bounded thread pool.
+
+    policies: {tool_name: {'timeout': seconds, 'serial_key': arg_name}}
+    Calls with a 'serial_key' that share the argument's name and value never overlap, whichever tool makes
+    them (e.g. read_file and edit_file on the same path): within a turn they run in their original order,
+    and a per-key lock keeps them from overlapping with other sessions too.
+    Results always come back in the original tool_call order.
+    With a `deadline` (time.monotonic() value) no call waits past it, whatever its own timeout.
+    Cancelling run_async drops the calls that have not started yet.
+    """
+
+    def __init__(self, policies: dict = None, max_workers: int = 8, default_timeout: float = 30):
+        self.policies = policies or {}
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tool')
+        self._locks = {}  # serial key -> [lock, calls holding or waiting for it]; dropped when unused
+        self._locks_guard = threading.Lock()
+        self._in_flight = 0
+
+    def queue_depth(self) -> int:
+        """Calls submitted but still waiting for a free worker thread."""
+        return self._executor._work_queue.qsize()
+
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def timeout_for(self, name: str, deadline: float = None) -> float:
+        timeout = self.policies.get(name, {}).get('timeout', self.default_timeout)
+        if deadline is not None:
+            timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+        return timeout
+
+    def _serial_key(self, name: str, args: dict):
+        arg_name = self.policies.get(name, {}).get('serial_key')
+        if arg_name is None:
+            return None
+        return (arg_name, str(args.get(arg_name)))
+
+    @contextmanager
+    def _serialized(self, key):
+        with self._locks_guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def _waves(self, names: list, args_list: list) -> list:
+        """Splits call indexes into waves: calls sharing a serial key land in consecutive waves, in order."""
+        waves = []
+        seen = {}
+        for index, (name, args) in enumerate(zip(names, args_list)):
+            key = self._serial_key(name, args)
+            position = seen.get(key, -1) + 1 if key is not None else 0
+            if key is not None:
+                seen[key] = position
+            while len(waves) <= position:
+                waves.append([])
+            waves[position].append(index)
+        return waves
+
+    def _call(self, execute: Callable, name: str, args: dict, submitted: float):
+        TOOL_QUEUE_WAIT.observe(time.monotonic() - submitted, tool=name)
+        started = time.monotonic()
+        outcome = 'error'
+        with span('tool', tool=name) as attrs:
+            try:
+                key = self._serial_key(name, args)
+                if key is None:
+                    result = execute(name, args)
+                else:
+                    with self._serialized(key):
+                        result = execute(name, args)
+                if not (isinstance(result, str) and result.startswith(('Error', 'Tool not found'))):
+                    outcome = 'ok'
+                return result
+            finally:
+                attrs['outcome'] = outcome
+                TOOL_LATENCY.observe(time.monotonic() - started, tool=name, outcome=outcome)
+
+    def _done(self, future):
+        with self._locks_guard:
+            self._in_flight -= 1
+
+    def _submit(self, execute: Callable, name: str, args: dict):
+        with self._locks_guard:
+            self._in_flight += 1
+        # The worker runs in a copy of the caller's context, so the request's trace follows the call
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._call, execute, name, args, time.monotonic())
+        # Also fires for calls cancelled before they started
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, names: list, args_list: list, execute: Callable[[str, dict], str], deadline: float = None) -> list:
+        """Blocks until every call finished or timed out. A timed-out call is reported as an error result."""
+        results = [None] * len(names)
+        for wave in self._waves(names, args_list):
+            started = time.monotonic()
+            futures = {index: self._submit(execute, names[index], args_list[index]) for index in wave}
+            for index, future in futures.items():
+                timeout = self.timeout_for(names[index], deadline)
+                try:
+                    results[index] = future.result(timeout=max(0, started + timeout - time.monotonic()))
+                except FutureTimeoutError:
+                    future.cancel()
+                    TOOL_TIMEOUTS.inc(tool=names[index])
+                    results[index] = f"Error executing tool: timed out after {timeout}s"
+        return results
+
+    async def run_async(self, names: list, args_list: list, execute: Callable[[str, dict], str],
+                        deadline: float = None) -> list:
+        results = [None] * len(names)
+
+        async def wait(index):
+            future = asyncio.wrap_future(self._submit(execute, names[index], args_list[index]))
+            timeout = self.timeout_for(names[index], deadline)
+            try:
+                results[index] = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                TOOL_TIMEOUTS.inc(tool=names[index])
+                results[index] = f"Error executing tool: timed out after {timeout}s"
+
+        for wave in self._waves(names, args_list):
+            await asyncio.gather(*(wait(index) for index in wave))
+        return results
@@ -0,0 +1,32 @@
+import json
+from src.tools import file_ops
+
+def read(path, **kwargs):
+    return json.loads(file_ops.read_file(path, **kwargs))
+
+def test_read_lines_longer_than_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_ops, 'SAFE_DIR', str(tmp_path))
+    (tmp_path / 'long.txt').write_text('short\n' + 'x' * 50 + '\nlast\n')
+
+    page = read('long.txt', start_line=2, length=20)
+    assert page['content'] == 'x' * 20
+    assert page['next_line'] is None
+    assert page['next_offset'] == 26
+    assert 'offset=26' in page['note'] and 'start_line=3' in page['note']
+
+    rest = read('long.txt', offset=page['next_offset'], length=100)
+    assert rest['content'] == 'x' * 30 + '\nlast\n'
+    assert read('long.txt', start_line=3)['content'] == 'last\n'
+
+def test_read_lines_pages_by_line(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_ops, 'SAFE_DIR', str(tmp_path))
+    (tmp_path / 'lines.txt').write_text(''.join(f"line {i}\n" for i in range(1, 6)))
+
+    page = read('lines.txt', start_line=1, max_lines=2)
+    assert page['content'] == 'line 1\nline 2\n'
+    assert page['next_line'] == 3
+    assert 'note' not in page
+
+    last = read('lines.txt', start_line=5, max_lines=2)
+    assert last['content'] == 'line 5\n'
+    assert last['next_line'] is None and last['eof']
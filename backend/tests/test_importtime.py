@@ -0,0 +1,33 @@
+import subprocess
+import sys
+import pytest
+from benchmarks.importtime import BACKEND_DIR, CONFIG_MODULES, FORBIDDEN, measure
+
+def check(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, '-m', 'benchmarks.importtime', '--runs', '1', *args],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+
+@pytest.mark.parametrize('module, budget_ms, allow_config', [
+    ('src.agent', 300, False),
+    ('app', 1500, True),
+])
+def test_import_within_budget_and_without_sdks(module, budget_ms, allow_config):
+    result = check('--module', module, '--budget-ms', str(budget_ms), *(['--allow-config'] if allow_config else []))
+    assert result.returncode == 0, result.stdout
+
+def test_agent_imports_no_sdk_or_config():
+    _, modules, created = measure('src.agent')
+    assert not [name for name in FORBIDDEN + CONFIG_MODULES if name in modules]
+    assert created == []
+
+def test_check_fails_on_eager_sdk_import():
+    result = check('--module', 'src.providers.openai', '--budget-ms', '10000')
+    assert result.returncode == 1
+    assert 'EAGER IMPORTS: openai' in result.stdout
+
+def test_check_fails_over_budget():
+    result = check('--module', 'src.agent', '--budget-ms', '0.001')
+    assert result.returncode == 1
+    assert 'OVER BUDGET' in result.stdout
@@ -0,0 +1,100 @@
+import asyncio
+import fakeredis
+import pytest
+from src.memory.local_memory import InMemoryStore
+from src.memory.memory import RedisMemory
+from src.memory.sqlite_memory import SQLiteMemory
+
+TOOL_CALL = {'id': 'call_1', 'type': 'function', 'function': {'name': 'read_file', 'arguments': '{"path": "a.txt"}'}}
+
+def turn(n: int, output: str = 'contents') -> list:
+    return [
+        {'role': 'user', 'content': f'question {n} ¿ñ?'},
+        {'role': 'assistant', 'content': None, 'tool_calls': [TOOL_CALL]},
+        {'role': 'tool', 'tool_call_id': 'call_1', 'name': 'read_file', 'content': output},
+        {'role': 'assistant', 'content': f'answer {n}'},
+    ]
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return InMemoryStore()
+    if request.param == 'sqlite':
+        return SQLiteMemory(str(tmp_path / 'chat.db'))
+    return RedisMemory(client=fakeredis.FakeRedis())
+
+def fill(store, session_id: str, messages: list):
+    for message in messages:
+        store.add_message(session_id, message)
+
+def test_empty_session(store):
+    assert store.get_version('s') == 0
+    assert store.get_messages('s') == []
+    assert store.get_messages_since('s', 0) == []
+    assert store.get_messages_page('s') == []
+
+def test_append_and_read_back(store):
+    messages = [{'role': 'system', 'content': 'be brief'}, *turn(1)]
+    fill(store, 's', messages)
+    assert store.get_messages('s') == messages
+
+def test_version_is_a_cursor(store):
+    fill(store, 's', turn(1))
+    cursor = store.get_version('s')
+    assert cursor == 4
+    assert store.get_messages_since('s', cursor) == []
+    fill(store, 's', turn(2))
+    assert store.get_version('s') == 8
+    assert store.get_messages_since('s', cursor) == turn(2)
+
+def test_pages(store):
+    fill(store, 's', turn(1) + turn(2))
+    assert store.get_messages_page('s', 2, 3) == (turn(1) + turn(2))[2:5]
+    assert store.get_messages_page('s', 6, 10) == turn(2)[2:]
+    assert store.get_messages_page('s', 0, 0) == []
+
+def test_sessions_are_separate_and_deletable(store):
+    fill(store, 'a', turn(1))
+    fill(store, 'b', turn(2))
+    store.delete_session('a')
+    assert store.get_version('a') == 0 and store.get_messages('a') == []
+    assert store.get_messages('b') == turn(2)
+
+def test_async_variants(store):
+    async def scenario():
+        for message in turn(1):
+            await store.add_message_async('s', message)
+        assert await store.get_version_async('s') == 4
+        assert await store.get_messages_since_async('s', 2) == turn(1)[2:]
+        assert await store.get_messages_page_async('s', 1, 2) == turn(1)[1:3]
+
+    asyncio.run(scenario())
+
+def test_old_tool_outputs_read_back_unchanged(store):
+    messages = [message for n in range(8) for message in turn(n, output=f'{n} ' + 'x' * 5000)]
+    fill(store, 's', messages)
+    assert store.get_messages('s') == messages
+
+def test_redis_sessions_expire():
+    client = fakeredis.FakeRedis()
+    store = RedisMemory(client=client, ttl=60)
+    fill(store, 's', turn(1))
+    assert 0 < client.ttl('chat:s') <= 60
+
+def test_stats(store):
+    fill(store, 'a', turn(1))
+    fill(store, 'b', turn(2))
+    store.delete_session('a')
+    stats = store.stats()
+    # Stores that cannot count cheaply report {}
+    assert stats in ({}, {'sessions': 1, 'messages': 4})
+
+def test_unusual_messages_read_back(store):
+    messages = [
+        {'role': 'user', 'content': 'hi', 'name': None},
+        {'role': 'assistant', 'content': 'hello', 'reasoning': 'short'},
+        {'role': 'assistant', 'content': None, 'tool_calls': [{'id': 'c', 'function': {'name': 'f', 'arguments': '{}'}}]},
+        {'role': 'tool', 'tool_call_id': 'c', 'content': 'done'},
+    ]
+    fill(store, 's', messages)
+    assert store.get_messages('s') == messages
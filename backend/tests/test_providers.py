@@ -0,0 +1,46 @@
+import json
+import httpx
+from src.providers.openai import OpenAIProvider
+from src.memory.local_memory import InMemoryStore
+from src.agent import Agent
+
+COMPLETION = {
+    'id': 'c1', 'object': 'chat.completion', 'created': 0, 'model': 'm',
+    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': 'done'}}],
+    'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+}
+
+def provider(bodies: list) -> OpenAIProvider:
+    def handle(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        bodies.append(body)
+        if 'tool_choice' in body and not body.get('tools'):
+            # What OpenAI answers when tool_choice comes without tools
+            return httpx.Response(400, json={'error': {'message': "'tool_choice' is only allowed when 'tools' are specified"}})
+        return httpx.Response(200, json=COMPLETION)
+    client = httpx.Client(transport=httpx.MockTransport(handle))
+    return OpenAIProvider(api_key='test', base_url='http://llm.test/v1', model='m', http_client=client)
+
+def test_no_tools_sends_no_tool_choice():
+    bodies = []
+    response = provider(bodies).generate_response([{'role': 'user', 'content': 'hi'}], tools=None)
+    assert response['content'] == 'done'
+    assert 'tools' not in bodies[0] and 'tool_choice' not in bodies[0]
+
+def test_tools_send_tool_choice():
+    bodies = []
+    tools = [{'type': 'function', 'function': {'name': 'f', 'parameters': {'type': 'object', 'properties': {}}}}]
+    provider(bodies).generate_response([{'role': 'user', 'content': 'hi'}], tools=tools)
+    assert bodies[0]['tools'] == tools and bodies[0]['tool_choice'] == 'auto'
+
+def test_huggingface_no_tools_sends_no_tool_choice():
+    from src.providers.huggingface import _completion_kwargs
+    kwargs = _completion_kwargs([{'role': 'user', 'content': 'hi'}], None, {})
+    assert 'tools' not in kwargs and 'tool_choice' not in kwargs
+
+def test_summary_uses_model_answer():
+    bodies = []
+    agent = Agent(provider(bodies), InMemoryStore(), 's')
+    messages = [{'role': 'user', 'content': 'hi'}, {'role': 'assistant', 'content': 'hello'}]
+    assert agent._summarize('', messages) == 'done'
+    assert 'tool_choice' not in bodies[0]
@@ -0,0 +1,50 @@
+import asyncio
+from src.providers.base import AsyncLLMProvider
+from src.providers.routing import AsyncRoutingProvider, use_backend_slots
+from src.scheduler import Scheduler
+
+class SlowProvider(AsyncLLMProvider):
+    model = 'stub'
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def generate_response(self, messages: list, tools: list = None, params: dict = None) -> dict:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return {'content': 'ok', 'tool_calls': None, 'usage': None}
+
+def test_routed_calls_respect_backend_limit():
+    async def scenario():
+        ollama = SlowProvider()
+        router = AsyncRoutingProvider({'ollama': ollama})
+        scheduler = Scheduler({'ollama': 2})
+
+        async def request(session_id: str, stream: bool):
+            use_backend_slots(lambda backend: scheduler.slot(backend, session_id))
+            async with scheduler.slot('auto', session_id):
+                if stream:
+                    return [event async for event in router.generate_response_stream([])]
+                return await router.generate_response([])
+
+        await asyncio.gather(*(request(f's{i}', stream=i % 2 == 0) for i in range(12)))
+        assert ollama.peak == 2
+        assert scheduler.stats()['ollama']['active'] == 0
+
+    asyncio.run(scenario())
+
+def test_stream_holds_backend_slot_until_closed():
+    async def scenario():
+        router = AsyncRoutingProvider({'ollama': SlowProvider()})
+        scheduler = Scheduler({'ollama': 2})
+        use_backend_slots(lambda backend: scheduler.slot(backend, 's'))
+        events = router.generate_response_stream([])
+        await events.__anext__()
+        assert scheduler.stats()['ollama']['active'] == 1
+        await events.aclose()
+        assert scheduler.stats()['ollama']['active'] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,34 @@
+import threading
+import time
+from src.agent import TOOL_POLICIES
+from src.tools.runner import ToolRunner
+
+class HalfAppliedEdits:
+    """A file whose edits land in two steps, so an overlapping read sees half of one."""
+
+    def __init__(self):
+        self.content = 'old old'
+
+    def execute(self, name: str, args: dict) -> str:
+        if name == 'edit_file':
+            self.content = 'new ' + self.content.split()[1]
+            time.sleep(0.05)
+            self.content = 'new new'
+            return 'ok'
+        return self.content
+
+def test_read_in_same_turn_waits_for_edit():
+    runner = ToolRunner(TOOL_POLICIES)
+    file = HalfAppliedEdits()
+    results = runner.run(['edit_file', 'read_file'], [{'path': 'a.txt'}, {'path': 'a.txt'}], file.execute)
+    assert results == ['ok', 'new new']
+
+def test_read_from_other_session_never_sees_half_an_edit():
+    runner = ToolRunner(TOOL_POLICIES)
+    file = HalfAppliedEdits()
+    edit = threading.Thread(target=runner.run, args=(['edit_file'], [{'path': 'a.txt'}], file.execute))
+    edit.start()
+    time.sleep(0.01)
+    [content] = runner.run(['read_file'], [{'path': 'a.txt'}], file.execute)
+    edit.join()
+    assert content in ('old old', 'new new')
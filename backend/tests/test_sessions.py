@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from src.sessions import SessionQueue
+
+def test_merge_retries_after_failure():
+    async def scenario():
+        queue = SessionQueue(merge_window=60)
+        calls = []
+
+        async def fn():
+            calls.append(None)
+            if len(calls) == 1:
+                raise RuntimeError("backend error")
+            return 'ok'
+
+        with pytest.raises(RuntimeError):
+            await queue.merge('s', 'k', fn)
+        assert await queue.merge('s', 'k', fn) == 'ok'
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+def test_merge_retries_after_abandoned_run():
+    async def scenario():
+        queue = SessionQueue(merge_window=60)
+        calls = []
+
+        async def fn():
+            calls.append(None)
+            await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+            return len(calls)
+
+        first = asyncio.ensure_future(queue.merge('s', 'k', fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await queue.merge('s', 'k', fn) == 2
+
+    asyncio.run(scenario())
+
+def test_merge_shares_successful_run():
+    async def scenario():
+        queue = SessionQueue(merge_window=60)
+        calls = []
+
+        async def fn():
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return 'ok'
+
+        assert await asyncio.gather(queue.merge('s', 'k', fn), queue.merge('s', 'k', fn)) == ['ok', 'ok']
+        assert await queue.merge('s', 'k', fn) == 'ok'
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
@@ -1,7 +1,7 @@
 import SafeMessage from './components/SafeMessage';
 import InternalFlowPanel from './components/InternalFlowPanel';
 import { useState, useRef, useEffect } from 'react';
-import { useChatStream } from './hooks/useChatStream';
+import { useChatStream, fetchHistory } from './hooks/useChatStream';
 
 function App() {
   const [sessionId, setSessionId] = useState(() => {
@@ -20,6 +20,7 @@ function App() {
   const [currentLogs, setCurrentLogs] = useState([]);
   const [connectionStatus, setConnectionStatus] = useState('online');
   const messagesEndRef = useRef(null);
+  const contextMessagesRef = useRef([]);
   const inputRef = useRef(null);
 
   const { sendMessage: sendMessageStream, isLoading: isStreaming } = useChatStream(sessionId, provider);
@@ -32,6 +33,10 @@ function App() {
     scrollToBottom();
   }, [messages]);
 
+  useEffect(() => {
+    contextMessagesRef.current = [];
+  }, [sessionId]);
+
   useEffect(() => {
     setMessages([]);
     setInput('');
@@ -58,9 +63,23 @@ function App() {
       let finalLogs = [];
       let finalFlow = null;
 
+      const streamingTimestamp = Date.now();
+      let streamedContent = '';
+
       await sendMessageStream(
         input.trim(),
-        null, 
+        (token) => {
+          streamedContent += token;
+          setMessages(prev => {
+            const rest = prev.filter(m => !(m.isStreaming && m.timestamp === streamingTimestamp));
+            return [...rest, {
+              role: 'assistant',
+              content: streamedContent,
+              isStreaming: true,
+              timestamp: streamingTimestamp
+            }];
+          });
+        },
         (completeData) => {
           finalContent = completeData.content || completeData.response || 'Sin respuesta';
           finalLogs = completeData.logs || [];
@@ -68,7 +87,18 @@ function App() {
         }
       );
 
-      setMessages(prev => [...prev, { 
+      // The response only carries the messages added by this request: append them to the known context,
+      // or reload the whole history when the two are out of step (e.g. after a page reload)
+      if (finalFlow) {
+        const known = contextMessagesRef.current;
+        const history = finalFlow.messages_start === known.length
+          ? [...known, ...finalFlow.messages]
+          : await fetchHistory(sessionId);
+        contextMessagesRef.current = history;
+        finalFlow = { ...finalFlow, messages: history };
+      }
+
+      setMessages(prev => [...prev.filter(m => !m.isStreaming), { 
         role: 'assistant', 
         content: finalContent, 
         logs: finalLogs,
@@ -80,7 +110,7 @@ function App() {
       setConnectionStatus('online');
 
     } catch (err) {
-      setMessages(prev => [...prev, { 
+      setMessages(prev => [...prev.filter(m => !m.isStreaming), { 
         role: 'error', 
         content: `Error: ${err.message || 'No se pudo conectar al servidor'}`,
         timestamp: Date.now()
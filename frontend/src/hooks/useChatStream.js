@@ -1,5 +1,21 @@
 import { useState, useCallback } from 'react';
 
+// Pages through the stored history of a session (the chat responses only carry the new messages)
+export const fetchHistory = async (sessionId) => {
+  const messages = [];
+  let offset = 0;
+  while (offset !== null) {
+    const response = await fetch(`http://localhost:8000/sessions/${sessionId}/messages?offset=${offset}&limit=500`);
+    if (!response.ok) {
+      throw new Error(`Error del servidor: ${response.status}`);
+    }
+    const page = await response.json();
+    messages.push(...page.messages);
+    offset = page.next_offset;
+  }
+  return messages;
+};
+
 export const useChatStream = (sessionId, provider) => {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
@@ -9,7 +25,7 @@ export const useChatStream = (sessionId, provider) => {
     setError(null);
 
     try {
-      const endpoint = 'http://localhost:8000/chat';
+      const endpoint = 'http://localhost:8000/chat/stream';
       
       const response = await fetch(endpoint, {
         method: 'POST',
@@ -25,9 +41,40 @@ export const useChatStream = (sessionId, provider) => {
         throw new Error(`Error del servidor: ${response.status}`);
       }
 
-      const data = await response.json();
-      
-      onComplete?.(data);
+      // Server-Sent Events: blocks of "event: <type>\ndata: <json>" separated by a blank line
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        // Normalized on the whole buffer: a CRLF can be split across two chunks
+        buffer = (buffer + decoder.decode(value, { stream: true })).replace(/\r\n/g, '\n');
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let eventType = 'message';
+          let data = '';
+          for (const line of block.split('\n')) {
+            if (line.startsWith('event:')) eventType = line.slice(6).trim();
+            else if (line.startsWith('data:')) data += line.slice(5).trim();
+          }
+          if (!data) continue;
+          const payload = JSON.parse(data);
+
+          if (eventType === 'token') {
+            onChunk?.(payload.content);
+          } else if (eventType === 'done') {
+            onComplete?.(payload);
+          } else if (eventType === 'error') {
+            throw new Error(payload.detail);
+          }
+        }
+      }
 
     } catch (err) {
       setError(err.message);
@@ -38,4 +85,4 @@ export const useChatStream = (sessionId, provider) => {
   }, [sessionId, provider]);
 
   return { sendMessage, isLoading, error };
-};
\ No newline at end of file
+};